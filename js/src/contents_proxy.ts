@@ -2,7 +2,8 @@
 
 import { PromiseDelegate } from "@lumino/coreutils";
 import { showErrorMessage } from "@jupyterlab/apputils";
-import { Contents } from "@jupyterlab/services";
+import { URLExt } from "@jupyterlab/coreutils";
+import { Contents, ServerConnection } from "@jupyterlab/services";
 import { IContentRow, Path } from "@tree-finder/base";
 
 
@@ -39,7 +40,12 @@ export class ContentsProxy {
 
   async downloadUrl(path: string) {
     path = ContentsProxy.toFullPath(path, this.drive);
-    return await this.contentsManager.getDownloadUrl(path);
+    if (!this.drive) {
+      return await this.contentsManager.getDownloadUrl(path);
+    }
+    // stream the raw bytes from the drive, instead of going through the contents api
+    const settings = this.contentsManager.serverSettings ?? ServerConnection.makeSettings();
+    return URLExt.join(settings.baseUrl, "jupyterfs/files", URLExt.encodeParts(path)) + "?download=1";
   }
 
   readonly contentsManager: Contents.IManager;
@@ -93,9 +93,10 @@ export interface IFSResource extends IFSSettingsResource {
   drive?: string;
 
   /**
-   * `true` if resource has been initialized
+   * `true` if resource has been initialized, `"pending"` if it is still
+   * being initialized in the background (e.g. its backend is slow to connect)
    */
-  init?: boolean;
+  init?: boolean | "pending";
 
   /**
    * If present, a list of "{{token}}" template parameters that were missing
@@ -115,6 +116,17 @@ export interface IFSResource extends IFSSettingsResource {
    */
   errors?: string[];
 
+  /**
+   * The result of the last background health check of the backend of this
+   * resource, if health checks are enabled (or the resource connects lazily)
+   */
+  health?: "ok" | "degraded";
+
+  /**
+   * Why the last health check found the backend degraded
+   */
+  healthError?: string;
+
 }
 
 export interface IFSComm {
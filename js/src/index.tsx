@@ -20,7 +20,7 @@ import * as semver from "semver";
 
 import { commandIDs, createDynamicCommands, createStaticCommands, idFromResource } from "./commands";
 import { ContentsProxy } from "./contents_proxy";
-import { IFSOptions, IFSResource, IFSSettingsResource } from "./filesystem";
+import { FSComm, IFSOptions, IFSResource, IFSSettingsResource } from "./filesystem";
 import { FileUploadStatus } from "./progress";
 import { migrateSettings, unpartialResource } from "./settings";
 import { snippetFormRender } from "./snippets";
@@ -31,6 +31,7 @@ import { initResources } from "./resources";
 // tslint:disable: variable-name
 
 const BROWSER_ID = "jupyter-fs:plugin";
+const PENDING_POLL_INTERVAL = 2000;
 export const browser: JupyterFrontEndPlugin<ITreeFinderMain> = {
   autoStart: true,
   id: BROWSER_ID,
@@ -126,7 +127,31 @@ export const browser: JupyterFrontEndPlugin<ITreeFinderMain> = {
       );
     }
 
+    // incremented on each refresh, to stop watching the pending resources of earlier ones
+    let generation = 0;
+
+    async function watchPending(options: IFSOptions, current: number) {
+      // add the widgets of resources that were still being initialized by the backend, once they are ready
+      let resources: IFSResource[];
+      do {
+        await new Promise(resolve => setTimeout(resolve, PENDING_POLL_INTERVAL));
+        if (current !== generation) {
+          return;
+        }
+        resources = await FSComm.instance.getResourcesRequest();
+        if (current !== generation) {
+          return;
+        }
+        if (commands) {
+          commands.dispose();
+          commands = undefined;
+        }
+        await refreshWidgets({ resources: resources.filter(r => r.init === true), options });
+      } while (resources.some(r => r.init === "pending"));
+    }
+
     async function refresh() {
+      const current = ++generation;
       // get user settings from json file
       let resources: IFSResource[] = (
         settings?.composite.resources as unknown as IFSSettingsResource[] ?? []
@@ -148,9 +173,13 @@ export const browser: JupyterFrontEndPlugin<ITreeFinderMain> = {
       }
 
       try {
-        resources = (await initResources(resources, options)).filter(r => r.init);
+        const initialized = await initResources(resources, options);
+        resources = initialized.filter(r => r.init === true);
         cleanup();
         await refreshWidgets({ resources, options });
+        if (initialized.some(r => r.init === "pending")) {
+          void watchPending(options, current);
+        }
       } catch (e) {
         console.error("Failed to refresh widgets!", e);
         cleanup(true);
@@ -5,12 +5,7 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
-import json
-from pathlib import Path
-
-from .extension import _jupyter_server_extension_points
-from .fs_wrapper import fs, fs_instance
-from .metamanager import MetaManager, SyncMetaManager
+import importlib
 
 __version__ = "1.2.1"
 
@@ -23,12 +18,35 @@ __all__ = (
     "SyncMetaManager",
 )
 
-HERE = Path(__file__).parent.resolve()
-with (HERE / "labextension" / "package.json").open() as fid:
-    data = json.load(fid)
+# the public names that live in submodules, which are only imported when the names are first used,
+# so that importing jupyterfs does not pull in jupyter_server
+_lazy = {
+    "_jupyter_server_extension_points": ".extension",
+    "fs": ".fs_wrapper",
+    "fs_instance": ".fs_wrapper",
+    "MetaManager": ".metamanager",
+    "SyncMetaManager": ".metamanager",
+}
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_lazy})
 
 
 def _jupyter_labextension_paths():
+    import json
+    from pathlib import Path
+
+    with (Path(__file__).parent.resolve() / "labextension" / "package.json").open() as fid:
+        data = json.load(fid)
     return [
         {
             "src": "labextension",
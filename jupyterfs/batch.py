@@ -0,0 +1,171 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import json
+
+from jupyter_client.jsonutil import json_default
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+
+from .config import JupyterFs as JupyterFsConfig
+from .pathutils import _call_async, _resolve_path
+
+__all__ = ("BatchHandler", "run_batch")
+
+_OPERATIONS = ("delete", "rename", "copy")
+
+
+def _validate(operation):
+    if not isinstance(operation, dict) or operation.get("op") not in _OPERATIONS:
+        raise web.HTTPError(400, "Unknown operation: %r" % (operation,))
+    if not isinstance(operation.get("path"), str):
+        raise web.HTTPError(400, "Missing path for operation: %r" % (operation,))
+    new_path = operation.get("new_path")
+    if (operation["op"] == "rename" or new_path is not None) and not isinstance(new_path, str):
+        raise web.HTTPError(400, "Missing new_path for operation: %r" % (operation,))
+
+
+def _error(operation, e, log):
+    """The result of an operation that failed with e"""
+    if isinstance(e, web.HTTPError):
+        status = e.status_code
+        message = (e.log_message % e.args if e.args else e.log_message) or e.reason
+    elif isinstance(e, FileNotFoundError):
+        status, message = 404, "No such file or directory: %s" % operation.get("path")
+    elif isinstance(e, PermissionError):
+        status, message = 403, "Permission denied: %s" % operation.get("path")
+    else:
+        log.error("Error running batch operation %r", operation, exc_info=e)
+        status, message = 500, str(e)
+    return {"status": status, "message": message}
+
+
+def _drive_limit(cm, prefix, concurrency):
+    # stay within what the executor of the drive accepts, rather than having it reject calls with a 503
+    executor = cm._drive_executor(prefix)
+    if executor.max_queue:
+        concurrency = min(concurrency, executor.max_workers + executor.max_queue)
+    return max(concurrency, 1)
+
+
+async def run_batch(cm, operations, concurrency):
+    """Run a list of contents operations, and return the result of each of them, in the same order.
+
+    The operations are grouped by the drive of their path. The groups run concurrently, and up to
+    `concurrency` operations of each group run at the same time. The deletes of a group are made
+    with a single `delete_many` call, when the manager of the drive has one.
+
+    The operations are independent of each other: they are not run in any particular order.
+
+    Args:
+        cm (MetaManagerShared): the contents manager the drives belong to
+        operations (list): dicts with an "op" ("delete", "rename" or "copy"), a "path", and for
+            rename and copy, a "new_path" (optional for copy, as in `ContentsManager.copy`)
+        concurrency (int): the maximum number of operations run at the same time on each drive
+    Returns:
+        list: for each operation, a dict with its "status" (an http status code), and either
+            the "model" of the new file for rename and copy, or an error "message"
+    """
+    results = [None] * len(operations)
+    groups = {}
+    for i, operation in enumerate(operations):
+        try:
+            _validate(operation)
+            prefix, mgr, mgr_path = _resolve_path(operation["path"], cm._managers)
+        except Exception as e:
+            results[i] = _error(operation, e, cm.log)
+            continue
+        groups.setdefault(prefix, []).append((i, mgr_path))
+
+    async def run_group(prefix, items):
+        mgr = cm._managers[prefix]
+        limit = asyncio.Semaphore(_drive_limit(cm, prefix, concurrency))
+        deletes = [(i, mgr_path) for i, mgr_path in items if operations[i]["op"] == "delete"]
+        if deletes and hasattr(mgr, "delete_many"):
+            items = [item for item in items if operations[item[0]]["op"] != "delete"]
+            bulk = [_delete_many(cm, prefix, mgr, deletes, operations, results)]
+        else:
+            bulk = []
+
+        async def run_one(i, mgr_path):
+            async with limit:
+                try:
+                    results[i] = await _run_operation(cm, prefix, mgr, mgr_path, operations[i])
+                except Exception as e:
+                    results[i] = _error(operations[i], e, cm.log)
+
+        await asyncio.gather(*bulk, *(run_one(i, mgr_path) for i, mgr_path in items))
+
+    await asyncio.gather(*(run_group(prefix, items) for prefix, items in groups.items()))
+    return results
+
+
+async def _delete_many(cm, prefix, mgr, deletes, operations, results):
+    try:
+        failed = await _call_async(cm, prefix, mgr, "delete_many", [mgr_path for _, mgr_path in deletes])
+    except Exception as e:
+        for i, _ in deletes:
+            results[i] = _error(operations[i], e, cm.log)
+        return
+    for i, mgr_path in deletes:
+        results[i] = _error(operations[i], failed[mgr_path], cm.log) if mgr_path in failed else {"status": 204}
+
+
+async def _run_operation(cm, prefix, mgr, mgr_path, operation):
+    op = operation["op"]
+    if op == "delete":
+        await _call_async(cm, prefix, mgr, "delete", mgr_path)
+        return {"status": 204}
+
+    new_path = operation.get("new_path")
+    if new_path is not None and _resolve_path(new_path, cm._managers)[1] is not mgr:
+        from .transfer import Transfer
+
+        transfer = Transfer(cm, operation["path"], new_path)
+        if op == "copy":
+            return {"status": 201, "model": await transfer.duplicate()}
+        await transfer.move()
+        return {"status": 200, "model": await transfer._call_dst("get", transfer.dst_path, content=False)}
+
+    new_mgr_path = None if new_path is None else _resolve_path(new_path, cm._managers)[2]
+    if op == "copy":
+        return {"status": 201, "model": await _call_async(cm, prefix, mgr, "copy", mgr_path, new_mgr_path)}
+    await _call_async(cm, prefix, mgr, "rename", mgr_path, new_mgr_path)
+    return {"status": 200, "model": await _call_async(cm, prefix, mgr, "get", new_mgr_path, content=False)}
+
+
+class BatchHandler(APIHandler):
+    """Runs a list of delete, rename and copy operations on jupyter-fs drives in a single request,
+    e.g. for the actions on a multiple selection of the file browser.
+
+    e.g. POST /jupyterfs/batch
+        {"operations": [{"op": "delete", "path": "<drive>:a.txt"}, {"op": "rename", "path": "<drive>:b.txt", "new_path": "<drive>:c.txt"}]}
+
+    replies with the result of each operation, in the same order (see `run_batch`):
+        {"results": [{"status": 204}, {"status": 200, "model": {...}}]}
+    """
+
+    _jupyterfsConfig = None
+
+    @property
+    def fsconfig(self):
+        # TODO: This pattern will not pick up changes to config after this!
+        if self._jupyterfsConfig is None:
+            self._jupyterfsConfig = JupyterFsConfig(config=self.config)
+
+        return self._jupyterfsConfig
+
+    @web.authenticated
+    async def post(self):
+        body = self.get_json_body() or {}
+        operations = body.get("operations")
+        if not isinstance(operations, list):
+            raise web.HTTPError(400, "Expected a list of operations")
+
+        results = await run_batch(self.contents_manager, operations, self.fsconfig.batch_concurrency)
+        self.finish(json.dumps({"results": results}, default=json_default))
@@ -8,7 +8,7 @@
 from jupyter_server.services.contents.largefilemanager import LargeFileManager
 from jupyter_server.services.contents.manager import ContentsManager
 from jupyter_server.transutils import _i18n
-from traitlets import Bool, Dict, List, Type, Unicode
+from traitlets import Bool, Dict, Float, Int, List, Type, Unicode
 from traitlets.config import Configurable
 
 __all__ = ["JupyterFs"]
@@ -47,6 +47,177 @@ class JupyterFs(Configurable):
         help=_i18n("whether to surface init errors to the client"),
     )
 
+    fsspec_async = Bool(
+        default_value=True,
+        config=True,
+        help=_i18n("whether to use the async api of fsspec filesystems that support it, when the server runs an async contents manager"),
+    )
+
+    init_timeout = Float(
+        default_value=10.0,
+        config=True,
+        help=_i18n(
+            "seconds to wait for the manager of a resource to be created when resources are initialized from the frontend. "
+            "Resources that take longer are reported as pending, and completed in the background. Resources can override this with their 'initTimeout' key"
+        ),
+    )
+
+    trace_backend_calls = Bool(
+        default_value=False,
+        config=True,
+        help=_i18n(
+            "trace the calls each contents operation makes to the backend of its drive. Traces are logged, reported in the "
+            "Server-Timing header of the response, and emitted as OpenTelemetry spans if opentelemetry is installed"
+        ),
+    )
+
+    lazy_connect = Bool(
+        default_value=False,
+        config=True,
+        help=_i18n(
+            "create the managers of resources without connecting to their backend: pyfilesystem drives are opened on first use, "
+            "and the connection check of fsspec drives is skipped. They are then connected in the background by a health check. "
+            "Resources can override this with their 'lazy' key"
+        ),
+    )
+
+    health_check_interval = Float(
+        default_value=0.0,
+        config=True,
+        help=_i18n(
+            "seconds between two health checks of the backends of the drives, which mark unreachable ones as 'degraded' "
+            "in the /jupyterfs/resources reply. 0 disables the periodic checks"
+        ),
+    )
+
+    health_check_timeout = Float(
+        default_value=10.0,
+        config=True,
+        help=_i18n("seconds after which a health check that has not completed marks its drive as degraded"),
+    )
+
+    fs_pool_idle_timeout = Float(
+        default_value=300.0,
+        config=True,
+        help=_i18n(
+            "seconds a filesystem instance (and its connections) is kept open once no drive uses it, so that drives of the same "
+            "backend created later (e.g. when the resources are posted again) can reuse it"
+        ),
+    )
+
+    fs_pool_max_idle = Int(
+        default_value=8,
+        config=True,
+        help=_i18n("maximum number of filesystem instances kept open while no drive uses them. The least recently used are closed first"),
+    )
+
+    drive_max_workers = Int(
+        default_value=4,
+        config=True,
+        help=_i18n(
+            "number of worker threads used to run the backend calls of each drive (for async drives, the number of calls run at the same time). "
+            "Can be overridden per resource with the 'maxWorkers' key"
+        ),
+    )
+
+    drive_max_queue = Int(
+        default_value=64,
+        config=True,
+        help=_i18n(
+            "number of backend calls allowed to wait for a free worker of a drive before requests are rejected. "
+            "0 means unbounded. Can be overridden per resource with the 'maxQueue' key"
+        ),
+    )
+
+    stream_chunk_size = Int(
+        default_value=1024 * 1024,
+        config=True,
+        help=_i18n("size in bytes of the chunks read from (and flushed to) a drive when streaming file contents"),
+    )
+
+    stream_max_upload_size = Int(
+        default_value=0,
+        config=True,
+        help=_i18n("maximum size in bytes of a file uploaded with a streamed PUT to /jupyterfs/files. 0 means unlimited"),
+    )
+
+    transfer_concurrency = Int(
+        default_value=4,
+        config=True,
+        help=_i18n("number of files transferred at the same time when copying or moving a directory between drives"),
+    )
+
+    listing_max_page_size = Int(
+        default_value=1000,
+        config=True,
+        help=_i18n(
+            "maximum number of entries in a page of a /jupyterfs/listing directory listing. Requests can ask for fewer with the 'limit' argument"
+        ),
+    )
+
+    listing_stream_batch_size = Int(
+        default_value=200,
+        config=True,
+        help=_i18n("number of entries of a streamed /jupyterfs/listing directory listing sent at a time"),
+    )
+
+    usage_concurrency = Int(
+        default_value=8,
+        config=True,
+        help=_i18n("number of subdirectories walked at the same time when computing the disk usage of a directory"),
+    )
+
+    search_concurrency = Int(
+        default_value=8,
+        config=True,
+        help=_i18n("number of directories listed at the same time when searching a drive"),
+    )
+
+    search_max_results = Int(
+        default_value=1000,
+        config=True,
+        help=_i18n("maximum number of matches returned by a search. Requests can ask for fewer with the 'limit' argument"),
+    )
+
+    search_timeout = Float(
+        default_value=30.0,
+        config=True,
+        help=_i18n("maximum number of seconds a search runs for. Requests can ask for less with the 'timeout' argument"),
+    )
+
+    batch_concurrency = Int(
+        default_value=8,
+        config=True,
+        help=_i18n("number of operations of a /jupyterfs/batch request that are run at the same time on each drive"),
+    )
+
+    metadata_index = Bool(
+        default_value=False,
+        config=True,
+        help=_i18n(
+            "keep an on-disk (SQLite) index of the metadata of each drive, crawled in the background, to answer "
+            "/jupyterfs/index listing, search and disk usage queries from. Resources can override this with their 'index' key"
+        ),
+    )
+
+    index_dir = Unicode(
+        default_value="",
+        config=True,
+        help=_i18n("directory the metadata indexes are stored in. Defaults to a jupyterfs-index directory in the jupyter runtime dir"),
+    )
+
+    index_refresh_interval = Float(
+        default_value=3600.0,
+        config=True,
+        help=_i18n("seconds after which an indexed directory is listed again, to pick up changes not made through jupyter-fs"),
+    )
+
+    index_crawl_concurrency = Int(
+        default_value=2,
+        config=True,
+        help=_i18n("number of directories of each indexed drive listed at the same time by its crawler"),
+    )
+
     snippets = List(
         config=True,
         per_key_traits=Dict(
@@ -0,0 +1,117 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado.web import HTTPError
+
+__all__ = ("DriveExecutor",)
+
+
+# the executors a slot of which is held by the current task, so that the calls it nests on the same drive do not wait for another
+_holding = contextvars.ContextVar("jupyterfs_holding", default=frozenset())
+
+
+class DriveExecutor:
+    """A bounded thread pool that runs the blocking backend calls of a single drive.
+
+    Each drive gets its own executor, so a hung or slow backend only stalls
+    the requests for that drive instead of the whole server event loop.
+
+    The calls of async managers are coroutines, that are run on the event loop (see `run_coroutine`) within
+    the same limits. The thread pool is only started by the first blocking call, so async drives have none.
+
+    Args:
+        name (str): the drive prefix, used to name the worker threads
+        max_workers (int): number of worker threads for the drive (and of coroutines it runs at the same time)
+        max_queue (int): number of calls allowed to wait for a free worker.
+            Calls beyond that are rejected with a 503. 0 means unbounded.
+    """
+
+    def __init__(self, name, max_workers=4, max_queue=0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = None
+        self._shutdown = False
+        self._slots = asyncio.Semaphore(max_workers)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Number of calls that are either running or waiting for a worker"""
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def _admit(self):
+        # called with the lock held
+        if self.max_queue and self._pending >= self.max_workers + self.max_queue:
+            raise HTTPError(503, "Too many pending requests for drive %r" % self.name)
+        self._pending += 1
+
+    def submit(self, func, *args, **kwargs):
+        """Schedule func(*args, **kwargs) on the pool, and return a concurrent future.
+        The caller's contextvars are carried over to the worker thread."""
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new calls after shutdown")
+            self._admit()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="jupyterfs-{}".format(self.name or "root"),
+                )
+            pool = self._pool
+
+        ctx = contextvars.copy_context()
+        try:
+            future = pool.submit(ctx.run, func, *args, **kwargs)
+        except BaseException:
+            self._release(None)
+            raise
+        # release the slot when the call actually finishes, even if the awaiting request was cancelled
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) on the pool and await its result"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    async def run_coroutine(self, func, *args, **kwargs):
+        """Await the coroutine function func(*args, **kwargs) on the event loop, as one of the calls of the drive:
+        at most max_workers of them run at the same time, and calls beyond max_queue waiting for their turn are
+        rejected with a 503. The calls it makes on the drive itself run within its slot.
+        """
+        holding = _holding.get()
+        if self in holding:
+            return await func(*args, **kwargs)
+        with self._lock:
+            self._admit()
+        try:
+            async with self._slots:
+                token = _holding.set(holding | {self})
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    _holding.reset(token)
+        finally:
+            self._release(None)
+
+    def shutdown(self):
+        """Stop accepting calls, and drop any that have not started yet"""
+        with self._lock:
+            self._shutdown = True
+            pool = self._pool
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -9,8 +9,14 @@ import warnings
 
 from jupyter_server.utils import url_path_join
 
-from .metamanager import MetaManager, MetaManagerHandler, MetaManagerShared
+from .batch import BatchHandler
+from .files import FilesHandler
+from .index import IndexHandler
+from .listing import ListingHandler
+from .metamanager import MetaManager, MetaManagerHandler, MetaManagerShared, MetaManagerStatsHandler
+from .search import SearchHandler
 from .snippets import SnippetsHandler
+from .usage import DiskUsageHandler
 
 _mm_config_warning_msg = """Misconfiguration of MetaManager. Please add:
 
@@ -50,6 +56,13 @@ def _load_jupyter_server_extension(serverapp):
         host_pattern,
         [
             (url_path_join(base_url, resources_url), MetaManagerHandler),
+            (url_path_join(base_url, "jupyterfs/stats"), MetaManagerStatsHandler),
             (url_path_join(base_url, "jupyterfs/snippets"), SnippetsHandler),
+            (url_path_join(base_url, r"jupyterfs/files/(.*)"), FilesHandler),
+            (url_path_join(base_url, r"jupyterfs/listing/(.*)"), ListingHandler),
+            (url_path_join(base_url, "jupyterfs/batch"), BatchHandler),
+            (url_path_join(base_url, r"jupyterfs/du/(.*)"), DiskUsageHandler),
+            (url_path_join(base_url, r"jupyterfs/search/(.*)"), SearchHandler),
+            (url_path_join(base_url, r"jupyterfs/index/(.*)"), IndexHandler),
         ],
     )
@@ -0,0 +1,210 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import io
+import json
+import mimetypes
+import re
+import sys
+from urllib.parse import quote
+
+from jupyter_client.jsonutil import json_default
+from jupyter_server.base.handlers import JupyterHandler
+from tornado import web
+from tornado.iostream import StreamClosedError
+
+from .config import JupyterFs as JupyterFsConfig
+from .manager.metrics import count_bytes, drive_labels
+from .pathutils import _call_async, _resolve_path, _run_async
+
+__all__ = ("FilesHandler",)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# keep a reference to the tasks aborting uploads, so that they run to completion
+_aborting = set()
+
+
+def _parse_range(header, size):
+    """Parse a single-range `Range` header into a (start, end) tuple, end excluded.
+    Returns None when the whole file should be served instead.
+
+    Raises a 416 HTTPError if the range is valid, but cannot be satisfied (e.g. it starts past the end of the file).
+    """
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None or size is None:
+        # malformed, multiple ranges, or unknown size: ignore the header, as permitted by RFC 9110
+        return None
+    first, last = match.groups()
+    if (not first and not last) or (first and last and int(last) < int(first)):
+        # an invalid range, that RFC 9110 asks to ignore
+        return None
+    if not first:
+        # suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise web.HTTPError(416, "Range not satisfiable: %r" % header)
+    return start, end
+
+
+@web.stream_request_body
+class FilesHandler(JupyterHandler):
+    """Streams the raw bytes of a file on a jupyter-fs drive, in either direction.
+
+    Unlike the contents API, the file is never fully loaded in memory (nor base64-encoded):
+    it is read from the backend in chunks of `stream_chunk_size` bytes, and each chunk is
+    flushed to the client before the next one is read. Single-range `Range` requests are supported.
+
+    Likewise, the raw body of a PUT is written to the file as it arrives, at most `stream_chunk_size`
+    bytes at a time, and replies with the contents model (without content) of the file.
+
+    e.g. GET /jupyterfs/files/<drive>:path/to/file.bin
+    """
+
+    _jupyterfsConfig = None
+    _writer = None
+
+    @property
+    def fsconfig(self):
+        # TODO: This pattern will not pick up changes to config after this!
+        if self._jupyterfsConfig is None:
+            self._jupyterfsConfig = JupyterFsConfig(config=self.config)
+
+        return self._jupyterfsConfig
+
+    async def prepare(self):
+        await super().prepare()
+        if self.request.method != "PUT":
+            return
+        if self.current_user is None:
+            raise web.HTTPError(403)
+
+        # the body is streamed, so there is no reason to hold it to tornado's in-memory limit
+        self.request.connection.set_max_body_size(self.fsconfig.stream_max_upload_size or sys.maxsize)
+        cm = self.contents_manager
+        self._upload = _resolve_path(self.path_args[0], cm._managers)
+        prefix, mgr, mgr_path = self._upload
+        if not hasattr(mgr, "open_writer"):
+            raise web.HTTPError(400, "Streaming is not supported for %r" % self.path_args[0])
+        self._upload_buffer = bytearray()
+        self._writer = await _call_async(cm, prefix, mgr, "open_writer", mgr_path)
+
+    async def data_received(self, chunk):
+        if self._writer is None:
+            return
+        self._upload_buffer += chunk
+        if len(self._upload_buffer) >= self.fsconfig.stream_chunk_size:
+            await self._flush_upload()
+
+    async def _flush_upload(self):
+        data, self._upload_buffer = bytes(self._upload_buffer), bytearray()
+        if data:
+            await _run_async(self.contents_manager, self._upload[0], self._writer.write, data)
+            count_bytes("written", len(data), drive_labels(self.contents_manager, self._upload[0]))
+
+    @web.authenticated
+    async def put(self, path):
+        cm = self.contents_manager
+        prefix, mgr, mgr_path = self._upload
+        await self._flush_upload()
+        writer, self._writer = self._writer, None
+        await _run_async(cm, prefix, writer.close)
+
+        model = await _call_async(cm, prefix, mgr, "get", mgr_path, content=False)
+        self.set_status(201)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(model, default=json_default))
+
+    def on_finish(self):
+        # the upload did not complete (e.g. the client went away, or a write failed)
+        if self._writer is not None:
+            writer, self._writer = self._writer, None
+            discard = getattr(writer, "discard", None) or writer.close
+            task = asyncio.ensure_future(_run_async(self.contents_manager, self._upload[0], discard))
+            _aborting.add(task)
+            task.add_done_callback(_aborting.discard)
+            task.add_done_callback(self._log_abort)
+
+    def on_connection_close(self):
+        self.on_finish()
+
+    def _log_abort(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            self.log.error("Failed to abort the upload to %r", self.path_args[0], exc_info=task.exception())
+
+    @web.authenticated
+    async def head(self, path):
+        await self.get(path, include_body=False)
+
+    @web.authenticated
+    async def get(self, path, include_body=True):
+        cm = self.contents_manager
+        prefix, mgr, mgr_path = _resolve_path(path, cm._managers)
+        if not hasattr(mgr, "open_binary"):
+            raise web.HTTPError(400, "Streaming is not supported for %r" % path)
+
+        model = await _call_async(cm, prefix, mgr, "get", mgr_path, content=False)
+        if model["type"] == "directory":
+            raise web.HTTPError(400, "%s is a directory" % path, reason="bad type")
+
+        f = await _call_async(cm, prefix, mgr, "open_binary", mgr_path)
+        try:
+            # the size of the model may be stale (it can be cached), that of the opened file is not
+            size = await self._size(prefix, f)
+
+            self.set_header("Accept-Ranges", "bytes")
+            self.set_header("Content-Type", mimetypes.guess_type(model["name"])[0] or "application/octet-stream")
+            if self.get_argument("download", None):
+                self.set_header("Content-Disposition", "attachment; filename*=utf-8''%s" % quote(model["name"]))
+
+            byte_range = _parse_range(self.request.headers.get("Range"), size)
+            if byte_range is not None:
+                start, end = byte_range
+                self.set_status(206)
+                self.set_header("Content-Range", "bytes %d-%d/%d" % (start, end - 1, size))
+            else:
+                start, end = 0, size
+            if end is not None:
+                self.set_header("Content-Length", end - start)
+
+            if include_body:
+                await self._stream(prefix, f, start, end)
+        except StreamClosedError:
+            self.log.debug("Client went away while streaming %r", path)
+        finally:
+            await _run_async(cm, prefix, f.close)
+
+    async def _size(self, prefix, f):
+        """The size of an opened file, or None if it cannot be seeked"""
+        cm = self.contents_manager
+        try:
+            size = await _run_async(cm, prefix, f.seek, 0, io.SEEK_END)
+            await _run_async(cm, prefix, f.seek, 0)
+        except (OSError, ValueError):
+            return None
+        return size
+
+    async def _stream(self, prefix, f, start, end):
+        cm = self.contents_manager
+        chunk_size = self.fsconfig.stream_chunk_size
+        labels = drive_labels(cm, prefix)
+        if start:
+            await _run_async(cm, prefix, f.seek, start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            chunk = await _run_async(cm, prefix, f.read, chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            count_bytes("read", len(chunk), labels)
+            if remaining is not None:
+                remaining -= len(chunk)
+            self.write(chunk)
+            await self.flush()
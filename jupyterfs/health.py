@@ -0,0 +1,92 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+
+from tornado import web
+
+from .pathutils import _call_async
+
+__all__ = ("HealthChecker",)
+
+
+def _retrieve(future):
+    # probes that complete after their drive went away are never awaited again
+    if not future.cancelled():
+        future.exception()
+
+
+class HealthChecker:
+    """Probes the backends of the drives of a contents manager in the background, with the `check_health` method of
+    their manager, and records in their resources whether they are "ok" or "degraded" (with the reason in "healthError", that only
+    details the error of the probe if `surface_init_errors` is set).
+
+    A probe that does not complete within `timeout` seconds marks its drive as degraded. As a blocking call can not be
+    interrupted, it is left to run, and the drive is not probed again until it completes.
+
+    Args:
+        cm (MetaManagerShared): the contents manager whose drives are probed
+        interval (float): seconds between two rounds of probes. 0 runs a single round
+        timeout (float): seconds after which a probe that has not completed marks its drive as degraded
+    """
+
+    def __init__(self, cm, interval=60.0, timeout=10.0):
+        self.cm = cm
+        self.interval = interval
+        self.timeout = timeout
+        self._task = None
+        self._probes = {}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.check_all()
+            if not self.interval:
+                return
+            await asyncio.sleep(self.interval)
+
+    async def check_all(self):
+        """Probe every initialized drive once"""
+        drives = {resource["drive"] for resource in self.cm.resources if resource["init"] is True}
+        await asyncio.gather(*(self.check(drive) for drive in drives))
+        for drive in set(self._probes) - drives:
+            # the drive went away
+            del self._probes[drive]
+
+    async def check(self, prefix):
+        mgr = self.cm._managers.get(prefix)
+        if mgr is None or not hasattr(mgr, "check_health"):
+            return
+        probe = self._probes.get(prefix)
+        if probe is None or probe.done():
+            probe = self._probes[prefix] = asyncio.ensure_future(_call_async(self.cm, prefix, mgr, "check_health"))
+            probe.add_done_callback(_retrieve)
+        done, _ = await asyncio.wait([probe], timeout=self.timeout)
+        if not done:
+            self.cm._set_health(prefix, "degraded", "No answer from the backend within %ss" % self.timeout)
+        elif probe.exception() is not None:
+            e = probe.exception()
+            self.cm.log.warning("Health check of drive %s failed: %s", prefix, e)
+            self.cm._set_health(prefix, "degraded", self._reason(e))
+        else:
+            self.cm._set_health(prefix, "ok")
+
+    def _reason(self, e):
+        """The reason reported to the client for a failed probe. The error itself is only surfaced with `surface_init_errors`,
+        as it may embed the url of the drive, and so the credentials substituted in it
+        """
+        if not self.cm._jupyterfsConfig.surface_init_errors:
+            return "The backend of the drive is unreachable"
+        return e.log_message if isinstance(e, web.HTTPError) else str(e)
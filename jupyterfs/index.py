@@ -0,0 +1,147 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+
+from .config import JupyterFs as JupyterFsConfig
+from .pathutils import _call_async, _resolve_path, _run_async
+
+__all__ = ("IndexCrawler", "IndexHandler")
+
+
+class IndexCrawler:
+    """Keeps the `MetadataIndex` of a drive up to date, in the background.
+
+    It lists the directories of the drive with the `scan_dir` method of its manager, `concurrency` at a time:
+    first those that were written to, then those that were never listed, then those that were last listed
+    more than `refresh_interval` seconds ago. Listing a directory adds its subdirectories to the index,
+    so the whole drive ends up being crawled, breadth first.
+
+    Args:
+        cm (MetaManagerShared): the contents manager the drive belongs to
+        prefix (str): the drive
+        index (MetadataIndex): the index of the drive
+        refresh_interval (float): seconds after which a directory is listed again
+        concurrency (int): the number of directories listed at the same time
+    """
+
+    # seconds to wait for, when there is nothing to crawl
+    idle_delay = 5.0
+
+    def __init__(self, cm, prefix, index, refresh_interval=3600.0, concurrency=2):
+        self.cm = cm
+        self.prefix = prefix
+        self.index = index
+        self.refresh_interval = refresh_interval
+        self.concurrency = concurrency
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            if not await self.crawl_once():
+                await asyncio.sleep(min(self.idle_delay, self.refresh_interval))
+
+    async def crawl_once(self):
+        """List the next `concurrency` directories that need it, and return how many were listed"""
+        paths = await _run_async(self.cm, self.prefix, self.index.dirs_to_crawl, self.refresh_interval, self.concurrency)
+        await asyncio.gather(*(self._crawl(path) for path in paths))
+        return len(paths)
+
+    async def _crawl(self, path):
+        mgr = self.cm._managers.get(self.prefix)
+        if mgr is None:
+            # the drive went away
+            self.stop()
+            return
+        crawled = time.time()
+        try:
+            entries = await _call_async(self.cm, self.prefix, mgr, "scan_dir", path)
+        except Exception as e:
+            if isinstance(e, web.HTTPError) and e.status_code in (403, 404):
+                # gone (or no longer readable) since it was listed
+                if path:
+                    await _run_async(self.cm, self.prefix, self.index.remove, path)
+                    return
+                entries = []
+            else:
+                self.cm.log.warning("Failed to index %r on drive %s, will retry later", path, self.prefix, exc_info=True)
+                # keep what the index has, and retry after refresh_interval
+                entries = await _run_async(self.cm, self.prefix, self.index.listing, path) or []
+        await _run_async(self.cm, self.prefix, self.index.replace_listing, path, entries, crawled)
+
+
+def _timestamp(fresh_as_of):
+    return None if fresh_as_of is None else datetime.fromtimestamp(fresh_as_of, tz=timezone.utc).isoformat()
+
+
+class IndexHandler(APIHandler):
+    """Answers listing, search and disk usage queries on an indexed jupyter-fs drive from its metadata index,
+    without going to the backend. Every answer says when the index was last brought up to date with the
+    backend for it ("fresh_as_of"), and whether every directory it covers has been indexed ("complete").
+
+    e.g. GET /jupyterfs/index/<drive>:path/to/dir                  lists the directory
+         GET /jupyterfs/index/<drive>:path/to/dir?pattern=*.csv    searches below it (see `search`)
+         GET /jupyterfs/index/<drive>:path/to/dir?usage=1          sums up the disk usage below it
+    """
+
+    _jupyterfsConfig = None
+
+    @property
+    def fsconfig(self):
+        # TODO: This pattern will not pick up changes to config after this!
+        if self._jupyterfsConfig is None:
+            self._jupyterfsConfig = JupyterFsConfig(config=self.config)
+
+        return self._jupyterfsConfig
+
+    @web.authenticated
+    async def get(self, path):
+        cm = self.contents_manager
+        prefix, _, mgr_path = _resolve_path(path, cm._managers)
+        index = cm._drive_index(prefix)
+        if index is None:
+            raise web.HTTPError(404, "Drive is not indexed: %r" % path)
+
+        pattern = self.get_argument("pattern", None)
+        recursive = pattern is not None or self.get_argument("usage", None) is not None
+        fresh_as_of, complete = await _run_async(cm, prefix, index.freshness, mgr_path, recursive)
+        reply = {"path": path, "fresh_as_of": _timestamp(fresh_as_of), "complete": complete}
+        if pattern is not None:
+            if not pattern:
+                raise web.HTTPError(400, "Missing search pattern")
+            try:
+                limit = min(int(self.get_argument("limit", self.fsconfig.search_max_results)), self.fsconfig.search_max_results)
+            except ValueError:
+                raise web.HTTPError(400, "Invalid limit")
+            reply["matches"] = self._drive_paths(prefix, await _run_async(cm, prefix, index.search, mgr_path, pattern, limit))
+        elif recursive:
+            reply.update(await _run_async(cm, prefix, index.usage, mgr_path))
+        else:
+            reply["content"] = self._drive_paths(prefix, await _run_async(cm, prefix, index.listing, mgr_path))
+        self.finish(json.dumps(reply))
+
+    @staticmethod
+    def _drive_paths(prefix, entries):
+        if entries is not None and prefix:
+            for entry in entries:
+                entry["path"] = "%s:%s" % (prefix, entry["path"])
+        return entries
@@ -0,0 +1,128 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import json
+
+from jupyter_client.jsonutil import json_default
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+from tornado.iostream import StreamClosedError
+
+from .config import JupyterFs as JupyterFsConfig
+from .manager.cache import request_scope
+from .pathutils import _call_async, _resolve_path, _run_async
+
+__all__ = ("ListingHandler", "stream_listing")
+
+
+async def stream_listing(cm, path, batch_size):
+    """List the directory at path as its backend lists it, with the `iter_dir` method of the drive's manager.
+
+    Args:
+        cm (MetaManagerShared): the contents manager the drive belongs to
+        path (str): the drive path of the directory
+        batch_size (int): the maximum number of entries per batch
+    Yields:
+        list: the content-less models of a batch of entries. The last list ends with a dict that reports that
+            the listing is "done", and the "count" of entries listed
+    """
+    prefix, mgr, mgr_path = _resolve_path(path, cm._managers)
+    if not hasattr(mgr, "iter_dir"):
+        raise web.HTTPError(400, "Streamed listings are not supported for %r" % path)
+    count = 0
+    batches = mgr.iter_dir(mgr_path, batch_size)
+    if hasattr(batches, "__anext__"):
+        try:
+            async for batch in batches:
+                count += len(batch)
+                yield batch
+        finally:
+            await batches.aclose()
+    else:
+        # each step of the generator makes blocking calls, so is run on the executor of the drive
+        try:
+            while True:
+                with request_scope():
+                    batch = await _run_async(cm, prefix, next, batches, None)
+                if batch is None:
+                    break
+                count += len(batch)
+                yield batch
+        finally:
+            try:
+                batches.close()
+            except ValueError:
+                # cancelled while a step is still running on the executor: the generator is dropped once it is done
+                pass
+    yield [{"done": True, "count": count}]
+
+
+class ListingHandler(APIHandler):
+    """Lists a directory on a jupyter-fs drive a page at a time, sorted by name. The reply is the directory's
+    contents model, with the entries of the page as its content, and the `cursor` to ask for the next page
+    with (None on the last page).
+
+    With `stream` set, the whole listing is streamed instead, as newline delimited JSON entry models, in the
+    order the backend lists them (see `stream_listing`). The last line has "done" set.
+
+    e.g. GET /jupyterfs/listing/<drive>:path/to/dir?limit=500
+         GET /jupyterfs/listing/<drive>:path/to/dir?limit=500&cursor=<cursor>
+         GET /jupyterfs/listing/<drive>:path/to/dir?stream=1
+    """
+
+    _jupyterfsConfig = None
+
+    @property
+    def fsconfig(self):
+        # TODO: This pattern will not pick up changes to config after this!
+        if self._jupyterfsConfig is None:
+            self._jupyterfsConfig = JupyterFsConfig(config=self.config)
+
+        return self._jupyterfsConfig
+
+    @web.authenticated
+    async def get(self, path):
+        if self.get_argument("stream", None) is not None:
+            return await self._stream(path)
+        maximum = self.fsconfig.listing_max_page_size
+        try:
+            limit = min(int(self.get_argument("limit", maximum)), maximum)
+        except ValueError:
+            raise web.HTTPError(400, "Invalid limit")
+        cm = self.contents_manager
+        prefix, mgr, mgr_path = _resolve_path(path, cm._managers)
+        if not prefix:
+            # the root contents manager is not a jupyter-fs one, and does not page its listings
+            raise web.HTTPError(400, "Paged listings are not supported for %r" % path)
+        model = await _call_async(
+            cm, prefix, mgr, "get", mgr_path, content=True, type="directory", limit=limit, cursor=self.get_argument("cursor", None)
+        )
+        self.finish(json.dumps(model, default=json_default))
+
+    async def _stream(self, path):
+        batches = stream_listing(self.contents_manager, path, self.fsconfig.listing_stream_batch_size)
+        # errors on the listed directory itself are still reported with an http status
+        first = await batches.__anext__()
+        self.set_header("Content-Type", "application/x-ndjson")
+        self.set_header("Cache-Control", "no-cache")
+        try:
+            self.write("".join(json.dumps(model, default=json_default) + "\n" for model in first))
+            await self.flush()
+            async for batch in batches:
+                self.write("".join(json.dumps(model, default=json_default) + "\n" for model in batch))
+                await self.flush()
+        except StreamClosedError:
+            self.log.debug("Client went away while listing %s", path)
+            return
+        except Exception as e:
+            # too late for an error status: report it in the stream instead
+            self.log.exception("Failed to list %s", path)
+            message = e.log_message if isinstance(e, web.HTTPError) else str(e)
+            self.write(json.dumps({"error": message, "done": True}) + "\n")
+        finally:
+            await batches.aclose()
+        self.finish()
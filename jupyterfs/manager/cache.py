@@ -0,0 +1,269 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+__all__ = (
+    "AggregateCache",
+    "MetadataCache",
+    "request_memo",
+    "request_scope",
+)
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+_request_memo = contextvars.ContextVar("jupyterfs_request_memo", default=None)
+
+
+@contextmanager
+def request_scope():
+    """Memoize `request_memo` lookups until the end of the block. Nested scopes share the outermost memo."""
+    if _request_memo.get() is not None:
+        yield
+        return
+    token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(token)
+
+
+def request_memo(key, loader):
+    """Call loader() once per key within the current request scope, or on every call outside of one"""
+    memo = _request_memo.get()
+    if memo is None:
+        return loader()
+    try:
+        return memo[key]
+    except KeyError:
+        value = memo[key] = loader()
+        return value
+
+
+class MetadataCache:
+    """A bounded, thread-safe cache of backend metadata (info dicts and directory listings), keyed by (kind, path).
+
+    Entries are fresh for `ttl` seconds. For a further `stale_ttl` seconds, a stale entry is still served,
+    while a single background refresh brings it up to date (stale-while-revalidate). Past that, or when the
+    cache holds more than `max_entries`, entries are dropped in LRU order.
+
+    Args:
+        ttl (float): seconds an entry is fresh for. 0 disables the cache
+        stale_ttl (float): seconds an expired entry may still be served while it is refreshed
+        max_entries (int): maximum number of cached entries
+    """
+
+    def __init__(self, ttl=5.0, stale_ttl=30.0, max_entries=1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._refreshing = set()
+        self._refresh_pool = None
+        self._refresh_tasks = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def _key(kind, path):
+        return kind, path.rstrip("/")
+
+    def lookup(self, kind, path):
+        """Returns a (state, value) tuple, where state is one of FRESH, STALE or MISS"""
+        key = self._key(kind, path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored = entry
+                age = now - stored
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return FRESH, value
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return STALE, value
+                del self._entries[key]
+            self.misses += 1
+            return MISS, None
+
+    def put(self, kind, path, value, generation=None):
+        """Store a value, unless the cache was invalidated since `generation` was taken"""
+        if not self.enabled:
+            return
+        key = self._key(kind, path)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def invalidate(self, *paths):
+        """Drop everything cached about paths: their info and listing, the listing and
+        info of their parent directories, and anything cached below them"""
+        with self._lock:
+            self._generation += 1
+            for path in paths:
+                path = path.rstrip("/")
+                parent = path.rsplit("/", 1)[0] if "/" in path else ""
+                prefix = path + "/"
+                for key in list(self._entries):
+                    if key[1] in (path, parent) or key[1].startswith(prefix):
+                        del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+    def _begin_refresh(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _end_refresh(self, key):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def _drop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def fetch(self, kind, path, loader):
+        """Get a value from the cache, calling loader() to (re)load it when needed"""
+        if not self.enabled:
+            return loader()
+        state, value = self.lookup(kind, path)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            key = self._key(kind, path)
+            if self._begin_refresh(key):
+                if self._refresh_pool is None:
+                    self._refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jupyterfs-cache")
+                self._refresh_pool.submit(self._refresh, kind, path, loader, self.generation)
+            return value
+        generation = self.generation
+        value = loader()
+        self.put(kind, path, value, generation)
+        return value
+
+    def memoize(self, kind, path, loader):
+        """Like `fetch`, but for values that are cheap to recompute: only fresh entries are served,
+        anything else is reloaded in the calling thread"""
+        state, value = self.lookup(kind, path) if self.enabled else (MISS, None)
+        if state == FRESH:
+            return value
+        generation = self.generation
+        value = loader()
+        self.put(kind, path, value, generation)
+        return value
+
+    def _refresh(self, kind, path, loader, generation):
+        key = self._key(kind, path)
+        try:
+            self.put(kind, path, loader(), generation)
+        except Exception:
+            self._drop(key)
+        finally:
+            self._end_refresh(key)
+
+    async def afetch(self, kind, path, loader):
+        """Same as `fetch`, for a loader that is a coroutine function"""
+        if not self.enabled:
+            return await loader()
+        state, value = self.lookup(kind, path)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            if self._begin_refresh(self._key(kind, path)):
+                task = asyncio.ensure_future(self._arefresh(kind, path, loader, self.generation))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_tasks.discard)
+            return value
+        generation = self.generation
+        value = await loader()
+        self.put(kind, path, value, generation)
+        return value
+
+    async def _arefresh(self, kind, path, loader, generation):
+        key = self._key(kind, path)
+        try:
+            self.put(kind, path, await loader(), generation)
+        except Exception:
+            self._drop(key)
+        finally:
+            self._end_refresh(key)
+
+
+class AggregateCache(MetadataCache):
+    """A cache of values aggregated over whole subtrees, e.g. the disk usage of a directory.
+
+    Any change below a directory changes its aggregates, so invalidating a path drops its entries,
+    those of everything below it, and those of all of its ancestors.
+
+    Args:
+        ttl (float): seconds an entry is fresh for. 0 disables the cache
+        max_entries (int): maximum number of cached entries
+    """
+
+    def __init__(self, ttl=300.0, max_entries=4096):
+        super().__init__(ttl=ttl, stale_ttl=0, max_entries=max_entries)
+
+    def invalidate(self, *paths):
+        with self._lock:
+            self._generation += 1
+            ancestors = set()
+            prefixes = []
+            for path in paths:
+                path = path.rstrip("/")
+                prefixes.append(path + "/")
+                ancestors.add(path)
+                while path:
+                    path = path.rsplit("/", 1)[0] if "/" in path else ""
+                    ancestors.add(path)
+            prefixes = tuple(prefixes)
+            for key in list(self._entries):
+                if key[1] in ancestors or key[1].startswith(prefixes):
+                    del self._entries[key]
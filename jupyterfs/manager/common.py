@@ -5,9 +5,14 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import base64
+import bisect
+import json
 from datetime import datetime
 
 from jupyter_server import _tz as tz
+from jupyter_server.services.contents.manager import copy_pat
+from tornado import web
 
 __all__ = (
     "EPOCH_START",
@@ -22,3 +27,137 @@ class FileSystemLoadError(RuntimeError):
     """Raised when a filesystem cannot be loaded."""
 
     pass
+
+
+def _check_byte_range(path, type, offset, length):
+    """Validate the offset/length of a partial read. Returns whether a partial read was requested."""
+    if offset is None and length is None:
+        return False
+    if type not in (None, "file"):
+        raise web.HTTPError(400, "Byte ranges can only be read from files, not a %s: %s" % (type, path), reason="bad type")
+    if (offset is not None and offset < 0) or (length is not None and length < 0):
+        raise web.HTTPError(400, "Invalid byte range for %s: offset=%r, length=%r" % (path, offset, length))
+    return True
+
+
+def _set_byte_range(model, offset, length):
+    """Record which part of the file the contents of a partial read cover, given the total size of the file"""
+    start = offset or 0
+    size = model.get("size")
+    model["offset"] = start
+    if size is None:
+        model["length"] = length
+    else:
+        model["length"] = max(min(size - start, size if length is None else length), 0)
+
+
+def _check_page(path, type, limit, cursor):
+    """Validate the limit/cursor of a paged directory listing.
+
+    Returns:
+        tuple: (paged, after): whether a page was requested, and the name the page starts after (None for the first page)
+    """
+    if limit is None and cursor is None:
+        return False, None
+    if type not in (None, "directory"):
+        raise web.HTTPError(400, "Only directory listings can be paged, not a %s: %s" % (type, path), reason="bad type")
+    if limit is not None and limit <= 0:
+        raise web.HTTPError(400, "Invalid page size for %s: limit=%r" % (path, limit))
+    if cursor is None:
+        return True, None
+    try:
+        return True, json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["after"]
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise web.HTTPError(400, "Invalid cursor for %s: %r" % (path, cursor))
+
+
+def _cursor(name):
+    """The opaque continuation token of a page of a directory listing that ends with the entry called name"""
+    return base64.urlsafe_b64encode(json.dumps({"after": name}).encode("utf-8")).decode("ascii")
+
+
+def _page(names, limit, after):
+    """Slice a page out of the sorted names of a directory: those that sort after `after`, at most limit of them.
+    Returns the page, and whether there are names left after it
+    """
+    start = 0 if after is None else bisect.bisect_right(names, after)
+    end = len(names) if limit is None else start + limit
+    return names[start:end], end < len(names)
+
+
+def _copy_names(from_path, to_path):
+    """Split the paths of a copy as `ContentsManager.copy` does. Returns (from_name, to_path, is_destination_specified)"""
+    from_dir, _, from_name = from_path.strip("/").rpartition("/")
+    if to_path is None:
+        return from_name, from_dir, False
+    return from_name, to_path.strip("/"), True
+
+
+def _copy_destination(cm, from_path, to_path=None):
+    """Resolve the path a file or directory is copied to, the same way as `ContentsManager.copy`:
+    if to_path is not given, the copy is made next to the source, and if it is an existing directory,
+    the copy is made in it. In both cases it is named `from_name-Copy#.ext`.
+    """
+    from_name, to_path, is_destination_specified = _copy_names(from_path, to_path)
+    if cm.dir_exists(to_path):
+        to_name = cm.increment_filename(copy_pat.sub(".", from_name), to_path, insert="-Copy")
+        return "%s/%s" % (to_path, to_name) if to_path else to_name
+    if not is_destination_specified:
+        raise web.HTTPError(404, "No such directory: %s" % to_path)
+    to_dir = to_path.rpartition("/")[0]
+    if to_dir and not cm.dir_exists(to_dir):
+        raise web.HTTPError(404, "No such parent directory: %s to copy file in" % to_dir)
+    if cm.exists(to_path):
+        raise web.HTTPError(409, "File already exists: %s" % to_path)
+    return to_path
+
+
+async def _acopy_destination(cm, from_path, to_path=None):
+    """Same as `_copy_destination`, for a contents manager whose `dir_exists`, `exists` and `increment_filename` are coroutines"""
+    from_name, to_path, is_destination_specified = _copy_names(from_path, to_path)
+    if await cm.dir_exists(to_path):
+        to_name = await cm.increment_filename(copy_pat.sub(".", from_name), to_path, insert="-Copy")
+        return "%s/%s" % (to_path, to_name) if to_path else to_name
+    if not is_destination_specified:
+        raise web.HTTPError(404, "No such directory: %s" % to_path)
+    to_dir = to_path.rpartition("/")[0]
+    if to_dir and not await cm.dir_exists(to_dir):
+        raise web.HTTPError(404, "No such parent directory: %s to copy file in" % to_dir)
+    if await cm.exists(to_path):
+        raise web.HTTPError(409, "File already exists: %s" % to_path)
+    return to_path
+
+
+def _usage():
+    return {"size": 0, "files": 0, "directories": 0}
+
+
+def _aggregate_usage(root, entries, hidden=False):
+    """Sum up the entries found below the directory at root into the disk usage of root, and of each directory below it.
+
+    Args:
+        root (str): the path of the directory
+        entries (iterable): a (path, is_dir, size) tuple for everything below root
+        hidden (bool): whether to count hidden (dot) entries, and what is below them
+    Returns:
+        dict: usage dicts (with the total "size" in bytes, and the number of "files" and "directories") keyed by directory path
+    """
+    root = root.rstrip("/")
+    usage = {root: _usage()}
+    for path, is_dir, size in entries:
+        path = path.rstrip("/")
+        if root and not path.startswith(root + "/"):
+            continue
+        parts = path[len(root) :].strip("/").split("/")
+        if not parts[0] or (not hidden and any(part.startswith(".") for part in parts)):
+            continue
+        if is_dir:
+            usage.setdefault(path, _usage())
+        ancestor = root
+        for part in [None, *parts[:-1]]:
+            if part is not None:
+                ancestor = "%s/%s" % (ancestor, part) if ancestor else part
+            totals = usage.setdefault(ancestor, _usage())
+            totals["directories" if is_dir else "files"] += 1
+            totals["size"] += 0 if is_dir else size or 0
+    return usage
@@ -14,14 +14,125 @@ from contextlib import contextmanager
 import nbformat
 from jupyter_server.services.contents.filemanager import FileContentsManager
 from tornado import web
-from traitlets import default
+from traitlets import Bool, Float, Int, default
 
+from .cache import AggregateCache, MetadataCache, request_memo
 from .checkpoints import NullCheckpoints
-from .common import EPOCH_START, FileSystemLoadError
+from .common import (
+    EPOCH_START,
+    FileSystemLoadError,
+    _aggregate_usage,
+    _check_byte_range,
+    _check_page,
+    _copy_destination,
+    _cursor,
+    _page,
+    _set_byte_range,
+    _usage,
+)
+from .metrics import count_bytes
+from .tracing import traced
+from .uploads import UploadSessions
 
 __all__ = ("FSManager",)
 
 
+class _StatAccess:
+    """Answers os.access-style questions from the stat info of a directory entry, for the current user,
+    so that a whole listing can be checked without a syscall per entry.
+
+    This is an approximation: it only considers mode bits, owner and group (plus a read-only mount flag),
+    and not ACLs, nor how a network filesystem maps users (e.g. NFS root_squash, or the uid mapping of an
+    SMB mount). So it is only used on OSFS drives, and can be turned off with `stat_access_checks` for those
+    that use ACLs or a network filesystem.
+    It returns None when it cannot decide (disabled, no stat info, or a platform without uids), in which case
+    the caller falls back on os.access.
+    """
+
+    def __init__(self, syspath=None, enabled=True):
+        import os
+
+        self.uid = os.getuid() if enabled and hasattr(os, "getuid") else None
+        self.gids = {os.getgid(), *os.getgroups()} if hasattr(os, "getgid") else set()
+        self.readonly = False
+        if syspath and hasattr(os, "statvfs"):
+            try:
+                self.readonly = bool(os.statvfs(syspath).f_flag & os.ST_RDONLY)
+            except OSError:
+                pass
+
+    def check(self, info, mode):
+        import os
+
+        st_mode = info.get("stat", "st_mode")
+        if self.uid is None or st_mode is None:
+            return None
+        if mode & os.W_OK and self.readonly:
+            return False
+        if self.uid == 0:
+            # root may read and write anything, as far as mode bits are concerned
+            return True
+        if info.get("stat", "st_uid") == self.uid:
+            bits = st_mode >> 6
+        elif info.get("stat", "st_gid") in self.gids:
+            bits = st_mode >> 3
+        else:
+            bits = st_mode
+        return bits & mode == mode
+
+
+class _StagedWrite:
+    """A binary write stream for path, that writes to a hidden temporary sibling of it, and moves that into place
+    when closed. Discarding it instead (e.g. when an upload is aborted) removes the temporary file, and leaves
+    path as it was.
+    """
+
+    def __init__(self, pyfs, path, on_close=None):
+        import uuid
+
+        from fs.path import basename, dirname, join
+
+        self._pyfs = pyfs
+        self.path = path
+        self.tmp_path = join(dirname(path), ".%s.upload-%s" % (basename(path), uuid.uuid4().hex[:12]))
+        self._on_close = on_close
+        self._f = pyfs.openbin(self.tmp_path, "w")
+
+    def write(self, data):
+        return self._f.write(data)
+
+    def close(self):
+        self._f.close()
+        try:
+            self._pyfs.move(self.tmp_path, self.path, overwrite=True)
+        except BaseException:
+            self._remove()
+            raise
+        if self._on_close is not None:
+            self._on_close()
+
+    def discard(self):
+        try:
+            self._f.close()
+        finally:
+            self._remove()
+
+    def _remove(self):
+        from fs.errors import ResourceNotFound
+
+        try:
+            self._pyfs.remove(self.tmp_path)
+        except ResourceNotFound:
+            pass
+
+
+def _close_pyfs(pyfs):
+    try:
+        pyfs.close()
+    except Exception:
+        pass  # closing is best effort, the filesystem is dropped anyway
+
+
 class FSManager(FileContentsManager):
     """This class bridges the gap between Pyfilesystem's filesystem class,
     and Jupyter Notebook's ContentsManager class. This allows Jupyter to
@@ -102,6 +213,44 @@ class FSManager(FileContentsManager):
         GenericCheckpointsMixin.get_notebook_checkpoint(…):         Get the content of a checkpoint for a notebook.
     """
 
+    hidden_cache_ttl = Float(
+        default_value=5.0,
+        config=True,
+        help="seconds for which the hidden-ness of a path is cached. 0 disables the cache",
+    )
+
+    hidden_cache_max_entries = Int(
+        default_value=4096,
+        config=True,
+        help="maximum number of hidden-ness results cached per drive",
+    )
+
+    usage_cache_ttl = Float(
+        default_value=300.0,
+        config=True,
+        help="seconds for which the disk usage of a directory is cached, unless something below it is written to. 0 disables the cache",
+    )
+
+    usage_cache_max_entries = Int(
+        default_value=4096,
+        config=True,
+        help="maximum number of directory disk usages cached per drive",
+    )
+
+    upload_idle_timeout = Float(
+        default_value=300.0,
+        config=True,
+        help="seconds after which a chunked upload that receives no further chunks is aborted",
+    )
+
+    stat_access_checks = Bool(
+        default_value=True,
+        config=True,
+        help="whether the access of the entries of an osfs directory listing is checked from their mode bits, rather than with an "
+        "access() call per entry. Mode bits do not account for ACLs, nor for how network filesystems (e.g. NFS, SMB) map users: "
+        "disable this for drives that use them",
+    )
+
     @classmethod
     def open_fs(cls, *args, **kwargs):
         from fs import open_fs
@@ -123,23 +272,93 @@ class FSManager(FileContentsManager):
             path = path or e.path or "unknown file"
             raise web.HTTPError(403, "Permission denied: %r" % path) from e
 
-    def __init__(self, fs, *args, default_writable=True, parent=None, **kwargs):
+    def __init__(self, fs, *args, default_writable=True, parent=None, lazy=False, pool=None, **kwargs):
         super().__init__(parent=parent)
+        import threading
+
         from fs import open_fs
         from fs.base import FS
 
         self._default_writable = default_writable
-        if isinstance(fs, str):
+        self._hidden_cache = MetadataCache(ttl=self.hidden_cache_ttl, stale_ttl=0, max_entries=self.hidden_cache_max_entries)
+        self._usage_cache = AggregateCache(ttl=self.usage_cache_ttl, max_entries=self.usage_cache_max_entries)
+        self._uploads = UploadSessions(idle_timeout=self.upload_idle_timeout)
+        # the MetadataIndex of the drive, if it is indexed (set by the MetaManager)
+        self._index = None
+        # returns the DriveExecutor of the drive, if it has one (set by the MetaManager)
+        self._get_executor = None
+        self._pyfs = None
+        self._open_lock = threading.Lock()
+        # the key of the pooled filesystem of the drive, once acquired
+        self._pool = pool
+        self._pool_key = None
+        if isinstance(fs, str) and pool is not None:
+            # pyfs is an opener url, whose filesystem is shared with the drives of the same backend
+            self._opener = lambda: self._open_pooled(fs, args, kwargs)
+        elif isinstance(fs, str):
             # pyfs is an opener url
-            self._pyfilesystem_instance = open_fs(fs, *args, **kwargs)
+            self._opener = lambda: open_fs(fs, *args, **kwargs)
         elif isinstance(fs, type) and issubclass(fs, FS):
             # pyfs is an FS subclass
-            self._pyfilesystem_instance = fs(*args, **kwargs)
+            self._opener = lambda: fs(*args, **kwargs)
         elif isinstance(fs, FS):
             # pyfs is a FS instance
-            self._pyfilesystem_instance = fs
+            self._pyfs = traced(fs)
         else:
             raise TypeError("fs must be a url, an FS subclass, or an FS instance")
+        if not lazy:
+            # open it right away, so that a broken backend fails the creation of the manager
+            self._open()
+
+    def _open_pooled(self, url, args, kwargs):
+        """Open the filesystem of url from the pool. Drives whose url only differs by the path after the `!`
+        (e.g. `smb://host/share!/dir1` and `smb://host/share!/dir2`) share the filesystem of the part before it.
+        """
+        import json
+
+        from fs import open_fs
+
+        base_url, _, path = url.partition("!")
+        key = ("pyfs", base_url, json.dumps([args, kwargs], sort_keys=True, default=repr))
+        base = self._pool.acquire(key, lambda: open_fs(base_url, *args, **kwargs), close=_close_pyfs)
+        try:
+            pyfs = base.opendir(path) if path.strip("/") else base
+        except Exception:
+            self._pool.release(key)
+            raise
+        self._pool_key = key
+        return pyfs
+
+    def close(self):
+        """Release the filesystem of the drive, if it is pooled. The manager must not be used after this"""
+        if self._pool_key is not None:
+            self._pool.release(self._pool_key)
+            self._pool_key = None
+
+    def _open(self):
+        if self._pyfs is None:
+            with self._open_lock:
+                if self._pyfs is None:
+                    # count (and trace) the calls made to the backend
+                    self._pyfs = traced(self._opener())
+        return self._pyfs
+
+    @property
+    def _pyfilesystem_instance(self):
+        """The pyfilesystem of the drive. If the manager was created lazily, it is opened on first use"""
+        from fs.errors import FSError
+        from fs.opener.errors import OpenerError
+
+        if self._pyfs is not None:
+            return self._pyfs
+        try:
+            return self._open()
+        except (FSError, OpenerError) as e:
+            raise web.HTTPError(503, "Could not connect to the drive: %s" % e) from e
+
+    def check_health(self):
+        """Check that the backend of the drive can be reached (opening it if needed). Raises if it can not"""
+        self._pyfilesystem_instance.getinfo("/")
 
     @staticmethod
     def create(*args, **kwargs):
@@ -210,15 +429,23 @@ class FSManager(FileContentsManager):
         Returns:
             hidden (bool): Whether the path or any of its parents are hidden.
         """
-        ppath = pathlib.PurePosixPath(path)
+        ppath = pathlib.PurePosixPath(path.strip("/"))
         # Path checks are quick, so we do it first to avoid unnecessary stat calls
         if any(part.startswith(".") for part in ppath.parts):
             return True
-        while ppath.parents:
-            if self._is_path_hidden(str(path), info):
-                return True
-            ppath = ppath.parent
-        return False
+        if not ppath.parts:
+            # the root of the drive is never hidden
+            return False
+        if self._is_ancestor_hidden(str(ppath), info):
+            return True
+        return any(self._is_ancestor_hidden(str(parent), None) for parent in ppath.parents if parent.parts)
+
+    def _is_ancestor_hidden(self, path, info):
+        """Memoized `_is_path_hidden`, for the duration of the current request and across requests for `hidden_cache_ttl`"""
+        return request_memo(
+            (id(self), "hidden", path),
+            lambda: self._hidden_cache.memoize("hidden", path, lambda: self._is_path_hidden(path, info)),
+        )
 
     def file_exists(self, path):
         """Returns True if the file exists, else returns False.
@@ -247,11 +474,12 @@ class FSManager(FileContentsManager):
         """
         return self._pyfilesystem_instance.exists(path)
 
-    def _base_model(self, path, info):
+    def _base_model(self, path, info, writable=None):
         """
         Build the common base of a contents model
 
         info (<Info>): FS Info object for file/dir at path -- used for values and reduces needed network calls
+        writable (bool): whether path is writable, if already known
         """
         from fs.errors import MissingInfoNamespace, NoSysPath, PermissionDenied
 
@@ -283,6 +511,10 @@ class FSManager(FileContentsManager):
         model["mimetype"] = None
         model["size"] = size
 
+        if writable is not None:
+            model["writable"] = writable
+            return model
+
         try:
             # The `access` namespace does not have the facilities for actually checking
             # whether the current user can read/exec the dir, so we use systempath
@@ -306,12 +538,12 @@ class FSManager(FileContentsManager):
             model["writable"] = False
         return model
 
-    def _dir_model(self, path, info, content=True):
+    def _dir_model(self, path, info, content=True, paged=False, limit=None, after=None):
         """Build a model for a directory
         if content is requested, will include a listing of the directory
         info (<Info>): FS Info object for file/dir at path
+        paged (bool): if set, only include the page of the listing given by limit and after (see `_listing_page`)
         """
-        from fs.errors import PermissionDenied
 
         four_o_four = "directory does not exist: %r" % path
 
@@ -326,32 +558,205 @@ class FSManager(FileContentsManager):
         model["type"] = "directory"
         model["size"] = None
         if content:
-            model["content"] = contents = []
+            if paged:
+                model["content"], model["cursor"] = self._listing_page(path, limit, after)
+            else:
+                entries = self._pyfilesystem_instance.scandir(path, namespaces=("basic", "access", "details", "stat"))
+                model["content"] = self._listing_models(path, entries)
+            model["format"] = "json"
+        return model
 
-            for dir_entry in self._pyfilesystem_instance.scandir(path, namespaces=("basic", "access", "details", "stat")):
+    def _listing_page(self, path, limit, after):
+        """Build the models of a page of the listing of the directory at path, in name order: the (at most) limit
+        entries whose name sorts after `after`. Only the names of the directory are listed in full, the entries
+        of the page are stat-ed one by one, so that a page of a large directory costs about as much as its size.
+
+        Returns:
+            tuple: the models of the page, and the cursor of the next page (None if this is the last one)
+        """
+        from fs.errors import PermissionDenied, ResourceNotFound
+
+        names = sorted(self._pyfilesystem_instance.listdir(path))
+        contents = []
+        while True:
+            # hidden entries are left out, so top the page up until it is full
+            batch, more = _page(names, None if limit is None else limit - len(contents), after)
+            infos = []
+            for name in batch:
                 try:
-                    if self.should_list(dir_entry.name):
-                        if self.allow_hidden or not self._is_path_hidden(dir_entry.make_path(path), dir_entry):
-                            contents.append(
-                                self.get(
-                                    path="%s/%s" % (path, dir_entry.name),
-                                    content=False,
-                                    info=dir_entry,
-                                )
-                            )
-                except PermissionDenied:
-                    pass  # Don't provide clues about protected files
-                except web.HTTPError:
-                    # ignore http errors: they are already logged, and shouldn't prevent
-                    # us from listing other entries
-                    pass
-                except Exception as e:
-                    self.log.warning("Error stat-ing %s: %s", dir_entry.make_path(path), e)
+                    infos.append(self._pyfilesystem_instance.getinfo("%s/%s" % (path, name), namespaces=("basic", "access", "details", "stat")))
+                except (ResourceNotFound, PermissionDenied):
+                    pass  # removed since the names were listed, or protected
+            contents.extend(self._listing_models(path, infos))
+            if batch:
+                after = batch[-1]
+            if not more or (limit is not None and len(contents) >= limit):
+                return contents, _cursor(after) if more else None
+
+    def _listing_models(self, path, entries):
+        """Build the content-less models of a batch of directory entries in one pass.
+
+        This gives the same models as calling `get(content=False, info=entry)` for each entry,
+        but the system path of the directory is looked up once, and the hidden/writable checks
+        are answered from the stat info of the entries rather than with syscalls per entry.
+
+        path (str): API path of the directory
+        entries (iterable of <Info>): FS Info objects of the entries, with the "basic", "access", "details" and "stat" namespaces
+        """
+        import os
 
-            model["format"] = "json"
+        from fs.errors import NoSysPath, PermissionDenied
+
+        try:
+            dir_syspath = self._pyfilesystem_instance.getsyspath(path)
+        except NoSysPath:
+            dir_syspath = None
+        access = self._stat_access(dir_syspath)
+
+        contents = []
+        for dir_entry in entries:
+            try:
+                if not self.should_list(dir_entry.name):
+                    continue
+                entry_path = ("%s/%s" % (path, dir_entry.name)).strip("/")
+                syspath = os.path.join(dir_syspath, dir_entry.name) if dir_syspath else None
+                if not self.allow_hidden:
+                    hidden = self._is_entry_hidden(dir_entry, syspath, access)
+                    if dir_entry.is_dir:
+                        # save the entry a stat when it is opened next
+                        self._hidden_cache.put("hidden", entry_path, hidden)
+                    if hidden:
+                        continue
+                contents.append(self._entry_model(entry_path, dir_entry, syspath, access))
+            except PermissionDenied:
+                pass  # Don't provide clues about protected files
+            except web.HTTPError:
+                # ignore http errors: they are already logged, and shouldn't prevent
+                # us from listing other entries
+                pass
+            except Exception as e:
+                self.log.warning("Error stat-ing %s: %s", dir_entry.make_path(path), e)
+        return contents
+
+    def scan_dir(self, path):
+        """The entries of the directory at path, as dicts with their "name", "type" ("directory" or "file"),
+        "size", "mtime" (a unix timestamp) and "etag", without building their models. Hidden entries are left out, unless allow_hidden.
+        This is what the drive is walked with, e.g. to search it.
+        """
+        import os
+
+        from fs.errors import DirectoryExpected, NoSysPath, ResourceNotFound
+
+        path = path.strip("/")
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        try:
+            dir_syspath = self._pyfilesystem_instance.getsyspath(path)
+        except NoSysPath:
+            dir_syspath = None
+        access = self._stat_access(dir_syspath)
+
+        entries = []
+        with self.perm_to_403(path):
+            try:
+                for info in self._pyfilesystem_instance.scandir(path, namespaces=("basic", "access", "details", "stat")):
+                    if not self.should_list(info.name):
+                        continue
+                    syspath = os.path.join(dir_syspath, info.name) if dir_syspath else None
+                    if not self.allow_hidden and self._is_entry_hidden(info, syspath, access):
+                        continue
+                    modified = info.modified
+                    entries.append(
+                        {
+                            "name": info.name,
+                            "type": "directory" if info.is_dir else "file",
+                            "size": None if info.is_dir else info.size,
+                            "mtime": modified.timestamp() if modified else None,
+                            "etag": None,
+                        }
+                    )
+            except (ResourceNotFound, DirectoryExpected):
+                raise web.HTTPError(404, "No such directory: %s" % path)
+        return entries
+
+    def iter_dir(self, path, batch_size=500):
+        """Generate the content-less models of the entries of the directory at path, in batches of at most batch_size,
+        in the order the backend lists them. Hidden entries are left out, unless allow_hidden.
+        Unlike `get`, the listing is consumed as it comes in, so it is never held in memory as a whole.
+        """
+        from itertools import islice
+
+        from fs.errors import DirectoryExpected, ResourceNotFound
+
+        path = path.strip("/")
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        with self.perm_to_403(path):
+            try:
+                entries = self._pyfilesystem_instance.scandir(path, namespaces=("basic", "access", "details", "stat"))
+                while True:
+                    batch = list(islice(entries, batch_size))
+                    if not batch:
+                        return
+                    models = self._listing_models(path, batch)
+                    if models:
+                        yield models
+            except (ResourceNotFound, DirectoryExpected):
+                raise web.HTTPError(404, "No such directory: %s" % path)
+
+    def _stat_access(self, dir_syspath):
+        """The `_StatAccess` of the entries of a directory. Mode bits are only trusted on an OSFS, whose system paths are local"""
+        from fs.osfs import OSFS
+
+        return _StatAccess(dir_syspath, enabled=self.stat_access_checks and isinstance(self._pyfilesystem_instance, OSFS))
+
+    def _is_entry_hidden(self, info, syspath, access):
+        """Same as `_is_path_hidden`, for a directory entry whose system path is already known"""
+        import os
+
+        if info.name.startswith("."):
+            return True
+        if info.get("stat", "st_file_attributes", 0) & stat.FILE_ATTRIBUTE_HIDDEN:
+            return True
+        if info.get("stat", "st_flags", 0) & stat.UF_HIDDEN:
+            return True
+        if info.is_dir and syspath:
+            readable = access.check(info, os.X_OK | os.R_OK)
+            if readable is None:
+                readable = not os.path.exists(syspath) or os.access(syspath, os.X_OK | os.R_OK)
+            return not readable
+        return False
+
+    def _entry_writable(self, info, syspath, access):
+        """Same as the writable check of `_base_model`, for a directory entry whose system path is already known"""
+        import os
+
+        from fs.errors import MissingInfoNamespace
+
+        if syspath is None:
+            try:
+                return info.permissions.check("u_w")
+            except (MissingInfoNamespace, AttributeError):
+                return self._default_writable
+        writable = access.check(info, os.W_OK)
+        if writable is None:
+            writable = os.access(syspath, os.W_OK)
+        return writable
+
+    def _entry_model(self, path, info, syspath, access):
+        """Same as `get(path, content=False, info=info)`, for a directory entry whose system path is already known"""
+        model = self._base_model(path, info, writable=self._entry_writable(info, syspath, access))
+        if info.is_dir:
+            model["type"] = "directory"
+            model["size"] = None
+        elif path.endswith(".ipynb"):
+            model["type"] = "notebook"
+        else:
+            model["type"] = "file"
+            model["mimetype"] = mimetypes.guess_type(path)[0]
         return model
 
-    def _read_file(self, path, format, info):
+    def _read_file(self, path, format, info, offset=None, length=None):
         """Read a non-notebook file.
         Args:
             path (str): The path to be read.
@@ -360,13 +765,26 @@ class FSManager(FileContentsManager):
                 If 'base64', the raw bytes contents will be encoded as base64.
                 If not specified, try to decode as UTF-8, and fall back to base64
             info (<Info>): FS Info object for file at path
+            offset (int): If given, start reading at this byte
+            length (int): If given, read at most this many bytes
         """
         with self.perm_to_403(path):
             if not info.is_file:
                 raise web.HTTPError(400, "Cannot read non-file %s" % path)
 
-            bcontent = self._pyfilesystem_instance.readbytes(path)
+            if offset is None and length is None:
+                bcontent = self._pyfilesystem_instance.readbytes(path)
+            else:
+                with self._pyfilesystem_instance.openbin(path, "r") as f:
+                    if offset:
+                        f.seek(offset)
+                    bcontent = f.read(-1 if length is None else length)
+        count_bytes("read", len(bcontent))
+
+        return self._decode_content(path, bcontent, format)
 
+    def _decode_content(self, path, bcontent, format):
+        """Decode the raw bytes of a file as per `_read_file`"""
         if format is None or format == "text":
             # Try to interpret as unicode if format is unknown or if unicode
             # was explicitly requested.
@@ -386,7 +804,7 @@ class FSManager(FileContentsManager):
         nb, format = self._read_file(path, "text", info)
         return nbformat.reads(nb, as_version=as_version)
 
-    def _file_model(self, path, info, content=True, format=None):
+    def _file_model(self, path, info, content=True, format=None, offset=None, length=None):
         """Build a model for a file
         if content is requested, include the file contents.
         format:
@@ -395,13 +813,15 @@ class FSManager(FileContentsManager):
           If not specified, try to decode as UTF-8, and fall back to base64
 
         info (<Info>): FS Info object for file at path
+        offset, length (int): if either is given, only that byte range of the file is included in the contents.
+          The model's size remains the size of the whole file.
         """
         model = self._base_model(path, info)
         model["type"] = "file"
         model["mimetype"] = mimetypes.guess_type(path)[0]
 
         if content:
-            content, format = self._read_file(path, format, info)
+            content, format = self._read_file(path, format, info, offset=offset, length=length)
             if model["mimetype"] is None:
                 default_mime = {
                     "text": "text/plain",
@@ -432,7 +852,7 @@ class FSManager(FileContentsManager):
             self.validate_notebook_model(model)
         return model
 
-    def get(self, path, content=True, type=None, format=None, info=None):
+    def get(self, path, content=True, type=None, format=None, info=None, offset=None, length=None, limit=None, cursor=None):
         """Takes a path for an entity and returns its model
         Args:
             path (str): the API path that describes the relative path for the target
@@ -444,30 +864,91 @@ class FSManager(FileContentsManager):
             info (fs Info object):
                 Optional FS Info. If present, it needs to include the following namespaces: "basic", "stat", "access", "details".
                 Including it can avoid extraneous networkcalls.
+            offset (int): For files, the byte at which to start reading the contents.
+            length (int): For files, the maximum number of bytes of contents to read.
+                If offset or length are given, the model also carries the `offset` and `length` of the returned bytes.
+            limit (int): For directories, the maximum number of entries to list.
+            cursor (str): For directories, the `cursor` of the previous page of the listing.
+                If limit or cursor are given, the listing is sorted by name, and the model also carries the `cursor` of the next page
+                (None on the last one).
         Returns
             model (dict): the contents model. If content=True, returns the contents of the file or directory as well.
         """
         path = path.strip("/")
+        ranged = _check_byte_range(path, type, offset, length)
+        paged, after = _check_page(path, type, limit, cursor)
 
         # gather info - by doing here can minimise further network requests from underlying fs functions
         if not info:
             try:
                 info = self._pyfilesystem_instance.getinfo(path, namespaces=("basic", "stat", "access", "details"))
+            except web.HTTPError:
+                # e.g. the backend of a lazily opened drive can not be reached
+                raise
             except Exception:
                 raise web.HTTPError(404, "No such file or directory: %s" % path)
 
         if info.is_dir:
-            if type not in (None, "directory"):
-                raise web.HTTPError(400, "%s is a directory, not a %s" % (path, type), reason="bad type")
-            model = self._dir_model(path, content=content, info=info)
-        elif type == "notebook" or (type is None and path.endswith(".ipynb")):
+            if type not in (None, "directory") or ranged:
+                raise web.HTTPError(400, "%s is a directory, not a %s" % (path, type or "file"), reason="bad type")
+            model = self._dir_model(path, content=content, info=info, paged=paged, limit=limit, after=after)
+        elif paged:
+            raise web.HTTPError(400, "%s is not a directory" % path, reason="bad type")
+        elif not ranged and (type == "notebook" or (type is None and path.endswith(".ipynb"))):
             model = self._notebook_model(path, content=content, info=info)
         else:
             if type == "directory":
                 raise web.HTTPError(400, "%s is not a directory" % path, reason="bad type")
-            model = self._file_model(path, content=content, format=format, info=info)
+            model = self._file_model(path, content=content, format=format, info=info, offset=offset, length=length)
+            if ranged and content:
+                _set_byte_range(model, offset, length)
         return model
 
+    def open_binary(self, path):
+        """Open the file at path for reading, as a binary stream.
+        Used to stream file contents without building a contents model.
+
+        Args:
+            path (str): The API path to the file (with '/' as separator)
+        Returns:
+            file: a binary file object, that the caller has to close
+        """
+        from fs.errors import FileExpected, ResourceNotFound
+
+        path = path.strip("/")
+        four_o_four = "file does not exist: %r" % path
+        if not self.allow_hidden and self.is_hidden(path):
+            self.log.debug("Refusing to serve hidden file %r, via 404 Error", path)
+            raise web.HTTPError(404, four_o_four)
+        with self.perm_to_403(path):
+            try:
+                return self._pyfilesystem_instance.openbin(path, "r")
+            except (ResourceNotFound, FileExpected):
+                raise web.HTTPError(404, four_o_four)
+
+    def open_writer(self, path):
+        """Open the file at path for writing, as a binary stream that replaces its content.
+        Used to stream an upload to the file without building a contents model.
+
+        Args:
+            path (str): The API path to the file (with '/' as separator)
+        Returns:
+            file: a binary file object. Closing it completes the upload, discarding it aborts it
+        """
+        from fs.errors import ResourceNotFound
+
+        path = path.strip("/")
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(400, f"Cannot write file {path!r}")
+        # a streamed upload supersedes any chunked upload in progress
+        self._uploads.abort(path)
+        self._invalidate(path)
+        with self.perm_to_403(path):
+            try:
+                return _StagedWrite(self._pyfilesystem_instance, path, on_close=lambda: self._invalidate(path))
+            except ResourceNotFound:
+                raise web.HTTPError(404, "Parent directory does not exist: %r" % path)
+
     def _save_directory(self, path, model):
         """create a directory"""
         with self.perm_to_403(path):
@@ -482,12 +963,16 @@ class FSManager(FileContentsManager):
 
     def _save_notebook(self, path, nb):
         """Save a notebook to an os_path."""
-        s = nbformat.writes(nb, version=nbformat.NO_CONVERT)
+        s = nbformat.writes(nb, version=nbformat.NO_CONVERT).encode("utf8")
         with self.perm_to_403(path):
-            self._pyfilesystem_instance.writetext(path, s)
+            self._pyfilesystem_instance.writebytes(path, s)
+        count_bytes("written", len(s))
 
     def _save_file(self, path, content, format, chunk=None):
-        """Save content of a generic file."""
+        """Save content of a generic file.
+        Chunked uploads keep a single binary stream open from their first to their last chunk,
+        rather than reopening (or emulating an append to) the file for each chunk.
+        """
         if format not in {"text", "base64"}:
             raise web.HTTPError(
                 400,
@@ -503,11 +988,29 @@ class FSManager(FileContentsManager):
             raise web.HTTPError(400, "Encoding error saving %s: %s" % (path, e))
 
         with self.perm_to_403(path):
-            # Overwrite content if unchunked or for the first chunk
-            if chunk is None or chunk == 1:
+            if chunk is None:
+                # a whole-file save supersedes any upload in progress
+                self._uploads.abort(path)
                 self._pyfilesystem_instance.writebytes(path, bcontent)
             else:
-                self._pyfilesystem_instance.appendbytes(path, bcontent)
+                # staged in a temporary file, so that an aborted upload leaves the file as it was.
+                # Moving it into place on the last chunk writes to path, after save has invalidated it
+                handle = self._uploads.write(
+                    path, chunk, bcontent, lambda: _StagedWrite(self._pyfilesystem_instance, path, on_close=lambda: self._invalidate(path))
+                )
+                if handle is not None:
+                    handle.close()
+        count_bytes("written", len(bcontent))
+
+    def _staged_model(self, path):
+        """The model of a file whose chunked upload is in progress, as uploaded so far"""
+        from fs.path import basename
+
+        handle = self._uploads.handle(path)
+        info = self._pyfilesystem_instance.getinfo(handle.tmp_path, namespaces=("basic", "stat", "access", "details"))
+        model = self.get(path, content=False, info=info)
+        model["name"] = basename(path)
+        return model
 
     def save(self, model, path=""):
         """Save the file model and return the model with no content."""
@@ -528,6 +1031,7 @@ class FSManager(FileContentsManager):
         self.log.debug("Saving %s", path)
         if chunk is None or chunk == 1:
             self.run_pre_save_hooks(model=model, path=path)
+            self._invalidate(path)
 
         try:
             if model["type"] == "notebook":
@@ -557,15 +1061,104 @@ class FSManager(FileContentsManager):
             self.validate_notebook_model(model)
             validation_message = model.get("message", None)
 
-        model = self.get(path, content=False)
+        if chunk in (None, -1):
+            model = self.get(path, content=False)
+        else:
+            model = self._staged_model(path)
         if validation_message:
             model["message"] = validation_message
 
         if chunk is None or chunk == -1:
             self.run_post_save_hooks(model=model, os_path=path)
+            if self._index is not None:
+                self._index.put_model(path, model)
 
         return model
 
+    def _invalidate(self, *paths):
+        """Drop what is cached about paths, after they were written to"""
+        self._hidden_cache.invalidate(*paths)
+        self._usage_cache.invalidate(*paths)
+        if self._index is not None:
+            self._index.mark_dirty(*paths)
+
+    def usage(self, path):
+        """The disk usage of the directory at path, and everything below it.
+
+        The subdirectories of path are walked in parallel on the executor of the drive, and the usage of each
+        directory in the subtree is cached (see `usage_cache_ttl`), until something below it is written to.
+        Hidden (dot) entries are not counted, unless allow_hidden.
+
+        Returns:
+            dict: the total "size" in bytes, and the number of "files" and "directories"
+        """
+        path = path.strip("/")
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+
+        def load():
+            if not self._pyfilesystem_instance.isdir(path):
+                raise web.HTTPError(404, "No such directory: %s" % path)
+            generation = self._usage_cache.generation
+            with self.perm_to_403(path):
+                usage = self._walk_usage(path)
+            # deepest directories first, so that the least recently used entries evicted are the least useful
+            for dir_path in sorted(usage, key=lambda p: p.count("/") + bool(p), reverse=True):
+                self._usage_cache.put("usage", dir_path, usage[dir_path], generation)
+            return usage[path]
+
+        return self._usage_cache.memoize("usage", path, load)
+
+    def _walk_usage(self, path):
+        """The usage of the directory at path and of each directory below it, as per `_aggregate_usage`.
+        Each subdirectory of path is walked and aggregated separately (in parallel, see `_map_on_drive`), then merged
+        """
+        entries = list(self._pyfilesystem_instance.scandir(path or "/", namespaces=["details"]))
+        if not self.allow_hidden:
+            entries = [info for info in entries if not info.name.startswith(".")]
+        children = [pathlib.PurePosixPath(path, info.name).as_posix() for info in entries if info.is_dir]
+
+        usage = {path: _usage()}
+        totals = usage[path]
+        for info in entries:
+            if not info.is_dir:
+                totals["files"] += 1
+                totals["size"] += info.size or 0
+        for child, child_usage in zip(children, self._map_on_drive(self._walk_subtree_usage, children)):
+            usage.update(child_usage)
+            totals["directories"] += 1 + child_usage[child]["directories"]
+            totals["files"] += child_usage[child]["files"]
+            totals["size"] += child_usage[child]["size"]
+        return usage
+
+    def _walk_subtree_usage(self, path):
+        exclude_dirs = None if self.allow_hidden else [".*"]
+        walk = self._pyfilesystem_instance.walk.info(path, namespaces=["details"], exclude_dirs=exclude_dirs)
+        return _aggregate_usage(path, ((p.lstrip("/"), info.is_dir, info.size) for p, info in walk), hidden=self.allow_hidden)
+
+    def _map_on_drive(self, func, items):
+        """The results of func for each of items, computed in parallel on the executor of the drive, if it has one.
+        The calling thread (which may itself be a worker of the drive) computes those that no worker has started yet,
+        so that calls waiting on each other cannot take all the workers of the drive.
+        """
+        executor = self._get_executor() if self._get_executor is not None and len(items) > 1 else None
+        futures = []
+        for item in items:
+            future = None
+            if executor is not None:
+                try:
+                    future = executor.submit(func, item)
+                except (web.HTTPError, RuntimeError):
+                    # the queue of the drive is full, or the executor was shut down
+                    pass
+            futures.append(future)
+        try:
+            return [func(item) if future is None or future.cancel() else future.result() for item, future in zip(items, futures)]
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+
     def _is_non_empty_dir(self, path):
         if self._pyfilesystem_instance.isdir(path):
             # A directory containing only leftover checkpoints is
@@ -578,6 +1171,7 @@ class FSManager(FileContentsManager):
     def delete_file(self, path):
         """Delete file at path."""
         path = path.strip("/")
+        self._invalidate(path)
 
         with self.perm_to_403(path):
             if not self._pyfilesystem_instance.exists(path):
@@ -593,12 +1187,48 @@ class FSManager(FileContentsManager):
                 self.log.debug("Unlinking file %s", path)
                 self._pyfilesystem_instance.remove(path)
 
+        if self._index is not None:
+            self._index.remove(path)
+
+    def copy(self, from_path, to_path=None):
+        """Copy a file or directory, and return the model of the copy (without content).
+        See `ContentsManager.copy` for how to_path is resolved.
+
+        The copy is made by the backend (`copy`/`copydir`), so that the contents do not go through the server
+        unless the filesystem itself has to (e.g. FTP). Remote filesystems like S3 copy server-side.
+        """
+        from fs.errors import DestinationExists, ResourceNotFound
+
+        path = from_path.strip("/")
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(404, "No such file or directory: %s" % path)
+        to_path = _copy_destination(self, path, to_path)
+        self._invalidate(to_path)
+
+        try:
+            with self.perm_to_403(to_path):
+                if self._pyfilesystem_instance.isdir(path):
+                    self.log.debug("Copying directory %s to %s", path, to_path)
+                    self._pyfilesystem_instance.copydir(path, to_path, create=True)
+                else:
+                    self.log.debug("Copying file %s to %s", path, to_path)
+                    self._pyfilesystem_instance.copy(path, to_path)
+        except ResourceNotFound:
+            raise web.HTTPError(404, "No such file or directory: %s" % path)
+        except DestinationExists:
+            raise web.HTTPError(409, "File already exists: %s" % to_path)
+
+        model = self.get(to_path, content=False)
+        self.emit(data={"action": "copy", "path": to_path, "source_path": from_path})
+        return model
+
     def rename_file(self, old_path, new_path):
         """Rename a file or directory."""
         old_path = old_path.strip("/")
         new_path = new_path.strip("/")
         if new_path == old_path:
             return
+        self._invalidate(old_path, new_path)
 
         with self.perm_to_403(new_path):
             # Should we proceed with the move?
@@ -618,3 +1248,6 @@ class FSManager(FileContentsManager):
             raise
         except Exception as e:
             raise web.HTTPError(500, "Unknown error renaming file: %s %s" % (old_path, e))
+
+        if self._index is not None:
+            self._index.rename(old_path, new_path)
@@ -5,62 +5,179 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import asyncio
+import io
+import itertools
 import mimetypes
+import os
+import tempfile
+import threading
 from base64 import decodebytes, encodebytes
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import PurePosixPath
 
 import nbformat
 from jupyter_server.services.contents.filemanager import FileContentsManager
 from tornado import web
-from traitlets import default
+from traitlets import Bool, Float, Int, default
 
+from .cache import AggregateCache, MetadataCache, request_memo
 from .checkpoints import NullCheckpoints
-from .common import EPOCH_START, FileSystemLoadError
+from .common import (
+    EPOCH_START,
+    FileSystemLoadError,
+    _acopy_destination,
+    _aggregate_usage,
+    _check_byte_range,
+    _check_page,
+    _copy_destination,
+    _cursor,
+    _page,
+    _set_byte_range,
+)
+from .metrics import count_bytes
+from .tracing import traced
+from .uploads import UploadSessions
 
-__all__ = ("FSSpecManager",)
+__all__ = (
+    "AsyncFSSpecManager",
+    "FSSpecManager",
+)
+
+
+def _forget_fsspec(instance):
+    # drop it from the instance cache of fsspec, so that it (and its connections) can be garbage collected
+    type(instance)._cache.pop(getattr(instance, "_fs_token", None), None)
 
 
 class FSSpecManager(FileContentsManager):
     root = ""
 
-    def __init__(self, fs, *args, default_writable=True, parent=None, **kwargs):
+    enrich_listing = Bool(
+        default_value=False,
+        config=True,
+        help="whether to fetch the full info of directory entries whose listing record has no modification time",
+    )
+
+    enrich_max_workers = Int(
+        default_value=8,
+        config=True,
+        help="number of concurrent info requests made when enriching a directory listing, or checking the paths deleted in a batch",
+    )
+
+    cache_ttl = Float(
+        default_value=5.0,
+        config=True,
+        help="seconds for which file info and directory listings are cached. 0 disables the cache",
+    )
+
+    cache_stale_ttl = Float(
+        default_value=30.0,
+        config=True,
+        help="seconds past cache_ttl for which a cached listing is still served while it is refreshed in the background",
+    )
+
+    cache_max_entries = Int(
+        default_value=1024,
+        config=True,
+        help="maximum number of file infos and directory listings cached per drive",
+    )
+
+    usage_cache_ttl = Float(
+        default_value=300.0,
+        config=True,
+        help="seconds for which the disk usage of a directory is cached, unless something below it is written to. 0 disables the cache",
+    )
+
+    usage_cache_max_entries = Int(
+        default_value=4096,
+        config=True,
+        help="maximum number of directory disk usages cached per drive",
+    )
+
+    upload_idle_timeout = Float(
+        default_value=300.0,
+        config=True,
+        help="seconds after which a chunked upload that receives no further chunks is aborted",
+    )
+
+    def __init__(self, fs, *args, default_writable=True, parent=None, lazy=False, pool=None, **kwargs):
         super().__init__(parent=parent)
-        import fsspec
 
         self._default_writable = default_writable
+        self._cache = MetadataCache(ttl=self.cache_ttl, stale_ttl=self.cache_stale_ttl, max_entries=self.cache_max_entries)
+        self._usage_cache = AggregateCache(ttl=self.usage_cache_ttl, max_entries=self.usage_cache_max_entries)
+        self._uploads = UploadSessions(idle_timeout=self.upload_idle_timeout)
+        # the MetadataIndex of the drive, if it is indexed (set by the MetaManager)
+        self._index = None
+        self._pool = pool
+        self._pool_key = None
         if isinstance(fs, str):
             # normalize osfs url to be compatible with fsspec
             if fs.startswith("osfs://"):
                 fs = fs.replace("osfs://", "file://", 1)
 
             # fs is an fsspec url
-            self._fs, root = fsspec.core.url_to_fs(fs, **kwargs)
+            self._fs, root = self._url_to_fs(fs, **kwargs)
             self.root = root
+            if pool is not None:
+                # fsspec already shares the instances of a backend with the same options (whatever their root):
+                # the pool counts the drives that use it, and lets go of it once it has been unused for a while
+                instance = self._fs
+                self._pool_key = ("fsspec", type(instance).__module__, type(instance).__qualname__, instance._fs_token)
+                self._fs = pool.acquire(self._pool_key, lambda: instance, close=_forget_fsspec)
+            # count (and trace) the calls made to the backend
+            self._fs = traced(self._fs)
 
             # prune trailing slash
             if self.root.endswith("/"):
                 self.root = self.root[:-1]
 
-            # Run this once but don't worry about the result,
-            # this is just to ensure the connection to the
-            # backend service works.
-            # In case it lazily connects, we want to not
-            # show the file browser if the backend is broken.
-            try:
-                self._fs.isdir(self.root)
-            except Exception as e:
-                # Wrap the potentially backend-dependent exception
-                # in a generic RuntimeError
-                raise RuntimeError(f"Could not connect to fs {fs}") from e
-
-            # Ensure that the user has chosen a root directory that exists
-            if self.root.count("/") > 1 and not self._fs.exists(self.root) and not self._fs.isdir(self.root):
-                raise RuntimeError(f"Root {self.root} does not exist in fs {fs}")
+            self._url = fs
+            if not lazy:
+                try:
+                    self._check_connection(fs)
+                except Exception:
+                    self.close()
+                    raise
 
         else:
             raise TypeError("fs must be a url, an FS subclass, or an FS instance")
 
+    def _url_to_fs(self, url, **kwargs):
+        import fsspec
+
+        return fsspec.core.url_to_fs(url, **kwargs)
+
+    def _check_connection(self, url):
+        # Run this once but don't worry about the result,
+        # this is just to ensure the connection to the
+        # backend service works.
+        # In case it lazily connects, we want to not
+        # show the file browser if the backend is broken.
+        try:
+            self._fs.isdir(self.root)
+        except Exception as e:
+            # Wrap the potentially backend-dependent exception
+            # in a generic RuntimeError
+            raise RuntimeError(f"Could not connect to fs {url}") from e
+
+        # Ensure that the user has chosen a root directory that exists
+        if self.root.count("/") > 1 and not self._fs.exists(self.root) and not self._fs.isdir(self.root):
+            raise RuntimeError(f"Root {self.root} does not exist in fs {url}")
+
+    def close(self):
+        """Release the filesystem of the drive, if it is pooled. The manager must not be used after this"""
+        if self._pool_key is not None:
+            self._pool.release(self._pool_key)
+            self._pool_key = None
+
+    def check_health(self):
+        """Check that the backend of the drive can be reached, and that its root exists. Raises if not"""
+        self._check_connection(self._url)
+
     @staticmethod
     def create(*args, **kwargs):
         try:
@@ -112,16 +229,22 @@ class FSSpecManager(FileContentsManager):
         Returns:
             hidden (bool): Whether the path exists and is hidden.
         """
-        path = self._normalize_path(path)
-        ppath = PurePosixPath(path)
-        # Path checks are quick, so we do it first to avoid unnecessary stat calls
-        if any(part.startswith(".") for part in ppath.parts):
-            return True
-        while ppath.parents:
-            if self._is_path_hidden(str(path)):
+        return self._is_ancestor_hidden(self._normalize_path(path))
+
+    def _is_ancestor_hidden(self, path):
+        """Is the normalized path, or any of its ancestors, hidden?
+        Memoized per ancestor, for the duration of the current request and across requests for `cache_ttl`
+        """
+
+        def load():
+            if self._is_path_hidden(path):
                 return True
-            ppath = ppath.parent
-        return False
+            if not path.startswith(self.root + "/"):
+                # the root itself: check all of its parts at once
+                return any(part.startswith(".") for part in PurePosixPath(path).parts)
+            return self._is_ancestor_hidden(str(PurePosixPath(path).parent))
+
+        return request_memo((id(self), "hidden", path), lambda: self._cache.memoize("hidden", path, load))
 
     def file_exists(self, path):
         """Returns True if the file exists, else returns False.
@@ -153,13 +276,104 @@ class FSSpecManager(FileContentsManager):
         path = self._normalize_path(path)
         return self._fs.exists(path)
 
+    def cache_stats(self):
+        """Hit/miss counters of the metadata cache"""
+        return self._cache.stats()
+
+    def _invalidate(self, *paths):
+        """Drop what is cached about the normalized paths, after they were written to"""
+        self._drop_cached(*paths)
+        self._update_index("mark_dirty", *(self._api_path(path) for path in paths))
+
+    def _drop_cached(self, *paths):
+        self._cache.invalidate(*paths)
+        self._usage_cache.invalidate(*paths)
+
+    def _update_index(self, method, *args):
+        """Call a method of the MetadataIndex of the drive, if it is indexed"""
+        if self._index is not None:
+            getattr(self._index, method)(*args)
+
+    def _api_path(self, path):
+        """The API path of a normalized path"""
+        if path == self.root or path.startswith(self.root + "/"):
+            path = path[len(self.root) :]
+        return path.strip("/")
+
+    def usage(self, path):
+        """The disk usage of the directory at path, and everything below it.
+
+        The whole subtree is listed with a single `find` (a flat, paginated listing on object stores),
+        and the usage of each directory in it is cached (see `usage_cache_ttl`), until something below it
+        is written to. Hidden (dot) entries are not counted, unless allow_hidden.
+
+        Returns:
+            dict: the total "size" in bytes, and the number of "files" and "directories"
+        """
+        path = self._dir_path(path)
+
+        def load():
+            if not self._isdir(path):
+                raise web.HTTPError(404, "No such directory: %s" % path)
+            generation = self._usage_cache.generation
+            return self._cache_usage(path, self._fs.find(path, withdirs=True, detail=True), generation)
+
+        return self._usage_cache.memoize("usage", path, load)
+
+    def _cache_usage(self, path, found, generation):
+        entries = ((f["name"], f["type"] == "directory", f.get("size")) for f in found.values())
+        usage = _aggregate_usage(path, entries, hidden=self.allow_hidden)
+        # deepest directories first, so that the least recently used entries evicted are the least useful
+        for dir_path in sorted(usage, key=lambda p: p.count("/"), reverse=True):
+            self._usage_cache.put("usage", dir_path, usage[dir_path], generation)
+        return usage[path]
+
+    def _dir_path(self, path):
+        """Normalize the API path of a directory, refusing (with a 404) to serve it if it is hidden, unless allow_hidden"""
+        if not self.allow_hidden and self.is_hidden(path):
+            self.log.debug("Refusing to serve hidden directory %r, via 404 Error", path)
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        return self._normalize_path(path)
+
+    def _info(self, path):
+        """The (cached) fsspec info dict of path"""
+        return self._cache.fetch("info", path, lambda: self._fs.info(path))
+
+    def _isdir(self, path):
+        try:
+            return self._info(path)["type"] == "directory"
+        except OSError:
+            return False
+
+    def _listing(self, path):
+        """The (cached) detail records of the directory at path"""
+        return self._cache.fetch("ls", path, lambda: self._load_listing(path))
+
+    def _load_listing(self, path):
+        # our cache decides how fresh a listing is, so bypass fsspec's own listings cache
+        files = self._fs.ls(path, detail=True, refresh=True)
+        stale = self._entries_to_enrich(self._listing_entries(files))
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.enrich_max_workers) as pool:
+                files = self._merge_enriched(files, pool.map(self._entry_info, stale))
+        self._prime_infos(files)
+        return files
+
+    def _prime_infos(self, files):
+        for f in files:
+            self._cache.put("info", f["name"], f)
+
     def _base_model(self, path):
         """Build the common base of a contents model"""
-
         try:
-            model = self._fs.info(path).copy()
+            info = self._info(path)
         except FileNotFoundError:
-            model = {"type": "file", "size": 0}
+            info = {"type": "file", "size": 0}
+        return self._info_model(path, info)
+
+    def _info_model(self, path, info):
+        """Build the common base of a contents model from the fsspec info dict of path"""
+        model = info.copy()
         model["name"] = path.rstrip("/").rsplit("/", 1)[-1]
         model["path"] = path.replace(self.root, "", 1)
         if "LastModified" in model:
@@ -171,7 +385,11 @@ class FSSpecManager(FileContentsManager):
             model["last_modified"] = datetime.fromtimestamp(model["mtime"]).isoformat()
         else:
             model["last_modified"] = EPOCH_START
-        model["created"] = datetime.fromtimestamp(model["created"]).isoformat() if "created" in model else EPOCH_START
+        if isinstance(model.get("created"), datetime):
+            # e.g. MemoryFileSystem
+            model["created"] = model["created"].isoformat()
+        else:
+            model["created"] = datetime.fromtimestamp(model["created"]).isoformat() if "created" in model else EPOCH_START
         model["content"] = None
         model["format"] = None
         model["mimetype"] = mimetypes.guess_type(path)[0]
@@ -184,25 +402,89 @@ class FSSpecManager(FileContentsManager):
             model["type"] = "notebook"
         return model
 
-    def _dir_model(self, path, content=True):
+    def _dir_model(self, path, content=True, paged=False, limit=None, after=None):
         """Build a model for a directory
         if content is requested, will include a listing of the directory
+        paged (bool): if set, only include the page of the listing given by limit and after (see `_listing_content`)
         """
-        model = self._base_model(path)
+        model = self._base_model(self._dir_path(path))
+        if content:
+            self._set_listing(model, self._listing(path), paged, limit, after)
+        return model
 
-        four_o_four = "directory does not exist: %r" % path
+    def _set_listing(self, model, files, paged, limit, after):
+        """Set the content of a directory model to the models of the entries of its listing, or, if paged, to those of the
+        (at most) limit entries whose name sorts after `after`, in name order, along with the `cursor` of the next page
+        """
+        files = self._listing_entries(files)
+        if paged:
+            by_name = {f["name"].rstrip("/").rsplit("/", 1)[-1]: f for f in files}
+            names, more = _page(sorted(by_name), limit, after)
+            files = [by_name[name] for name in names]
+            model["cursor"] = _cursor(names[-1]) if more else None
+        model["content"] = [self._info_model(f["name"], f) for f in files]
+        model["format"] = "json"
 
-        if not self.allow_hidden and self.is_hidden(path):
-            self.log.debug("Refusing to serve hidden directory %r, via 404 Error", path)
-            raise web.HTTPError(404, four_o_four)
+    def _listing_entries(self, files):
+        """Filter the detail records of an `ls` call down to the entries that should be listed.
+        The listed directory itself has already been checked, so only the entry names are checked for hidden-ness.
+        """
+        return [f for f in files if self.allow_hidden or not self._is_path_hidden(f["name"])]
 
-        if content:
-            files = self._fs.ls(path, detail=True, refresh=True)
-            model["content"] = [self._base_model(f["name"]) for f in files if self.allow_hidden or not self.is_hidden(f["name"])]
-            model["format"] = "json"
-        return model
+    def scan_dir(self, path):
+        """The entries of the directory at path, as dicts with their "name", "type" ("directory" or "file"),
+        "size", "mtime" (a unix timestamp) and "etag", without building their models. Hidden entries are left out, unless allow_hidden.
+        This is what the drive is walked with, e.g. to search it.
+        """
+        path = self._dir_path(path)
+        if not self._isdir(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        return self._scan_entries(self._listing(path))
+
+    def iter_dir(self, path, batch_size=500):
+        """Same as `FSManager.iter_dir`. fsspec lists a directory in a single call, so it is the models that are built in batches"""
+        path = self._dir_path(path)
+        if not self._isdir(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        yield from self._model_batches(self._listing(path), batch_size)
+
+    def _model_batches(self, files, batch_size):
+        files = self._listing_entries(files)
+        for start in range(0, len(files), batch_size):
+            yield [self._info_model(f["name"], f) for f in files[start : start + batch_size]]
 
-    def _read_file(self, path, format):
+    def _scan_entries(self, files):
+        entries = []
+        for f in self._listing_entries(files):
+            is_dir = f["type"] == "directory"
+            modified = f.get("LastModified", f.get("mtime"))
+            entries.append(
+                {
+                    "name": f["name"].rstrip("/").rsplit("/", 1)[-1],
+                    "type": "directory" if is_dir else "file",
+                    "size": None if is_dir else f.get("size"),
+                    "mtime": modified.timestamp() if isinstance(modified, datetime) else modified,
+                    "etag": f.get("ETag") or f.get("etag"),
+                }
+            )
+        return entries
+
+    def _entries_to_enrich(self, files):
+        if not self.enrich_listing:
+            return []
+        return [f for f in files if not {"mtime", "LastModified", "last_modified"} & f.keys()]
+
+    def _entry_info(self, entry):
+        try:
+            return self._fs.info(entry["name"])
+        except (OSError, ValueError):
+            return entry
+
+    def _merge_enriched(self, files, infos):
+        enriched = {info["name"]: info for info in infos}
+        return [{**f, **enriched.get(f["name"], {})} for f in files]
+
+    def _read_file(self, path, format, offset=None, length=None):
         """Read a non-notebook file.
         Args:
             path (str): The path to be read.
@@ -210,12 +492,27 @@ class FSSpecManager(FileContentsManager):
                 If 'text', the contents will be decoded as UTF-8.
                 If 'base64', the raw bytes contents will be encoded as base64.
                 If not specified, try to decode as UTF-8, and fall back to base64
+            offset (int): If given, start reading at this byte
+            length (int): If given, read at most this many bytes
         """
         try:
-            bcontent = self._fs.cat(path)
+            if offset is None and length is None:
+                bcontent = self._fs.cat(path)
+            else:
+                bcontent = self._fs.cat_file(path, *self._byte_range(offset, length))
         except OSError as e:
             raise web.HTTPError(400, path, reason=str(e))
+        return self._decode_content(path, bcontent, format)
+
+    @staticmethod
+    def _byte_range(offset, length):
+        """The (start, end) arguments of `cat_file` for a partial read"""
+        start = offset or 0
+        return start, None if length is None else start + length
 
+    def _decode_content(self, path, bcontent, format):
+        """Decode the raw bytes read from a file as per `_read_file`"""
+        count_bytes("read", len(bcontent))
         if format is None or format == "text":
             # Try to interpret as unicode if format is unknown or if unicode
             # was explicitly requested.
@@ -235,31 +532,30 @@ class FSSpecManager(FileContentsManager):
         nb, format = self._read_file(path, "text")
         return nbformat.reads(nb, as_version=as_version)
 
-    def _file_model(self, path, content=True, format=None):
+    def _file_model(self, path, content=True, format=None, offset=None, length=None):
         """Build a model for a file
         if content is requested, include the file contents.
         format:
           If 'text', the contents will be decoded as UTF-8.
           If 'base64', the raw bytes contents will be encoded as base64.
           If not specified, try to decode as UTF-8, and fall back to base64
+        offset, length (int): if either is given, only that byte range of the file is included in the contents.
+          The model's size remains the size of the whole file.
         """
         model = self._base_model(path)
         model["type"] = "file"
-        model["mimetype"] = mimetypes.guess_type(path)[0]
-
         if content:
-            content, format = self._read_file(path, format)
-            if model["mimetype"] is None:
-                default_mime = {"text": "text/plain", "base64": "application/octet-stream"}[format]
-                model["mimetype"] = default_mime
-
-            model.update(
-                content=content,
-                format=format,
-            )
-
+            self._set_file_content(model, *self._read_file(path, format, offset=offset, length=length), offset, length)
         return model
 
+    def _set_file_content(self, model, content, format, offset=None, length=None):
+        """Set the (decoded) contents of a file model, and the byte range they cover if only part of the file was read"""
+        if model["mimetype"] is None:
+            model["mimetype"] = {"text": "text/plain", "base64": "application/octet-stream"}[format]
+        model.update(content=content, format=format)
+        if offset is not None or length is not None:
+            _set_byte_range(model, offset, length)
+
     def _notebook_model(self, path, content=True):
         """Build a notebook model
         if content is requested, the notebook content will be populated
@@ -268,51 +564,125 @@ class FSSpecManager(FileContentsManager):
         try:
             model = self._base_model(path)
         except FileNotFoundError:
-            # bare model
-            model = {}
-            model["name"] = path.rsplit("/", 1)[-1]
-            model["path"] = path
-            model["last_modified"] = EPOCH_START
-            model["created"] = EPOCH_START
-            model["content"] = None
-            model["format"] = None
-            model["mimetype"] = None
-            model["size"] = 0
-            model["writable"] = True
+            model = self._bare_model(path)
 
         model["type"] = "notebook"
         if content:
             nb = self._read_notebook(path, as_version=4)
-            self.mark_trusted_cells(nb, path)
-            model["content"] = nb
-            model["format"] = "json"
-            self.validate_notebook_model(model)
+            self._set_notebook_content(model, path, nb)
         return model
 
-    def get(self, path, content=True, type=None, format=None):
+    def _bare_model(self, path):
+        """Build a model for a path whose info is not available"""
+        model = {}
+        model["name"] = path.rsplit("/", 1)[-1]
+        model["path"] = path
+        model["last_modified"] = EPOCH_START
+        model["created"] = EPOCH_START
+        model["content"] = None
+        model["format"] = None
+        model["mimetype"] = None
+        model["size"] = 0
+        model["writable"] = True
+        return model
+
+    def _set_notebook_content(self, model, path, nb):
+        self.mark_trusted_cells(nb, path)
+        model["content"] = nb
+        model["format"] = "json"
+        self.validate_notebook_model(model)
+
+    def get(self, path, content=True, type=None, format=None, offset=None, length=None, limit=None, cursor=None):
         """Takes a path for an entity and returns its model
         Args:
             path (str): the API path that describes the relative path for the target
             content (bool): Whether to include the contents in the reply
             type (str): The requested type - 'file', 'notebook', or 'directory'. Will raise HTTPError 400 if the content doesn't match.
             format (str): The requested format for file contents. 'text' or 'base64'. Ignored if this returns a notebook or directory model.
+            offset (int): For files, the byte at which to start reading the contents.
+            length (int): For files, the maximum number of bytes of contents to read.
+                If offset or length are given, the model also carries the `offset` and `length` of the returned bytes.
+            limit (int): For directories, the maximum number of entries to list.
+            cursor (str): For directories, the `cursor` of the previous page of the listing.
+                If limit or cursor are given, the listing is sorted by name, and the model also carries the `cursor` of the next page
+                (None on the last one).
         Returns
             model (dict): the contents model. If content=True, returns the contents of the file or directory as well.
         """
         path = self._normalize_path(path)
+        ranged = _check_byte_range(path, type, offset, length)
+        paged, after = _check_page(path, type, limit, cursor)
 
         try:
-            if self._fs.isdir(path):
-                model = self._dir_model(path, content=content)
-            elif type == "notebook" or (type is None and path.endswith(".ipynb")):
-                model = self._notebook_model(path, content=content)
-            else:
-                model = self._file_model(path, content=content, format=format)
+            model = self._build_model(path, self._isdir(path), content, type, format, offset, length, ranged, paged, limit, after)
         except Exception as e:
             raise web.HTTPError(400, path, reason=str(e))
 
         return model
 
+    def _build_model(self, path, is_dir, content, type, format, offset, length, ranged, paged, limit, after):
+        """Build the model of path for `get`, with the method for its kind, after checking that it is of the requested kind.
+        Returns what that method returns (a coroutine, for AsyncFSSpecManager)
+        """
+        if is_dir:
+            if ranged:
+                raise web.HTTPError(400, "%s is a directory, not a file" % path, reason="bad type")
+            return self._dir_model(path, content=content, paged=paged, limit=limit, after=after)
+        if paged:
+            raise web.HTTPError(400, "%s is not a directory" % path, reason="bad type")
+        if not ranged and (type == "notebook" or (type is None and path.endswith(".ipynb"))):
+            return self._notebook_model(path, content=content)
+        return self._file_model(path, content=content, format=format, offset=offset, length=length)
+
+    def open_binary(self, path):
+        """Open the file at path for reading, as a binary stream.
+        Used to stream file contents without building a contents model.
+
+        Args:
+            path (str): The API path to the file (with '/' as separator)
+        Returns:
+            file: a binary file object, that the caller has to close
+        """
+        path = self._file_path(path)
+        try:
+            return self._fs.open(path, "rb")
+        except (FileNotFoundError, IsADirectoryError):
+            raise web.HTTPError(404, "file does not exist: %r" % path)
+
+    def _file_path(self, path):
+        """Normalize the API path of a file, refusing (with a 404) to serve it if it is hidden, unless allow_hidden"""
+        path = self._normalize_path(path)
+        if not self.allow_hidden and self.is_hidden(path):
+            self.log.debug("Refusing to serve hidden file %r, via 404 Error", path)
+            raise web.HTTPError(404, "file does not exist: %r" % path)
+        return path
+
+    def open_writer(self, path):
+        """Open the file at path for writing, as a binary stream that replaces its content.
+        Used to stream an upload to the file without building a contents model.
+
+        Args:
+            path (str): The API path to the file (with '/' as separator)
+        Returns:
+            file: a binary file object. Closing it completes the upload, `discard()`ing it aborts it
+        """
+        path = self._writer_path(path)
+        self._invalidate(path)
+        try:
+            # staged in a temporary file, so that an aborted write leaves the file as it was
+            return _StagedWrite(self._fs, path, on_close=lambda: self._invalidate(path))
+        except FileNotFoundError:
+            raise web.HTTPError(404, "Parent directory does not exist: %r" % path)
+
+    def _writer_path(self, path):
+        """Normalize the API path of a file that a stream is written to, and abort any chunked upload to it"""
+        path = self._normalize_path(path)
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(400, f"Cannot write file {path!r}")
+        # a streamed upload supersedes any chunked upload in progress
+        self._uploads.abort(path)
+        return path
+
     def _save_directory(self, path, model):
         """create a directory"""
         if not self.allow_hidden and self.is_hidden(path):
@@ -333,11 +703,44 @@ class FSSpecManager(FileContentsManager):
 
     def _save_notebook(self, path, nb):
         """Save a notebook to an os_path."""
-        s = nbformat.writes(nb, version=nbformat.NO_CONVERT)
-        self._fs.pipe(path, s.encode())
+        self._fs.pipe(path, self._notebook_bytes(nb))
+
+    @staticmethod
+    def _notebook_bytes(nb):
+        s = nbformat.writes(nb, version=nbformat.NO_CONVERT).encode()
+        count_bytes("written", len(s))
+        return s
+
+    def _save_file(self, path, content, format, chunk=None):
+        """Save content of a generic file.
+        Chunked uploads keep a single write handle open from their first to their last chunk,
+        so that object stores see one (multipart) upload.
+        """
+        bcontent = self._encode_content(path, content, format)
+        if chunk is None:
+            # a whole-file save supersedes any upload in progress
+            self._uploads.abort(path)
+            self._fs.pipe(path, bcontent)
+        else:
+            # staged in a temporary file, so that an aborted upload leaves the file as it was
+            handle = self._uploads.write(path, chunk, bcontent, lambda: _StagedWrite(self._fs, path))
+            if handle is not None:
+                handle.close()
+        count_bytes("written", len(bcontent))
+
+    @staticmethod
+    def _model_chunk(model):
+        """The chunk number of a model saved as part of a chunked upload, or None"""
+        chunk = model.get("chunk", None)
+        if chunk and model["type"] != "file":
+            raise web.HTTPError(
+                400,
+                'File type "{}" is not supported for chunked transfer'.format(model["type"]),
+            )
+        return chunk
 
-    def _save_file(self, path, content, format):
-        """Save content of a generic file."""
+    def _encode_content(self, path, content, format):
+        """Encode the content of a file model to raw bytes"""
         if format not in {"text", "base64"}:
             raise web.HTTPError(
                 400,
@@ -351,49 +754,174 @@ class FSSpecManager(FileContentsManager):
                 bcontent = decodebytes(b64_bytes)
         except Exception as e:
             raise web.HTTPError(400, "Encoding error saving %s: %s" % (path, e))
-        self._fs.pipe(path, bcontent)
+        return bcontent
 
     def save(self, model, path=""):
         """Save the file model and return the model with no content."""
         path = self._normalize_path(path)
+        chunk = self._begin_save(model, path)
+        try:
+            with self._unexpected_errors("Unexpected error while saving file", path):
+                self._write_model(model, path, chunk)
+        finally:
+            self._invalidate(path)
+
+        message = self._validation_message(model)
+        model = self.get(path, content=False)
+        if self._end_save(model, path, chunk, message):
+            self._update_index("put_model", self._api_path(path), model)
+        return model
 
-        self.run_pre_save_hook(model=model, path=path)
+    def _begin_save(self, model, path):
+        """Run the pre-save hook, unless model is a chunk after the first one of an upload. Returns the chunk number, if any"""
+        chunk = self._model_chunk(model)
+        if chunk is None or chunk == 1:
+            self.run_pre_save_hook(model=model, path=path)
+        return chunk
 
+    def _write_model(self, model, path, chunk):
+        """Write the content of model to path, with the method for its type.
+        Returns what that method returns (a coroutine, for AsyncFSSpecManager)
+        """
+        if model["type"] == "notebook":
+            nb = nbformat.from_dict(model["content"])
+            self.check_and_sign(nb, path)
+            return self._save_notebook(path, nb)
+        if model["type"] == "file":
+            # Missing format will be handled internally by _save_file.
+            return self._save_file(path, model["content"], model.get("format"), chunk)
+        if model["type"] == "directory":
+            return self._save_directory(path, model)
+        raise web.HTTPError(400, "Unhandled contents type: %s" % model["type"])
+
+    @contextmanager
+    def _unexpected_errors(self, message, path):
+        """Report the errors raised within the block that are not HTTPErrors as a 500"""
         try:
-            if model["type"] == "notebook":
-                nb = nbformat.from_dict(model["content"])
-                self.check_and_sign(nb, path)
-                self._save_notebook(path, nb)
-            elif model["type"] == "file":
-                # Missing format will be handled internally by _save_file.
-                self._save_file(path, model["content"], model.get("format"))
-            elif model["type"] == "directory":
-                self._save_directory(path, model)
-            else:
-                raise web.HTTPError(400, "Unhandled contents type: %s" % model["type"])
+            yield
         except web.HTTPError:
             raise
         except Exception as e:
-            self.log.error("Error while saving file: %s %s", path, e, exc_info=True)
-            raise web.HTTPError(500, "Unexpected error while saving file: %s %s" % (path, e))
+            self.log.error("%s: %s %s", message, path, e, exc_info=True)
+            raise web.HTTPError(500, "%s: %s %s" % (message, path, e))
 
-        validation_message = None
-        if model["type"] == "notebook":
-            self.validate_notebook_model(model)
-            validation_message = model.get("message", None)
-
-        model = self.get(path, content=False)
-        if validation_message:
-            model["message"] = validation_message
+    def _validation_message(self, model):
+        if model["type"] != "notebook":
+            return None
+        self.validate_notebook_model(model)
+        return model.get("message", None)
 
+    def _end_save(self, model, path, chunk, message):
+        """Complete the model of a saved file, and run the post-save hook if it was saved whole (i.e. model is not
+        that of a chunk before the last one of an upload). Returns whether it was, and so should be indexed
+        """
+        if message:
+            model["message"] = message
+        if chunk is not None and chunk != -1:
+            return False
         self.run_post_save_hook(model=model, os_path=path)
+        return True
 
-        return model
+    def _is_non_empty_dir(self, path):
+        """Does the directory at path hold anything, hidden entries included?"""
+        path = self._normalize_path(path)
+        return self._fs.isdir(path) and bool(self._fs.ls(path, detail=False, refresh=True))
 
     def delete_file(self, path):
         """Delete file at path."""
         path = self._normalize_path(path)
-        self._fs.rm(path, recursive=True)
+        try:
+            self._fs.rm(path, recursive=True)
+        finally:
+            self._invalidate(path)
+        self._update_index("remove", self._api_path(path))
+
+    def delete_many(self, paths):
+        """Delete a number of files/directories (and their checkpoints) with a single `rm` call,
+        which the backend may batch, e.g. into DeleteObjects requests of up to 1000 keys on S3.
+
+        Args:
+            paths (list): the API paths to delete
+        Returns:
+            dict: the paths that could not be deleted, mapped to their error
+        """
+
+        def check(path):
+            try:
+                target = self._delete_target(path)
+                self._fs.info(target)
+                return target
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.enrich_max_workers) as pool:
+            checks = list(pool.map(check, paths))
+        failed = {path: e for path, e in zip(paths, checks) if isinstance(e, Exception)}
+        found = [path for path in paths if path not in failed]
+        targets = [target for target in checks if not isinstance(target, Exception)]
+        try:
+            if targets:
+                self._fs.rm(targets, recursive=True)
+        except Exception:
+            # some of them were deleted: find out which ones were not, and why
+            for path, target in zip(found, targets):
+                try:
+                    if self._fs.exists(target):
+                        self._fs.rm(target, recursive=True)
+                except Exception as e:
+                    failed[path] = e
+        finally:
+            self._invalidate(*targets)
+
+        deleted = [(path, target) for path, target in zip(found, targets) if path not in failed]
+        for _, target in deleted:
+            self._update_index("remove", self._api_path(target))
+        self._deleted([path for path, _ in deleted])
+        return failed
+
+    def _delete_target(self, path):
+        """The normalized path of an API path to delete. Whether it exists is checked against the backend,
+        not the cache, since it may have been deleted (or created) since it was listed
+        """
+        if not path.strip("/"):
+            raise web.HTTPError(400, "Can't delete root")
+        return self._normalize_path(path)
+
+    def _deleted(self, paths):
+        """Delete the checkpoints of the API paths that were deleted by `delete_many`, and emit their delete events"""
+        for path in paths:
+            self.checkpoints.delete_all_checkpoints(path.strip("/"))
+            self.emit(data={"action": "delete", "path": path.strip("/")})
+
+    def copy(self, from_path, to_path=None):
+        """Copy a file or directory, and return the model of the copy (without content).
+        See `ContentsManager.copy` for how to_path is resolved.
+
+        The copy is made with the filesystem's own `copy`, e.g. server-side (CopyObject) on S3,
+        so that the contents do not go through the server.
+        """
+        path = self._copy_source(from_path)
+        to_path = _copy_destination(self, path, to_path)
+        source = self._normalize_path(path)
+        destination = self._normalize_path(to_path)
+
+        try:
+            self._fs.copy(source, destination, recursive=self._isdir(source))
+        except FileNotFoundError:
+            raise web.HTTPError(404, "No such file or directory: %s" % path)
+        finally:
+            self._invalidate(destination)
+
+        model = self.get(to_path, content=False)
+        self.emit(data={"action": "copy", "path": to_path, "source_path": from_path})
+        return model
+
+    def _copy_source(self, from_path):
+        """The API path of the source of a copy, refusing (with a 404) to copy it if it is hidden, unless allow_hidden"""
+        path = from_path.strip("/")
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(404, "No such file or directory: %s" % path)
+        return path
 
     def rename_file(self, old_path, new_path):
         """Rename a file."""
@@ -408,8 +936,627 @@ class FSSpecManager(FileContentsManager):
 
         # Move the file
         try:
-            self._fs.mv(old_path, new_path)
-        except web.HTTPError:
-            raise
+            with self._unexpected_errors("Unknown error renaming file", old_path):
+                self._fs.mv(old_path, new_path)
+        finally:
+            self._invalidate(old_path, new_path)
+        self._update_index("rename", self._api_path(old_path), self._api_path(new_path))
+
+
+class AsyncFSSpecManager(FSSpecManager):
+    """A contents manager for fsspec filesystems that have an async implementation
+    (e.g. s3fs, gcsfs, http).
+
+    The filesystem is opened in asynchronous mode, so its coroutine api runs on
+    the server's event loop, and the MetaManager can await the contents methods
+    directly instead of running them on a worker thread.
+    """
+
+    _connection_url = None
+
+    @staticmethod
+    def supports(url):
+        """Whether the fsspec filesystem for url has an async implementation"""
+        import fsspec
+
+        # the outermost filesystem of a chained url is the one we talk to
+        outer = url.split("::", 1)
+        protocol = outer[0] if len(outer) > 1 else fsspec.core.split_protocol(url)[0] or "file"
+        try:
+            return fsspec.get_filesystem_class(protocol).async_impl
+        except (ImportError, ValueError):
+            return False
+
+    @staticmethod
+    def create(*args, **kwargs):
+        try:
+            return AsyncFSSpecManager(*args, **kwargs)
+        except (RuntimeError, TypeError, ValueError) as e:
+            # reraise as common error
+            raise FileSystemLoadError from e
+
+    def _url_to_fs(self, url, **kwargs):
+        return super()._url_to_fs(url, asynchronous=True, **kwargs)
+
+    def _check_connection(self, url):
+        # The async api can only be used from within the event loop,
+        # so defer the check until `check_connection` is awaited
+        self._connection_url = url
+
+    @property
+    def connection_checked(self):
+        return self._connection_url is None
+
+    async def check_connection(self):
+        """Ensure that the backend service works and that the root exists, see `FSSpecManager._check_connection`"""
+        url = self._connection_url
+        if url is None:
+            return
+        await self._probe(url)
+        self._connection_url = None
+
+    async def check_health(self):
+        """Same as `FSSpecManager.check_health`"""
+        await self._probe(self._url)
+
+    async def _probe(self, url):
+        try:
+            await self._fs._isdir(self.root)
+        except Exception as e:
+            raise RuntimeError(f"Could not connect to fs {url}") from e
+
+        if self.root.count("/") > 1 and not await self._fs._exists(self.root) and not await self._fs._isdir(self.root):
+            raise RuntimeError(f"Root {self.root} does not exist in fs {url}")
+
+    async def file_exists(self, path):
+        path = self._normalize_path(path)
+        return await self._fs._isfile(path)
+
+    async def dir_exists(self, path):
+        path = self._normalize_path(path)
+        return await self._fs._isdir(path)
+
+    async def exists(self, path):
+        path = self._normalize_path(path)
+        return await self._fs._exists(path)
+
+    async def _invalidate(self, *paths):
+        self._drop_cached(*paths)
+        await self._update_index("mark_dirty", *(self._api_path(path) for path in paths))
+
+    async def _update_index(self, method, *args):
+        # the index is an SQLite database: keep its writes off the event loop
+        if self._index is not None:
+            await asyncio.to_thread(getattr(self._index, method), *args)
+
+    async def _info(self, path):
+        return await self._cache.afetch("info", path, lambda: self._fs._info(path))
+
+    async def usage(self, path):
+        """Same as `FSSpecManager.usage`"""
+        path = self._dir_path(path)
+
+        async def load():
+            if not await self._isdir(path):
+                raise web.HTTPError(404, "No such directory: %s" % path)
+            generation = self._usage_cache.generation
+            return self._cache_usage(path, await self._fs._find(path, withdirs=True, detail=True), generation)
+
+        # aggregates are never served stale, so this only reloads what is not fresh
+        return await self._usage_cache.afetch("usage", path, load)
+
+    async def _isdir(self, path):
+        try:
+            return (await self._info(path))["type"] == "directory"
+        except OSError:
+            return False
+
+    async def _listing(self, path):
+        return await self._cache.afetch("ls", path, lambda: self._load_listing(path))
+
+    async def _load_listing(self, path):
+        files = await self._fs._ls(path, detail=True, refresh=True)
+        stale = self._entries_to_enrich(self._listing_entries(files))
+        if stale:
+            limit = asyncio.Semaphore(self.enrich_max_workers)
+            files = self._merge_enriched(files, await asyncio.gather(*(self._entry_info(f, limit) for f in stale)))
+        self._prime_infos(files)
+        return files
+
+    async def _base_model(self, path):
+        try:
+            info = await self._info(path)
+        except FileNotFoundError:
+            info = {"type": "file", "size": 0}
+        return self._info_model(path, info)
+
+    async def _dir_model(self, path, content=True, paged=False, limit=None, after=None):
+        model = await self._base_model(self._dir_path(path))
+        if content:
+            self._set_listing(model, await self._listing(path), paged, limit, after)
+        return model
+
+    async def scan_dir(self, path):
+        """Same as `FSSpecManager.scan_dir`"""
+        path = self._dir_path(path)
+        if not await self._isdir(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        return self._scan_entries(await self._listing(path))
+
+    async def iter_dir(self, path, batch_size=500):
+        """Same as `FSSpecManager.iter_dir`"""
+        path = self._dir_path(path)
+        if not await self._isdir(path):
+            raise web.HTTPError(404, "No such directory: %s" % path)
+        for batch in self._model_batches(await self._listing(path), batch_size):
+            yield batch
+
+    async def _entry_info(self, entry, limit):
+        async with limit:
+            try:
+                return await self._fs._info(entry["name"])
+            except (OSError, ValueError):
+                return entry
+
+    async def _read_file(self, path, format, offset=None, length=None):
+        try:
+            bcontent = await self._fs._cat_file(path, *self._byte_range(offset, length))
+        except OSError as e:
+            raise web.HTTPError(400, path, reason=str(e))
+        return self._decode_content(path, bcontent, format)
+
+    async def _read_notebook(self, path, as_version=4):
+        nb, format = await self._read_file(path, "text")
+        return nbformat.reads(nb, as_version=as_version)
+
+    async def _file_model(self, path, content=True, format=None, offset=None, length=None):
+        model = await self._base_model(path)
+        model["type"] = "file"
+        if content:
+            self._set_file_content(model, *await self._read_file(path, format, offset=offset, length=length), offset, length)
+        return model
+
+    async def _notebook_model(self, path, content=True):
+        try:
+            model = await self._base_model(path)
+        except FileNotFoundError:
+            model = self._bare_model(path)
+
+        model["type"] = "notebook"
+        if content:
+            nb = await self._read_notebook(path, as_version=4)
+            self._set_notebook_content(model, path, nb)
+        return model
+
+    async def get(self, path, content=True, type=None, format=None, offset=None, length=None, limit=None, cursor=None):
+        path = self._normalize_path(path)
+        ranged = _check_byte_range(path, type, offset, length)
+        paged, after = _check_page(path, type, limit, cursor)
+
+        try:
+            # the model building methods are coroutines
+            model = await self._build_model(path, await self._isdir(path), content, type, format, offset, length, ranged, paged, limit, after)
         except Exception as e:
-            raise web.HTTPError(500, "Unknown error renaming file: %s %s" % (old_path, e))
+            raise web.HTTPError(400, path, reason=str(e))
+
+        return model
+
+    async def open_binary(self, path):
+        """Same as `FSSpecManager.open_binary`. The returned file has coroutine read/seek/close methods"""
+        path = self._file_path(path)
+        try:
+            # not from the cache: the size of the file is that of its current content
+            info = await self._fs._info(path)
+        except FileNotFoundError:
+            info = None
+        if info is None or info["type"] == "directory":
+            raise web.HTTPError(404, "file does not exist: %r" % path)
+        return _AsyncRangeFile(self._fs, path, info.get("size"))
+
+    async def open_writer(self, path):
+        """Same as `FSSpecManager.open_writer`. The returned file has coroutine write/close/discard methods"""
+        path = self._writer_path(path)
+        await self._invalidate(path)
+        return _AsyncUploadWriter(self._upload(path), lambda: self._invalidate(path))
+
+    def _upload(self, path, loop=None):
+        """A new upload to path, that is written to as it is received (see `_S3MultipartUpload` for its api).
+        loop is the event loop of the manager, if this is not called from it.
+
+        On S3 it is streamed with the multipart api, a part at a time. The other backends have no async api to
+        stream a write with (their `open_async` can only read, if they have one): the upload is staged in a local
+        temporary file, and sent in one go once it is complete.
+        """
+        # TODO better carveouts
+        if self._fs.__class__.__name__.startswith("S3"):
+            return _S3MultipartUpload(self._fs, path, loop or asyncio.get_running_loop())
+        return _StagedUpload(self._fs, path)
+
+    async def _save_directory(self, path, model):
+        if not self.allow_hidden and self.is_hidden(path):
+            raise web.HTTPError(400, f"Cannot create directory {path!r}")
+
+        if not await self.exists(path):
+            # TODO better carveouts
+            if self._fs.__class__.__name__.startswith("S3"):
+                # need to make a file temporarily
+                # use the convention of a hidden file
+                await self._fs._pipe_file(f"{path}/.s3fskeep", b"")
+            else:
+                await self._fs._mkdir(path)
+        elif not await self._fs._isdir(path):
+            raise web.HTTPError(400, "Not a directory: %s" % (path))
+        else:
+            self.log.debug("Directory %r already exists", path)
+
+    async def _save_notebook(self, path, nb):
+        await self._fs._pipe_file(path, self._notebook_bytes(nb))
+
+    async def _save_file(self, path, content, format, chunk=None):
+        bcontent = self._encode_content(path, content, format)
+        if chunk is None:
+            self._uploads.abort(path)
+            await self._fs._pipe_file(path, bcontent)
+        else:
+            # the chunks are written to the upload off the event loop (see `_upload`), which sends what it can on flush
+            loop = asyncio.get_running_loop()
+            handle = await asyncio.to_thread(self._uploads.write, path, chunk, bcontent, lambda: self._upload(path, loop))
+            if handle is not None:
+                await handle.commit()
+            else:
+                upload = self._uploads.handle(path)
+                if upload is not None:
+                    await upload.flush()
+        count_bytes("written", len(bcontent))
+
+    async def save(self, model, path=""):
+        path = self._normalize_path(path)
+        chunk = self._begin_save(model, path)
+        try:
+            with self._unexpected_errors("Unexpected error while saving file", path):
+                # the writing methods are coroutines
+                await self._write_model(model, path, chunk)
+        finally:
+            await self._invalidate(path)
+
+        message = self._validation_message(model)
+        model = await self.get(path, content=False)
+        if self._end_save(model, path, chunk, message):
+            await self._update_index("put_model", self._api_path(path), model)
+        return model
+
+    async def _is_non_empty_dir(self, path):
+        path = self._normalize_path(path)
+        return await self._fs._isdir(path) and bool(await self._fs._ls(path, detail=False, refresh=True))
+
+    async def delete_file(self, path):
+        path = self._normalize_path(path)
+        try:
+            await self._fs._rm(path, recursive=True)
+        finally:
+            await self._invalidate(path)
+        await self._update_index("remove", self._api_path(path))
+
+    async def delete_many(self, paths):
+        """Same as `FSSpecManager.delete_many`"""
+        limit = asyncio.Semaphore(self.enrich_max_workers)
+
+        async def check(path):
+            target = self._delete_target(path)
+            async with limit:
+                await self._fs._info(target)
+            return target
+
+        checks = await asyncio.gather(*(check(path) for path in paths), return_exceptions=True)
+        failed = {path: e for path, e in zip(paths, checks) if isinstance(e, Exception)}
+        found = [path for path in paths if path not in failed]
+        targets = [target for target in checks if not isinstance(target, Exception)]
+        try:
+            if targets:
+                await self._fs._rm(targets, recursive=True)
+        except Exception:
+            for path, target in zip(found, targets):
+                try:
+                    if await self._fs._exists(target):
+                        await self._fs._rm(target, recursive=True)
+                except Exception as e:
+                    failed[path] = e
+        finally:
+            await self._invalidate(*targets)
+
+        deleted = [(path, target) for path, target in zip(found, targets) if path not in failed]
+        for _, target in deleted:
+            await self._update_index("remove", self._api_path(target))
+        self._deleted([path for path, _ in deleted])
+        return failed
+
+    async def rename_file(self, old_path, new_path):
+        old_path = self._normalize_path(old_path)
+        new_path = self._normalize_path(new_path)
+        if new_path == old_path:
+            return
+
+        # Should we proceed with the move?
+        if await self.exists(new_path):  # TODO and not samefile(old_os_path, new_os_path):
+            raise web.HTTPError(409, "File already exists: %s" % new_path)
+
+        # Move the file
+        try:
+            with self._unexpected_errors("Unknown error renaming file", old_path):
+                if hasattr(self._fs, "_mv"):
+                    await self._fs._mv(old_path, new_path)
+                else:
+                    # same as AbstractFileSystem.mv
+                    await self._fs._copy(old_path, new_path, recursive=True)
+                    await self._fs._rm(old_path, recursive=True)
+        finally:
+            await self._invalidate(old_path, new_path)
+        await self._update_index("rename", self._api_path(old_path), self._api_path(new_path))
+
+    async def increment_filename(self, filename, path="", insert=""):
+        """Same as `ContentsManager.increment_filename`, with an async `exists`"""
+        path = path.strip("/")
+        basename, dot, ext = filename.rpartition(".")
+        if ext != "ipynb":
+            basename, dot, ext = filename.partition(".")
+
+        suffix = dot + ext
+        for i in itertools.count():
+            insert_i = f"{insert}{i}" if i else ""
+            name = f"{basename}{insert_i}{suffix}"
+            if not await self.exists(f"{path}/{name}"):
+                return name
+
+    async def copy(self, from_path, to_path=None):
+        """Same as `FSSpecManager.copy`"""
+        path = self._copy_source(from_path)
+        to_path = await _acopy_destination(self, path, to_path)
+        source = self._normalize_path(path)
+        destination = self._normalize_path(to_path)
+
+        try:
+            await self._fs._copy(source, destination, recursive=await self._isdir(source))
+        except FileNotFoundError:
+            raise web.HTTPError(404, "No such file or directory: %s" % path)
+        finally:
+            await self._invalidate(destination)
+
+        model = await self.get(to_path, content=False)
+        self.emit(data={"action": "copy", "path": to_path, "source_path": from_path})
+        return model
+
+    async def delete(self, path):
+        """Delete a file/directory and any associated checkpoints."""
+        path = path.strip("/")
+        if not path:
+            raise web.HTTPError(400, "Can't delete root")
+        await self.delete_file(path)
+        self.checkpoints.delete_all_checkpoints(path)
+        self.emit(data={"action": "delete", "path": path})
+
+    async def rename(self, old_path, new_path):
+        """Rename a file and any checkpoints associated with that file."""
+        await self.rename_file(old_path, new_path)
+        self.checkpoints.rename_all_checkpoints(old_path, new_path)
+        self.emit(data={"action": "rename", "path": new_path, "source_path": old_path})
+
+
+class _AsyncRangeFile:
+    """A minimal read-only binary file over an async fsspec filesystem,
+    that reads each block with a ranged `_cat_file` call"""
+
+    def __init__(self, fs, path, size):
+        self._fs = fs
+        self.path = path
+        self.size = size
+        self._pos = 0
+
+    async def seek(self, pos, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            if self.size is None:
+                raise ValueError("The size of %s is not known" % self.path)
+            pos += self.size
+        self._pos = pos
+        return pos
+
+    async def read(self, length=-1):
+        end = None if length is None or length < 0 else self._pos + length
+        if self.size is not None:
+            end = self.size if end is None else min(end, self.size)
+            if self._pos >= end:
+                return b""
+        data = await self._fs._cat_file(self.path, start=self._pos, end=end)
+        self._pos += len(data)
+        return data
+
+    async def close(self):
+        pass
+
+
+class _S3MultipartUpload:
+    """An upload to S3, streamed with the multipart api of s3fs. What is written is buffered in memory,
+    and sent a part at a time when flushed, once a part is filled.
+
+    `write` and `discard` can be called from any thread, `flush` and `commit` are awaited on the event loop.
+    An upload that fits in a single part is sent with a single request when it is committed.
+    """
+
+    # the minimum size of a part on S3, but for the last one
+    part_size = 5 * 2**20
+
+    def __init__(self, fs, path, loop):
+        self._fs = fs
+        self._path = path
+        self._loop = loop
+        self._bucket, self._key, _ = fs.split_path(path)
+        self._buffer = bytearray()
+        self._buffer_lock = threading.Lock()
+        # sends the parts one at a time, in order
+        self._send_lock = asyncio.Lock()
+        self._upload_id = None
+        self._parts = []
+        self._aborted = False
+
+    def write(self, data):
+        with self._buffer_lock:
+            self._buffer += data
+        return len(data)
+
+    def _take(self, size):
+        with self._buffer_lock:
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+        return data
+
+    async def flush(self):
+        """Send the parts that are filled"""
+        async with self._send_lock:
+            while len(self._buffer) >= self.part_size:
+                await self._send_part(self._take(self.part_size))
+
+    async def _send_part(self, data):
+        if self._aborted:
+            raise web.HTTPError(400, "The upload of %s was aborted" % self._path)
+        if self._upload_id is None:
+            mpu = await self._fs._call_s3("create_multipart_upload", Bucket=self._bucket, Key=self._key)
+            self._upload_id = mpu["UploadId"]
+        number = len(self._parts) + 1
+        part = await self._fs._call_s3("upload_part", Bucket=self._bucket, Key=self._key, PartNumber=number, UploadId=self._upload_id, Body=data)
+        self._parts.append({"PartNumber": number, "ETag": part["ETag"]})
+
+    async def commit(self):
+        """Send what is left, and complete the upload"""
+        async with self._send_lock:
+            data = self._take(len(self._buffer))
+            if self._upload_id is None and len(data) < self.part_size:
+                # small enough for a single request
+                await self._fs._pipe_file(self._path, data)
+                return
+            try:
+                if data:
+                    await self._send_part(data)
+                await self._fs._call_s3(
+                    "complete_multipart_upload",
+                    Bucket=self._bucket,
+                    Key=self._key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+            except BaseException:
+                await self._abort()
+                raise
+        self._fs.invalidate_cache(self._path)
+
+    def discard(self):
+        self._aborted = True
+        self._take(len(self._buffer))
+        asyncio.run_coroutine_threadsafe(self._abort(), self._loop)
+
+    async def _abort(self):
+        upload_id, self._upload_id = self._upload_id, None
+        if upload_id is not None:
+            await self._fs._abort_mpu(self._bucket, self._key, upload_id)
+
+
+class _StagedUpload:
+    """An upload to an async fsspec filesystem that is staged in a local temporary file, and sent in one go when it is committed.
+    Same api as `_S3MultipartUpload`, but `write` and `discard` block on the local file
+    """
+
+    def __init__(self, fs, path):
+        self._fs = fs
+        self._path = path
+        self._file = tempfile.NamedTemporaryFile(prefix="jupyterfs-upload-", delete=False)
+
+    def write(self, data):
+        return self._file.write(data)
+
+    async def flush(self):
+        pass
+
+    def discard(self):
+        try:
+            self._file.close()
+        finally:
+            os.unlink(self._file.name)
+
+    async def commit(self):
+        """Upload the staged file, and remove it"""
+        self._file.close()
+        try:
+            await self._fs._put_file(self._file.name, self._path)
+        finally:
+            os.unlink(self._file.name)
+
+
+class _StagedWrite:
+    """A binary write stream for path, that writes to a hidden temporary sibling of it, and moves that into place
+    when closed. Discarding it instead (e.g. when an upload is aborted) removes the temporary file, and leaves
+    path as it was. Opening path itself for writing would not: local files are truncated when opened, and
+    cannot be discarded once written to.
+    """
+
+    def __init__(self, fs, path, on_close=None):
+        import posixpath
+        import uuid
+
+        self._fs = fs
+        self.path = path
+        self.tmp_path = posixpath.join(posixpath.dirname(path), ".%s.upload-%s" % (posixpath.basename(path), uuid.uuid4().hex[:12]))
+        self._on_close = on_close
+        self._f = fs.open(self.tmp_path, "wb")
+
+    def write(self, data):
+        return self._f.write(data)
+
+    def close(self):
+        try:
+            self._f.close()
+            self._fs.mv(self.tmp_path, self.path)
+        except BaseException:
+            self._remove()
+            raise
+        if self._on_close is not None:
+            self._on_close()
+
+    def discard(self):
+        try:
+            self._f.close()
+        finally:
+            self._remove()
+
+    def _remove(self):
+        try:
+            self._fs.rm(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class _AsyncUploadWriter:
+    """A streamed upload to an async fsspec filesystem, with coroutine write/close/discard methods.
+    upload is a `_S3MultipartUpload` or a `_StagedUpload`, that is written to off the event loop.
+    on_done is a coroutine function
+    """
+
+    def __init__(self, upload, on_done):
+        self._upload = upload
+        self._on_done = on_done
+
+    async def write(self, data):
+        written = await asyncio.to_thread(self._upload.write, data)
+        await self._upload.flush()
+        return written
+
+    async def close(self):
+        try:
+            await self._upload.commit()
+        finally:
+            await self._on_done()
+
+    async def discard(self):
+        try:
+            await asyncio.to_thread(self._upload.discard)
+        finally:
+            await self._on_done()
@@ -0,0 +1,245 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+__all__ = ("MetadataIndex",)
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL,
+    etag TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    crawled REAL,
+    dirty INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO dirs (path) VALUES ('');
+"""
+
+
+def _parent(path):
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
+def _subtree(root, column="path"):
+    """SQL condition (and its parameters) for the paths strictly below root"""
+    if not root:
+        return "%s != ''" % column, ()
+    # "0" is the character after "/", so this is a range scan of the index on column
+    return "(%s > ? AND %s < ?)" % (column, column), (root + "/", root + "0")
+
+
+def _mtime(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return value
+
+
+class MetadataIndex:
+    """An on-disk (SQLite) index of the metadata of the entries of a drive: their path, type, size, mtime and etag.
+
+    It is filled in directory by directory, by a crawler that lists the directories that are not in it yet,
+    that were written to (dirty), or that were last listed the longest time ago, and by the writes of the
+    drive's manager. Each directory records when it was last listed, so that anything answered from the index
+    can say how fresh it is.
+
+    Paths are API paths, relative to the root of the drive. Hidden entries are never listed, so are not indexed.
+
+    Args:
+        db_path (str): the path of the SQLite database. Its directory is created if needed
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _transaction(self, func, *args):
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                result = func(*args)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # writes
+    def _put(self, path, type, size=None, mtime=None, etag=None):
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (path, parent, name, type, size, mtime, etag) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, _parent(path), path.rsplit("/", 1)[-1], type, size, _mtime(mtime), etag),
+        )
+        if type == "directory":
+            self._db.execute("INSERT OR IGNORE INTO dirs (path) VALUES (?)", (path,))
+
+    def _remove(self, path):
+        condition, params = _subtree(path)
+        self._db.execute("DELETE FROM entries WHERE path = ? OR %s" % condition, (path, *params))
+        self._db.execute("DELETE FROM dirs WHERE path = ? OR %s" % condition, (path, *params))
+
+    def replace_listing(self, path, entries, crawled=None):
+        """Reconcile the children of the directory at path with a fresh listing of it.
+
+        Args:
+            path (str): the path of the directory
+            entries (list): dicts with the "name", "type" ("directory" or "file"), "size", "mtime" and "etag" of each entry
+            crawled (float): when the listing was made (a unix timestamp). Defaults to now
+        """
+        path = path.strip("/")
+
+        def replace():
+            known = dict(self._db.execute("SELECT name, type FROM entries WHERE parent = ?", (path,)).fetchall())
+            for entry in entries:
+                entry_path = "%s/%s" % (path, entry["name"]) if path else entry["name"]
+                if known.pop(entry["name"], entry["type"]) != entry["type"]:
+                    self._remove(entry_path)
+                self._put(entry_path, entry["type"], entry.get("size"), entry.get("mtime"), entry.get("etag"))
+            for name in known:
+                self._remove("%s/%s" % (path, name) if path else name)
+            self._db.execute(
+                "INSERT OR REPLACE INTO dirs (path, crawled, dirty) VALUES (?, ?, 0)",
+                (path, time.time() if crawled is None else crawled),
+            )
+
+        self._transaction(replace)
+
+    def put_model(self, path, model):
+        """Write through the contents model of a file or directory that was just saved"""
+        type = "directory" if model.get("type") == "directory" else "file"
+        self._transaction(self._put, path.strip("/"), type, model.get("size"), model.get("last_modified"), model.get("ETag") or model.get("etag"))
+
+    def remove(self, path):
+        """Remove path, and everything below it"""
+        self._transaction(self._remove, path.strip("/"))
+
+    def rename(self, old_path, new_path):
+        """Move the entries of old_path, and of everything below it, to new_path"""
+        old_path, new_path = old_path.strip("/"), new_path.strip("/")
+
+        def move(path):
+            return new_path + path[len(old_path) :] if path == old_path or path.startswith(old_path + "/") else path
+
+        def rename():
+            condition, params = _subtree(old_path)
+            rows = self._db.execute(
+                "SELECT path, type, size, mtime, etag FROM entries WHERE path = ? OR %s" % condition, (old_path, *params)
+            ).fetchall()
+            dirs = self._db.execute("SELECT path, crawled, dirty FROM dirs WHERE path = ? OR %s" % condition, (old_path, *params)).fetchall()
+            self._remove(new_path)
+            self._remove(old_path)
+            for path, type, size, mtime, etag in rows:
+                self._put(move(path), type, size, mtime, etag)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO dirs (path, crawled, dirty) VALUES (?, ?, ?)", [(move(path), crawled, dirty) for path, crawled, dirty in dirs]
+            )
+
+        self._transaction(rename)
+
+    def mark_dirty(self, *paths):
+        """Have the directories at paths (if any), and their parents, listed again first"""
+        targets = {p for path in paths for p in (path.strip("/"), _parent(path.strip("/")))}
+        self._transaction(lambda: self._db.executemany("UPDATE dirs SET dirty = 1 WHERE path = ?", [(path,) for path in targets]))
+
+    def dirs_to_crawl(self, max_age, limit=1):
+        """The directories to list next: dirty ones first, then the ones never listed, then those listed more than max_age seconds ago"""
+        rows = self._query(
+            "SELECT path FROM dirs WHERE dirty = 1 OR crawled IS NULL OR crawled < ? ORDER BY dirty DESC, crawled IS NOT NULL, crawled LIMIT ?",
+            (time.time() - max_age, limit),
+        )
+        return [path for (path,) in rows]
+
+    # reads
+    def freshness(self, path, recursive=False):
+        """When the directory at path (and, if recursive, everything below it) was last listed.
+
+        Returns:
+            tuple: (fresh_as_of, complete): the unix timestamp of the oldest listing, and whether every directory
+                has been listed. fresh_as_of is None if none of them has
+        """
+        path = path.strip("/")
+        condition, params = _subtree(path) if recursive else ("0", ())
+        ((fresh_as_of, missing),) = self._query(
+            "SELECT min(crawled), sum(crawled IS NULL) FROM dirs WHERE path = ? OR %s" % condition, (path, *params)
+        )
+        return fresh_as_of, fresh_as_of is not None and not missing
+
+    def listing(self, path):
+        """The entries of the directory at path, as dicts with their "name", "path", "type", "size", "mtime" and "etag".
+        None if it has not been listed yet
+        """
+        path = path.strip("/")
+        if self.freshness(path)[0] is None:
+            return None
+        rows = self._query("SELECT path, name, type, size, mtime, etag FROM entries WHERE parent = ? ORDER BY name", (path,))
+        return [self._entry(row) for row in rows]
+
+    def search(self, path, pattern, limit):
+        """The entries below the directory at path that match pattern, with the same rules as the search endpoint:
+        globs with a `/` are matched against the path relative to the directory, other globs against the name,
+        and anything else is a case-insensitive substring of the name
+        """
+        path = path.strip("/")
+        condition, params = _subtree(path)
+        if _GLOB_CHARS.search(pattern):
+            column = "substr(path, %d)" % (len(path) + 2 if path else 1) if "/" in pattern else "name"
+            match, match_params = "%s GLOB ?" % column, (pattern.strip("/"),)
+        else:
+            match, match_params = "instr(lower(name), ?) > 0", (pattern.lower(),)
+        rows = self._query(
+            "SELECT path, name, type, size, mtime, etag FROM entries WHERE %s AND %s ORDER BY path LIMIT ?" % (condition, match),
+            (*params, *match_params, limit),
+        )
+        return [self._entry(row) for row in rows]
+
+    def usage(self, path):
+        """The disk usage of the directory at path: the total "size" in bytes, and the number of "files" and "directories" below it"""
+        condition, params = _subtree(path.strip("/"))
+        ((size, files, directories),) = self._query(
+            "SELECT coalesce(sum(CASE WHEN type = 'file' THEN size END), 0), count(CASE WHEN type = 'file' THEN 1 END), count(CASE WHEN type = 'directory' THEN 1 END) "
+            "FROM entries WHERE %s" % condition,
+            params,
+        )
+        return {"size": size, "files": files, "directories": directories}
+
+    @staticmethod
+    def _entry(row):
+        path, name, type, size, mtime, etag = row
+        return {"path": path, "name": name, "type": type, "size": size, "mtime": mtime, "etag": etag}
@@ -0,0 +1,136 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import contextvars
+import inspect
+import time
+
+from prometheus_client import Counter, Histogram
+from tornado.web import HTTPError
+
+__all__ = ("count_backend_call", "count_bytes", "drive_labels", "observe")
+
+# Every metric is labelled with the drive (the hash of its resource, never its url, as that can carry
+# credentials) and the type of its resource. They are registered with the default prometheus registry,
+# so are served by jupyter_server's /metrics endpoint.
+OPERATION_SECONDS = Histogram(
+    "jupyterfs_operation_duration_seconds",
+    "Duration of the contents operations on jupyter-fs drives",
+    ["drive", "type", "operation"],
+)
+OPERATION_ERRORS = Counter(
+    "jupyterfs_operation_errors",
+    "Contents operations on jupyter-fs drives that failed, by http status",
+    ["drive", "type", "operation", "code"],
+)
+BACKEND_CALLS = Counter(
+    "jupyterfs_backend_calls",
+    "Calls made to the filesystems (pyfs or fsspec) of jupyter-fs drives, by filesystem method",
+    ["drive", "type", "call"],
+)
+BYTES_READ = Counter(
+    "jupyterfs_read_bytes",
+    "Bytes of file contents read from jupyter-fs drives",
+    ["drive", "type"],
+)
+BYTES_WRITTEN = Counter(
+    "jupyterfs_written_bytes",
+    "Bytes of file contents written to jupyter-fs drives",
+    ["drive", "type"],
+)
+
+# the (drive, type) labels of the operation being run, for the backend calls and bytes counted meanwhile
+_current = contextvars.ContextVar("jupyterfs_metrics_drive", default=None)
+
+
+def drive_labels(cm, prefix):
+    """The (drive, type) labels of the drive with the given prefix"""
+    if not prefix:
+        return "", "root"
+    for resource in getattr(cm, "resources", ()):
+        if resource.get("drive") == prefix:
+            return prefix, resource.get("type", "")
+    return prefix, ""
+
+
+class observe:
+    """Context manager that records the duration of a call of a manager method on a drive, and whether it failed.
+    The backend calls and bytes counted meanwhile are attributed to the drive.
+
+    `get` operations are recorded by the type of what they got (e.g. get_directory, get_file), see `done`.
+    Calls with arguments the method does not take are not recorded: jupyter_server makes such calls to probe
+    for the arguments a contents manager supports (e.g. require_hash).
+
+    Args:
+        cm (MetaManagerShared): the contents manager the drive belongs to
+        prefix (str): the drive prefix
+        func (callable): the manager method called
+        args (tuple): its positional arguments
+        kwargs (dict): its keyword arguments
+    """
+
+    def __init__(self, cm, prefix, func, args, kwargs):
+        self.labels = drive_labels(cm, prefix)
+        self.operation = func.__name__
+        self._call = func, args, kwargs
+        self._type = kwargs.get("type")
+
+    def done(self, result):
+        """Note the result of the operation, and return it"""
+        if isinstance(result, dict) and result.get("type"):
+            self._type = result["type"]
+        return result
+
+    @property
+    def name(self):
+        if self.operation == "get" and self._type:
+            return "get_%s" % self._type
+        return self.operation
+
+    def __enter__(self):
+        self._token = _current.set(self.labels)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc_type is TypeError and not _accepts(*self._call):
+            return
+        OPERATION_SECONDS.labels(*self.labels, self.name).observe(time.perf_counter() - self._start)
+        if exc_type is not None:
+            code = exc.status_code if isinstance(exc, HTTPError) else 500
+            OPERATION_ERRORS.labels(*self.labels, self.name, str(code)).inc()
+
+
+def _accepts(func, args, kwargs):
+    try:
+        inspect.signature(func).bind(*args, **kwargs)
+    except TypeError:
+        return False
+    except ValueError:
+        # no signature to check against
+        pass
+    return True
+
+
+def count_backend_call(name):
+    """Count a call of the filesystem method name, by the drive of the operation being run
+    (calls made outside of an operation are not counted)
+    """
+    labels = _current.get()
+    if labels is not None:
+        BACKEND_CALLS.labels(*labels, name).inc()
+
+
+def count_bytes(direction, n, labels=None):
+    """Count n bytes "read" from or "written" to the drive with the given labels,
+    by default the drive of the operation being run (bytes read or written outside of an operation are not counted)
+    """
+    labels = labels or _current.get()
+    if labels is None or not n:
+        return
+    (BYTES_READ if direction == "read" else BYTES_WRITTEN).labels(*labels).inc(n)
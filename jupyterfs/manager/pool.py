@@ -0,0 +1,103 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import threading
+import time
+from collections import OrderedDict
+
+__all__ = ("FilesystemPool",)
+
+
+class FilesystemPool:
+    """A pool of filesystem instances (and so of backend connections), shared by the managers that use the same
+    backend with the same credentials, whatever their root.
+
+    Instances are reference counted. One that is no longer used by any manager is kept idle for `idle_timeout`
+    seconds, so that it can be picked up again (e.g. when the resources are posted again), and at most `max_idle`
+    of them are kept idle, the least recently released being closed first. Idle instances are closed when the pool
+    is next used (see `evict`), not on a timer.
+
+    Args:
+        idle_timeout (float): seconds after which an unused instance is closed
+        max_idle (int): maximum number of unused instances kept open
+    """
+
+    def __init__(self, idle_timeout=300.0, max_idle=8):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        # key -> [instance, refcount, close]
+        self._entries = {}
+        # key -> when it was released, least recently released first
+        self._idle = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, key, opener, close=None):
+        """Get the instance for key, opening it with opener() if there is none.
+        Every call must be balanced by a call to `release` once the instance is no longer used.
+
+        Args:
+            key (hashable): identifies the backend and credentials of the instance
+            opener (callable): opens a new instance
+            close (callable): close(instance) closes an instance once it has been idle for too long
+        """
+        with self._lock:
+            instance = self._take(key)
+            if instance is not None:
+                self.hits += 1
+                return instance
+        # opened without the lock, as it can block on the backend
+        instance = opener()
+        with self._lock:
+            existing = self._take(key)
+            if existing is None:
+                self.misses += 1
+                self._entries[key] = [instance, 1, close]
+                return instance
+        # another manager of the same backend opened it in the meantime: use theirs
+        if close is not None:
+            close(instance)
+        return existing
+
+    def _take(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry[1] += 1
+        self._idle.pop(key, None)
+        return entry[0]
+
+    def release(self, key):
+        """Give back an instance got from `acquire`"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                self._idle[key] = time.monotonic()
+        self.evict()
+
+    def evict(self):
+        """Close the instances that have been idle for longer than idle_timeout, and the least recently used ones beyond max_idle"""
+        expired = []
+        with self._lock:
+            now = time.monotonic()
+            while self._idle:
+                key, since = next(iter(self._idle.items()))
+                if len(self._idle) <= self.max_idle and now - since < self.idle_timeout:
+                    break
+                del self._idle[key]
+                expired.append(self._entries.pop(key))
+        for instance, _, close in expired:
+            if close is not None:
+                close(instance)
+
+    def stats(self):
+        with self._lock:
+            return {"open": len(self._entries), "idle": len(self._idle), "hits": self.hits, "misses": self.misses}
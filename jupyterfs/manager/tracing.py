@@ -0,0 +1,191 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import contextvars
+import functools
+import inspect
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+from .metrics import count_backend_call, drive_labels
+
+__all__ = ("Trace", "traced", "trace_operation")
+
+# the Trace of the operation being run, if it is traced
+_current = contextvars.ContextVar("jupyterfs_trace", default=None)
+
+
+class Trace:
+    """The backend calls made by an operation on a drive, each as a (name, start, duration) span,
+    in wall clock nanoseconds.
+
+    Args:
+        drive (str): the drive prefix
+        type (str): the type of the drive's resource
+        operation (str): the name of the manager method called
+    """
+
+    def __init__(self, drive, type, operation):
+        self.drive = drive
+        self.type = type
+        self.operation = operation
+        self.start = time.time_ns()
+        self.duration = None
+        self.spans = []
+
+    def record(self, name, start, duration):
+        # called from the executor threads of the drive too: list.append is atomic
+        self.spans.append((name, start, duration))
+
+    def summary(self):
+        """The number of calls and their total duration in ns, of each backend method called, slowest first"""
+        calls = defaultdict(lambda: [0, 0])
+        for name, _, duration in self.spans:
+            calls[name][0] += 1
+            calls[name][1] += duration
+        return sorted(((name, count, total) for name, (count, total) in calls.items()), key=lambda call: -call[2])
+
+    def server_timing(self):
+        """The trace as the value of a Server-Timing header (durations in ms)"""
+        entries = ['jfs-%s;dur=%.2f;desc="drive %s, %d backend calls"' % (self.operation, self.duration / 1e6, self.drive or "root", len(self.spans))]
+        entries += ['jfs-%s-%s;dur=%.2f;desc="%d calls"' % (self.operation, name, total / 1e6, count) for name, count, total in self.summary()]
+        return ", ".join(entries)
+
+
+class _Traced:
+    """Proxy to a filesystem (pyfs or fsspec) that counts the calls of its methods in the metrics of the drive,
+    and records their duration in the operation's Trace while an operation is traced.
+    Calls it makes on itself are not recorded.
+    """
+
+    __slots__ = ("_target",)
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    @property
+    def __class__(self):
+        # so that checks of the backend's class (e.g. for S3) see through the proxy
+        return type(self._target)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not inspect.isroutine(attr):
+            # only methods are recorded, not helper objects (e.g. the walker of a pyfs)
+            return attr
+        trace = _current.get()
+
+        if trace is None:
+
+            @functools.wraps(attr)
+            def counted_call(*args, **kwargs):
+                count_backend_call(name)
+                return attr(*args, **kwargs)
+
+            return counted_call
+
+        if inspect.iscoroutinefunction(attr):
+
+            @functools.wraps(attr)
+            async def traced_call(*args, **kwargs):
+                count_backend_call(name)
+                start, begin = time.time_ns(), time.perf_counter_ns()
+                try:
+                    return await attr(*args, **kwargs)
+                finally:
+                    trace.record(name, start, time.perf_counter_ns() - begin)
+
+        else:
+
+            @functools.wraps(attr)
+            def traced_call(*args, **kwargs):
+                count_backend_call(name)
+                start, begin = time.time_ns(), time.perf_counter_ns()
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    trace.record(name, start, time.perf_counter_ns() - begin)
+
+        return traced_call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __delattr__(self, name):
+        delattr(self._target, name)
+
+    def __repr__(self):
+        return "traced(%r)" % (self._target,)
+
+
+def traced(fs):
+    """Wrap the filesystem of a manager, so that its backend calls are counted, and recorded in the traces of traced operations"""
+    return fs if fs is None or type(fs) is _Traced else _Traced(fs)
+
+
+class _TraceScope:
+    def __init__(self, cm, prefix, func):
+        self.cm = cm
+        self.trace = Trace(*drive_labels(cm, prefix), getattr(func, "__name__", "call"))
+
+    def __enter__(self):
+        self._token = _current.set(self.trace)
+        self._begin = time.perf_counter_ns()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        self.trace.duration = time.perf_counter_ns() - self._begin
+        if exc_type is not None and not self.trace.spans:
+            # failed before reaching the backend, e.g. jupyter_server probing for the arguments a manager takes
+            return
+        try:
+            _export(self.cm, self.trace)
+        except Exception:
+            self.cm.log.exception("Failed to export the trace of %s on drive %s", self.trace.operation, self.trace.drive)
+
+
+def trace_operation(cm, prefix, func):
+    """Context manager that traces the backend calls of an operation on a drive, if tracing is enabled
+    (see the `trace_backend_calls` option). The trace is logged, added to the `Server-Timing` header of the
+    request being handled, and emitted as OpenTelemetry spans if opentelemetry is installed.
+    """
+    config = getattr(cm, "_jupyterfsConfig", None)
+    if config is None or not config.trace_backend_calls or _current.get() is not None:
+        # the calls of nested operations are traced as part of the outer one
+        return nullcontext()
+    return _TraceScope(cm, prefix, func)
+
+
+def _export(cm, trace):
+    cm.log.info(
+        "%s on drive %s took %.1fms, with %d backend calls: %s",
+        trace.operation,
+        trace.drive or "root",
+        trace.duration / 1e6,
+        len(trace.spans),
+        ", ".join("%s x%d %.1fms" % (name, count, total / 1e6) for name, count, total in trace.summary()) or "none",
+    )
+
+    from jupyter_server.base.call_context import CallContext
+
+    handler = CallContext.get(CallContext.JUPYTER_HANDLER)
+    if handler is not None:
+        handler.add_header("Server-Timing", trace.server_timing())
+
+    try:
+        from opentelemetry import trace as otel
+    except ImportError:
+        return
+    tracer = otel.get_tracer("jupyterfs")
+    attributes = {"jupyterfs.drive": trace.drive, "jupyterfs.type": trace.type}
+    span = tracer.start_span("jupyterfs.%s" % trace.operation, start_time=trace.start, attributes=attributes)
+    parent = otel.set_span_in_context(span)
+    for name, start, duration in trace.spans:
+        tracer.start_span(name, context=parent, start_time=start, attributes=attributes).end(end_time=start + duration)
+    span.end(end_time=trace.start + trace.duration)
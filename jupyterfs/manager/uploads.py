@@ -0,0 +1,173 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import logging
+import threading
+import time
+
+from tornado import web
+
+__all__ = ("UploadSessions",)
+
+log = logging.getLogger(__name__)
+
+
+class _UploadSession:
+    def __init__(self, handle):
+        self.handle = handle
+        self.next_chunk = 2
+        self.last_used = time.monotonic()
+        # held while a chunk is written, and while the session is finished or aborted
+        # (reentrant, as a failed write aborts the session it holds)
+        self.lock = threading.RLock()
+        self.closed = False
+
+
+class UploadSessions:
+    """A registry of the chunked uploads in progress on a drive, keyed by path.
+
+    The contents api uploads a large file as a sequence of models numbered 1, 2, ..., -1 (the last one).
+    Rather than rewriting (or appending to) the file for each of them, the first chunk opens a
+    write handle, that is kept here and written to by the following chunks, and closed by the last one.
+
+    Handles that see no chunk for `idle_timeout` seconds are aborted: their `discard()` method is
+    called if they have one (e.g. to abort a multipart upload), otherwise they are closed. Handles
+    should have a `discard()`, so that an aborted upload leaves the destination as it was, and it has to
+    release the handle even if it fails: closing the handle instead would complete the upload.
+    A chunk that arrives for an aborted upload is rejected.
+
+    Args:
+        idle_timeout (float): seconds after which an idle upload is aborted
+    """
+
+    def __init__(self, idle_timeout=300.0):
+        self.idle_timeout = idle_timeout
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, path):
+        return path in self._sessions
+
+    def handle(self, path):
+        """The write handle of the upload of path in progress, or None"""
+        with self._lock:
+            session = self._sessions.get(path)
+        return None if session is None else session.handle
+
+    def write(self, path, chunk, data, opener):
+        """Write the data of a chunk to the upload of path.
+
+        Args:
+            path (str): the path being uploaded to
+            chunk (int): the number of the chunk. 1 starts a new upload, -1 is the last chunk
+            data (bytes): the content of the chunk
+            opener (callable): called with no arguments to open the write handle of a new upload
+        Returns:
+            handle: the write handle, once the last chunk is written. The caller has to finalize it
+                (e.g. close it). None for any other chunk.
+        """
+        self.expire()
+        if chunk == 1:
+            self.abort(path)
+            session = _UploadSession(opener())
+            with self._lock:
+                self._sessions[path] = session
+            self._schedule_expiry()
+        else:
+            with self._lock:
+                session = self._sessions.get(path)
+            if session is None:
+                raise web.HTTPError(400, "No upload in progress for %s, chunk %s cannot be saved" % (path, chunk))
+
+        with session.lock:
+            if session.closed:
+                raise web.HTTPError(400, "The upload of %s was aborted, chunk %s cannot be saved" % (path, chunk))
+            if chunk not in (1, -1, session.next_chunk):
+                self.abort(path)
+                raise web.HTTPError(400, "Unexpected chunk %s for %s, expected chunk %s" % (chunk, path, session.next_chunk))
+            try:
+                session.handle.write(data)
+            except BaseException:
+                self.abort(path)
+                raise
+            session.next_chunk = chunk + 1
+            session.last_used = time.monotonic()
+
+            if chunk == -1:
+                session.closed = True
+                self._forget(path, session)
+                return session.handle
+        return None
+
+    def _forget(self, path, session):
+        with self._lock:
+            if self._sessions.get(path) is session:
+                del self._sessions[path]
+
+    def _close(self, path, session):
+        # waits for a chunk being written to the session, so its handle is never discarded mid-write
+        with session.lock:
+            if session.closed:
+                return
+            session.closed = True
+            self._forget(path, session)
+            self._discard(path, session.handle)
+
+    def abort(self, path):
+        """Abort the upload of path, if any"""
+        with self._lock:
+            session = self._sessions.get(path)
+        if session is not None:
+            self._close(path, session)
+
+    def abort_all(self):
+        with self._lock:
+            sessions = list(self._sessions.items())
+        for path, session in sessions:
+            self._close(path, session)
+
+    def expire(self):
+        """Abort the uploads that have been idle for longer than idle_timeout"""
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [(path, session) for path, session in self._sessions.items() if session.last_used < deadline]
+        for path, session in idle:
+            with session.lock:
+                # a chunk may have been written since
+                if session.closed or session.last_used >= deadline:
+                    continue
+                log.warning("Aborting idle upload of %s", path)
+                self._close(path, session)
+
+    def _discard(self, path, handle):
+        try:
+            discard = getattr(handle, "discard", None)
+            if discard is not None:
+                discard()
+            else:
+                handle.close()
+        except Exception:
+            log.exception("Failed to abort the upload of %s", path)
+
+    def _schedule_expiry(self):
+        # sweep idle uploads even if no further chunks arrive
+        with self._lock:
+            if self._timer is not None or not self._sessions:
+                return
+            self._timer = threading.Timer(self.idle_timeout, self._expire_and_reschedule)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire_and_reschedule(self):
+        with self._lock:
+            self._timer = None
+        self.expire()
+        self._schedule_expiry()
@@ -5,10 +5,15 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import asyncio
+import functools
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5
 
+from jupyter_core.paths import jupyter_runtime_dir
 from jupyter_server.base.handlers import APIHandler
 from jupyter_server.services.contents.manager import (
     AsyncContentsManager,
@@ -19,7 +24,12 @@ from traitlets import default
 
 from .auth import substituteAsk, substituteEnv, substituteNone
 from .config import JupyterFs as JupyterFsConfig
-from .manager import FileSystemLoadError, FSManager, FSSpecManager
+from .executor import DriveExecutor
+from .health import HealthChecker
+from .index import IndexCrawler
+from .manager import AsyncFSSpecManager, FileSystemLoadError, FSManager, FSSpecManager
+from .manager.index import MetadataIndex
+from .manager.pool import FilesystemPool
 from .pathutils import (
     path_first_arg,
     path_kwarg,
@@ -31,6 +41,7 @@ __all__ = (
     "MetaManager",
     "SyncMetaManager",
     "MetaManagerHandler",
+    "MetaManagerStatsHandler",
 )
 
 
@@ -50,6 +61,19 @@ class MetaManagerShared:
         self.resources = []
         self._default_root_manager = self._jupyterfsConfig.root_manager_class(**self._kwargs)
         self._managers = dict((("", self._default_root_manager),))
+        self._executors = {}
+        self._executor_options = {}
+        self._indexes = {}
+        self._crawlers = {}
+        # futures of the managers that are still being created, by drive (see initResourceAsync)
+        self._pending = {}
+        # the (status, error) of the last health check of each drive
+        self._health = {}
+        self._health_checker = None
+        self._fs_pool = FilesystemPool(
+            idle_timeout=self._jupyterfsConfig.fs_pool_idle_timeout,
+            max_idle=self._jupyterfsConfig.fs_pool_max_idle,
+        )
 
         # copy kwargs to pyfs_kw, removing kwargs not relevant to pyfs
         self._pyfs_kw = pyfs_kw or {}
@@ -57,13 +81,51 @@ class MetaManagerShared:
         self.initResource(*self._jupyterfsConfig.resources)
 
     def initResource(self, *resources, options={}):
-        """initialize one or more (name, url) tuple representing a PyFilesystem resource specification"""
-        # handle options
+        """initialize one or more (name, url) tuple representing a PyFilesystem resource specification.
+        The managers of new resources are created one after the other, blocking until all of them are
+        """
+        specs, to_create = self._prepare_resources(resources, options)
+        created = {_hash: self._create_manager(resource, url) for _hash, (resource, url) in to_create.items()}
+        return self._install_resources(specs, created, options)
+
+    async def initResourceAsync(self, *resources, options={}):
+        """Same as `initResource`, but the managers of new resources are created concurrently, on threads, as creating one
+        can block on its backend (e.g. to check that its root exists). Each resource is waited for for at most its
+        "initTimeout" (default: `JupyterFs.init_timeout`) seconds. The resources whose manager is not created by then are
+        returned with init set to "pending", and their manager is added in the background once it is.
+        """
+        specs, to_create = self._prepare_resources(resources, options, pending=self._pending)
+        futures = {_hash: self._pending[_hash] for _, _hash, _ in specs if _hash in self._pending}
+        if to_create:
+            # a pool of its own, so that managers stuck on unreachable backends do not hold up anything else
+            pool = ThreadPoolExecutor(max_workers=len(to_create), thread_name_prefix="jupyterfs-init")
+            loop = asyncio.get_running_loop()
+            for _hash, (resource, url) in to_create.items():
+                futures[_hash] = loop.run_in_executor(pool, self._create_manager, resource, url)
+            pool.shutdown(wait=False)
+
+        timeouts = {_hash: resource.get("initTimeout", self._jupyterfsConfig.init_timeout) for resource, _hash, _ in specs if _hash in futures}
+        await asyncio.gather(*(asyncio.wait([future], timeout=timeouts[_hash]) for _hash, future in futures.items()))
+
+        created = {_hash: future.result() for _hash, future in futures.items() if future.done()}
+        pending = {_hash: future for _hash, future in futures.items() if not future.done()}
+        self._pending.update(pending)
+        resources = self._install_resources(specs, created, options, pending=pending)
+        for _hash, future in pending.items():
+            self.log.warning("Manager for drive %s is not ready after %ss, initializing it in the background", _hash, timeouts[_hash])
+            asyncio.ensure_future(self._complete_pending(_hash, future))
+        return resources
+
+    def _prepare_resources(self, resources, options, pending={}):
+        """Fill in the defaults of resource specifications, and work out their drive.
+
+        Returns:
+            tuple: a (resource, drive, missingTokens) tuple per resource, and the (resource, url) of each drive
+                whose manager has to be created, keyed by drive
+        """
         cache = options.get("cache", True)
-        verbose = options.get("verbose", False)
-
-        self.resources = []
-        managers = dict((("", self._default_root_manager),))
+        specs = []
+        to_create = {}
 
         for resource in resources:
             # server side resources don't have a default 'auth' key
@@ -84,17 +146,11 @@ class MetaManagerShared:
 
             # get deterministic hash of PyFilesystem url
             _hash = md5((resource["url"] + resource["type"]).encode("utf-8")).hexdigest()[:8]
-            init = False
             missingTokens = None
-            errors = []
 
-            if _hash in self._managers and cache:
-                # reuse existing cm
-                managers[_hash] = self._managers[_hash]
-                init = True
-            elif _hash in managers and cache:
-                # don't add redundant cm
-                init = True
+            if _hash in to_create or (cache and (_hash in self._managers or _hash in pending)):
+                # reuse existing (or soon to be) cm, and don't add redundant cms
+                pass
             else:
                 if resource["auth"] == "ask":
                     urlSubbed, missingTokens = substituteAsk(resource)
@@ -106,50 +162,89 @@ class MetaManagerShared:
                 if missingTokens:
                     # skip trying to init any resource with missing info
                     _hash = "_NOT_INIT"
-                    init = False
                 else:
-                    # create new cm
-                    default_writable = resource.get("defaultWritable", True)
-                    try:
-                        if resource["type"] == "pyfs":
-                            manager_type = FSManager
-                        elif resource["type"] == "fsspec":
-                            manager_type = FSSpecManager
-                        else:
-                            # Ensure we don't use manager_type from previous loop iteration
-                            raise FileSystemLoadError(f"Unrecognized filesystem type {resource['type']!r}")
-
-                        managers[_hash] = manager_type.create(
-                            urlSubbed,
-                            default_writable=default_writable,
-                            parent=self,
-                            **{
-                                **self._pyfs_kw,
-                                **resource.get("kwargs", {}),
-                            },
-                        )
-                        init = True
-                    except FileSystemLoadError as e:
-                        self.log.exception(
-                            "Failed to create manager for resource %r",
-                            resource.get("name"),
-                        )
-                        errors.append(str(e))
-                    except ImportError as e:
-                        self.log.exception(
-                            "Missing dependencies to create manager for resource %r",
-                            resource.get("name"),
-                        )
-                        errors.append(str(e))
+                    to_create[_hash] = (resource, urlSubbed)
+
+            specs.append((resource, _hash, missingTokens))
+        return specs, to_create
+
+    def _create_manager(self, resource, url):
+        """Create the manager of a resource, given its url with the tokens substituted. Returns (manager or None, errors)"""
+        try:
+            if resource["type"] == "pyfs":
+                manager_type = FSManager
+            elif resource["type"] == "fsspec":
+                manager_type = FSSpecManager
+                if self._use_async_fsspec(url):
+                    manager_type = AsyncFSSpecManager
+            else:
+                # Ensure we don't use manager_type from previous loop iteration
+                raise FileSystemLoadError(f"Unrecognized filesystem type {resource['type']!r}")
+
+            return manager_type.create(
+                url,
+                default_writable=resource.get("defaultWritable", True),
+                parent=self,
+                lazy=resource.get("lazy", self._jupyterfsConfig.lazy_connect),
+                pool=self._fs_pool,
+                **{
+                    **self._pyfs_kw,
+                    **resource.get("kwargs", {}),
+                },
+            ), []
+        except FileSystemLoadError as e:
+            self.log.exception(
+                "Failed to create manager for resource %r",
+                resource.get("name"),
+            )
+            return None, [str(e)]
+        except ImportError as e:
+            self.log.exception(
+                "Missing dependencies to create manager for resource %r",
+                resource.get("name"),
+            )
+            return None, [str(e)]
+
+    def _install_resources(self, specs, created, options, pending={}):
+        """Replace the resources and managers with those of specs, given the (manager, errors) of the drives whose manager was
+        created, and the futures of those whose manager is still being created
+        """
+        verbose = options.get("verbose", False)
+
+        self.resources = []
+        managers = dict((("", self._default_root_manager),))
+        executor_options = {}
+        indexed = set()
+
+        for resource, _hash, missingTokens in specs:
+            errors = []
+            if _hash in created:
+                mgr, errors = created[_hash]
+                if mgr is not None:
+                    managers[_hash] = mgr
+            elif _hash in self._managers and _hash not in managers:
+                # reuse existing cm
+                managers[_hash] = self._managers[_hash]
+            init = "pending" if _hash in pending else _hash in managers
 
             # assemble resource from spec + hash
             newResource = {}
             newResource.update(resource)
             newResource.update({"drive": _hash, "init": init})
             if self._jupyterfsConfig.surface_init_errors:
-                newResource["errors"] = errors
+                newResource["errors"] = list(errors)
             if missingTokens is not None:
                 newResource["missingTokens"] = missingTokens
+            if init is True and _hash in self._health:
+                self._apply_health(newResource, *self._health[_hash])
+
+            if init:
+                executor_options[_hash] = {
+                    "max_workers": resource.get("maxWorkers", self._jupyterfsConfig.drive_max_workers),
+                    "max_queue": resource.get("maxQueue", self._jupyterfsConfig.drive_max_queue),
+                }
+                if resource.get("index", self._jupyterfsConfig.metadata_index) and (init == "pending" or hasattr(managers[_hash], "scan_dir")):
+                    indexed.add(_hash)
 
             if "tokenDict" in newResource:
                 # sanity check: tokenDict should not make the round trip
@@ -157,14 +252,190 @@ class MetaManagerShared:
 
             self.resources.append(newResource)
 
-        # replace existing contents managers with new
+        # replace existing contents managers with new, releasing the backends of those that went away
+        for prefix, mgr in self._managers.items():
+            if prefix and managers.get(prefix) is not mgr:
+                self._close_manager(mgr)
         self._managers = managers
+        self._fs_pool.evict()
+        self._health = {prefix: health for prefix, health in self._health.items() if prefix in managers}
+
+        # drop the executors of drives that went away, or whose options changed
+        for prefix in list(self._executors):
+            if prefix and executor_options.get(prefix) != self._executor_options.get(prefix):
+                self._executors.pop(prefix).shutdown()
+        self._executor_options = executor_options
+        for prefix, mgr in managers.items():
+            if prefix:
+                self._attach_executor(prefix, mgr)
+
+        # attach the metadata index of indexed drives to their manager, and close those of drives that went away
+        for prefix in list(self._indexes):
+            if prefix not in indexed:
+                crawler = self._crawlers.pop(prefix, None)
+                if crawler is not None:
+                    crawler.stop()
+                self._indexes.pop(prefix).close()
+        for prefix in indexed:
+            self._attach_index(prefix)
 
         if verbose:
             print("jupyter-fs initialized: {} file system resources, {} managers".format(len(self.resources), len(self._managers)))
 
         return self.resources
 
+    def _attach_index(self, prefix):
+        if prefix not in self._indexes:
+            self._indexes[prefix] = MetadataIndex(os.path.join(self._index_dir(), "%s.sqlite" % prefix))
+        if prefix in self._managers:
+            self._managers[prefix]._index = self._indexes[prefix]
+
+    def _attach_executor(self, prefix, mgr):
+        # managers that run calls of their own on the executor of their drive get it when they need it,
+        # as it is replaced when the options of the drive change
+        if hasattr(mgr, "_get_executor"):
+            mgr._get_executor = functools.partial(self._drive_executor, prefix)
+
+    async def _complete_pending(self, prefix, future):
+        """Add the manager of a drive that was still being created when its resources were initialized"""
+        try:
+            mgr, errors = await future
+            if isinstance(mgr, AsyncFSSpecManager) and not mgr.connection_checked:
+                try:
+                    await mgr.check_connection()
+                except RuntimeError as e:
+                    self.log.exception("Failed to create manager for drive %s", prefix)
+                    self._close_manager(mgr)
+                    mgr, errors = None, [str(e)]
+        except Exception as e:
+            self.log.exception("Failed to create manager for drive %s", prefix)
+            mgr, errors = None, [str(e)]
+        finally:
+            if self._pending.get(prefix) is future:
+                del self._pending[prefix]
+
+        resources = [resource for resource in self.resources if resource["drive"] == prefix and resource["init"] == "pending"]
+        if not resources:
+            # the drive went away (or was completed by another initialization) in the meantime
+            self._close_manager(mgr)
+            return
+        if mgr is not None:
+            self._managers[prefix] = mgr
+            self._attach_executor(prefix, mgr)
+            if prefix in self._indexes:
+                self._attach_index(prefix)
+        for resource in resources:
+            resource["init"] = mgr is not None
+            if self._jupyterfsConfig.surface_init_errors:
+                resource["errors"].extend(errors)
+        self.log.info("Manager for drive %s is %s", prefix, "ready" if mgr is not None else "not available")
+
+    @staticmethod
+    def _close_manager(mgr):
+        close = getattr(mgr, "close", None)
+        if close is not None:
+            close()
+
+    def _use_async_fsspec(self, url):
+        return isinstance(self, AsyncContentsManager) and self._jupyterfsConfig.fsspec_async and AsyncFSSpecManager.supports(url)
+
+    async def check_connections(self):
+        """Check the connection of managers that could not be checked when they were created,
+        as they use the async api of their backend. Resources that fail the check are uninitialized.
+        """
+        failed = {}
+        for resource in self.resources:
+            mgr = self._managers.get(resource["drive"])
+            if isinstance(mgr, AsyncFSSpecManager) and not mgr.connection_checked:
+                try:
+                    await mgr.check_connection()
+                except RuntimeError as e:
+                    self.log.exception("Failed to create manager for resource %r", resource.get("name"))
+                    failed[resource["drive"]] = str(e)
+                    self._close_manager(self._managers.pop(resource["drive"]))
+
+        for resource in self.resources:
+            if resource["drive"] in failed:
+                resource["init"] = False
+                if self._jupyterfsConfig.surface_init_errors:
+                    resource["errors"].append(failed[resource["drive"]])
+            elif resource["init"]:
+                # start crawling the indexed drives
+                self._drive_index(resource["drive"])
+        self._start_health_checks()
+        return self.resources
+
+    def _start_health_checks(self):
+        """Probe the backends of the drives in the background: every `health_check_interval` seconds if it is set, else
+        once if any drive connects lazily, to open its connection ahead of its first use
+        """
+        config = self._jupyterfsConfig
+        lazy = any(resource["init"] is True and resource.get("lazy", config.lazy_connect) for resource in self.resources)
+        if not (config.health_check_interval or lazy):
+            return
+        if self._health_checker is None:
+            self._health_checker = HealthChecker(self, interval=config.health_check_interval, timeout=config.health_check_timeout)
+        self._health_checker.start()
+
+    def _set_health(self, prefix, status, error=None):
+        self._health[prefix] = (status, error)
+        for resource in self.resources:
+            if resource["drive"] == prefix:
+                self._apply_health(resource, status, error)
+
+    @staticmethod
+    def _apply_health(resource, status, error):
+        resource["health"] = status
+        if error:
+            resource["healthError"] = error
+        else:
+            resource.pop("healthError", None)
+
+    def _index_dir(self):
+        return self._jupyterfsConfig.index_dir or os.path.join(getattr(self.parent, "runtime_dir", None) or jupyter_runtime_dir(), "jupyterfs-index")
+
+    def _drive_index(self, prefix):
+        """Get the metadata index of the drive with the given prefix (None if it is not indexed), and make sure its crawler runs"""
+        index = self._indexes.get(prefix)
+        if index is None or prefix not in self._managers:
+            return None
+        crawler = self._crawlers.get(prefix)
+        if crawler is None:
+            crawler = self._crawlers[prefix] = IndexCrawler(
+                self,
+                prefix,
+                index,
+                refresh_interval=self._jupyterfsConfig.index_refresh_interval,
+                concurrency=self._jupyterfsConfig.index_crawl_concurrency,
+            )
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # started on the first call from the server's event loop
+            pass
+        else:
+            crawler.start()
+        return index
+
+    def _drive_executor(self, prefix):
+        """Get the executor that runs the blocking calls of the drive with the given prefix"""
+        executor = self._executors.get(prefix)
+        if executor is None:
+            options = self._executor_options.get(prefix) or {
+                "max_workers": self._jupyterfsConfig.drive_max_workers,
+                "max_queue": self._jupyterfsConfig.drive_max_queue,
+            }
+            executor = self._executors[prefix] = DriveExecutor(prefix, **options)
+        return executor
+
+    def drive_stats(self):
+        """Returns the runtime statistics of each drive, e.g. the hit/miss counters of its metadata cache"""
+        stats = {}
+        for drive, mgr in self._managers.items():
+            if drive and hasattr(mgr, "cache_stats"):
+                stats[drive] = {"cache": mgr.cache_stats()}
+        return stats
+
     @property
     def root_manager(self):
         # in jlab, the root drive prefix is blank
@@ -181,6 +452,7 @@ class MetaManagerShared:
 
     save = path_second_arg("save", "model", True, sync=True)
     rename = path_old_new("rename", False, sync=True)
+    copy = path_old_new("copy", True, sync=True)
 
     get = path_first_arg("get", True, sync=True)
     delete = path_first_arg("delete", False, sync=True)
@@ -203,7 +475,8 @@ class MetaManager(MetaManagerShared, AsyncContentsManager):
     exists = path_first_arg("exists", False, sync=False)
 
     save = path_second_arg("save", "model", True, sync=False)
-    rename = path_old_new("rename", False, sync=False)
+    rename = path_old_new("rename", False, sync=False, across_backends="move")
+    copy = path_old_new("copy", True, sync=False, across_backends="duplicate")
 
     get = path_first_arg("get", True, sync=False)
     delete = path_first_arg("delete", False, sync=False)
@@ -285,4 +558,12 @@ class MetaManagerHandler(APIHandler):
             if not isinstance(resource, dict):
                 raise web.HTTPError(400, f"Resources must be a list of dicts, got: {resource}")
 
-        self.finish(json.dumps(self.contents_manager.initResource(*resources, options=options)))
+        await self.contents_manager.initResourceAsync(*resources, options=options)
+        self.finish(json.dumps(await self.contents_manager.check_connections()))
+
+
+class MetaManagerStatsHandler(APIHandler):
+    @web.authenticated
+    async def get(self):
+        """Returns the runtime statistics of each drive, keyed by drive"""
+        self.finish(json.dumps(self.contents_manager.drive_stats()))
@@ -5,8 +5,14 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
+import inspect
+
 from tornado.web import HTTPError
 
+from .manager.cache import request_scope
+from .manager.metrics import observe
+from .manager.tracing import trace_operation
+
 __all__ = [
     "path_first_arg",
     "path_second_arg",
@@ -84,6 +90,33 @@ def _get_arg(argname, args, kwargs):
         raise TypeError("No value passed for %s" % argname)
 
 
+def _call(self, prefix, mgr, method_name, *args, **kwargs):
+    """Call a manager method, recording it in the metrics of its drive (and tracing it, if enabled)"""
+    func = getattr(mgr, method_name)
+    with observe(self, prefix, func, args, kwargs) as operation, trace_operation(self, prefix, func):
+        return operation.done(func(*args, **kwargs))
+
+
+async def _call_async(self, prefix, mgr, method_name, *args, **kwargs):
+    """Call a manager method from an async context without blocking the event loop.
+
+    Coroutine methods (e.g. of an async contents manager) are awaited directly,
+    blocking ones are run on the executor of the drive they belong to.
+    Per-request memoized lookups (e.g. hidden-ness of ancestors) are shared for the duration of the call,
+    which is recorded in the metrics of the drive (and traced, if enabled).
+    """
+    func = getattr(mgr, method_name)
+    with request_scope(), observe(self, prefix, func, args, kwargs) as operation, trace_operation(self, prefix, func):
+        return operation.done(await _run_async(self, prefix, func, *args, **kwargs))
+
+
+async def _run_async(self, prefix, func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the executor of the drive: on the event loop if it is a coroutine function, else on its threads"""
+    if inspect.iscoroutinefunction(func):
+        return await self._drive_executor(prefix).run_coroutine(func, *args, **kwargs)
+    return await self._drive_executor(prefix).run(func, *args, **kwargs)
+
+
 # Dispatch decorators.
 def path_first_arg(method_name, returns_model, sync=False):
     """Decorator for methods that accept path as a first argument,
@@ -91,15 +124,16 @@ def path_first_arg(method_name, returns_model, sync=False):
 
     def _wrapper(self, *args, **kwargs):
         path, args = _get_arg("path", args, kwargs)
-        _, mgr, mgr_path = _resolve_path(path, self._managers)
-        result = getattr(mgr, method_name)(mgr_path, *args, **kwargs)
-        return result
+        prefix, mgr, mgr_path = _resolve_path(path, self._managers)
+        return _call(self, prefix, mgr, method_name, mgr_path, *args, **kwargs)
 
     if sync:
         return _wrapper
 
     async def _wrapper2(self, *args, **kwargs):
-        return _wrapper(self, *args, **kwargs)
+        path, args = _get_arg("path", args, kwargs)
+        prefix, mgr, mgr_path = _resolve_path(path, self._managers)
+        return await _call_async(self, prefix, mgr, method_name, mgr_path, *args, **kwargs)
 
     return _wrapper2
 
@@ -111,15 +145,17 @@ def path_second_arg(method_name, first_argname, returns_model, sync=False):
     def _wrapper(self, *args, **kwargs):
         other, args = _get_arg(first_argname, args, kwargs)
         path, args = _get_arg("path", args, kwargs)
-        _, mgr, mgr_path = _resolve_path(path, self._managers)
-        result = getattr(mgr, method_name)(other, mgr_path, *args, **kwargs)
-        return result
+        prefix, mgr, mgr_path = _resolve_path(path, self._managers)
+        return _call(self, prefix, mgr, method_name, other, mgr_path, *args, **kwargs)
 
     if sync:
         return _wrapper
 
     async def _wrapper2(self, *args, **kwargs):
-        return _wrapper(self, *args, **kwargs)
+        other, args = _get_arg(first_argname, args, kwargs)
+        path, args = _get_arg("path", args, kwargs)
+        prefix, mgr, mgr_path = _resolve_path(path, self._managers)
+        return await _call_async(self, prefix, mgr, method_name, other, mgr_path, *args, **kwargs)
 
     return _wrapper2
 
@@ -132,27 +168,34 @@ def path_kwarg(method_name, path_default, returns_model, sync=False):
     """
 
     def _wrapper(self, path=path_default, **kwargs):
-        _, mgr, mgr_path = _resolve_path(path, self._managers)
-        result = getattr(mgr, method_name)(path=mgr_path, **kwargs)
-        return result
+        prefix, mgr, mgr_path = _resolve_path(path, self._managers)
+        return _call(self, prefix, mgr, method_name, path=mgr_path, **kwargs)
 
     if sync:
         return _wrapper
 
-    async def _wrapper2(self, *args, **kwargs):
-        return _wrapper(self, *args, **kwargs)
+    async def _wrapper2(self, path=path_default, **kwargs):
+        prefix, mgr, mgr_path = _resolve_path(path, self._managers)
+        return await _call_async(self, prefix, mgr, method_name, path=mgr_path, **kwargs)
 
     return _wrapper2
 
 
-def path_old_new(method_name, returns_model, sync=False):
+def path_old_new(method_name, returns_model, sync=False, across_backends=None):
     """Decorator for methods accepting old_path and new_path.
 
     e.g. manager.rename(old_path, new_path)
+
+    A new_path of None (as in manager.copy(from_path)) is passed on to the manager of old_path.
+
+    across_backends names the `Transfer` method ("duplicate" or "move") that handles paths on
+    different backends. If None, or for sync methods, those are rejected with a 400.
     """
 
-    def _wrapper(self, old_path, new_path, *args, **kwargs):
+    def _resolve_old_new(self, old_path, new_path):
         old_prefix, old_mgr, old_mgr_path = _resolve_path(old_path, self._managers)
+        if new_path is None:
+            return old_prefix, old_mgr, old_mgr_path, None
         new_prefix, new_mgr, new_mgr_path = _resolve_path(new_path, self._managers)
         if old_mgr is not new_mgr:
             # TODO: Consider supporting this via get+save+delete.
@@ -164,14 +207,26 @@ def path_old_new(method_name, returns_model, sync=False):
                 ),
             )
         assert new_prefix == old_prefix
-        result = getattr(new_mgr, method_name)(old_mgr_path, new_mgr_path, *args, **kwargs)
-        return result
+        return new_prefix, new_mgr, old_mgr_path, new_mgr_path
+
+    def _wrapper(self, old_path, new_path=None, *args, **kwargs):
+        prefix, mgr, old_mgr_path, new_mgr_path = _resolve_old_new(self, old_path, new_path)
+        return _call(self, prefix, mgr, method_name, old_mgr_path, new_mgr_path, *args, **kwargs)
 
     if sync:
         return _wrapper
 
-    async def _wrapper2(self, *args, **kwargs):
-        return _wrapper(self, *args, **kwargs)
+    async def _wrapper2(self, old_path, new_path=None, *args, **kwargs):
+        if (
+            across_backends is not None
+            and new_path is not None
+            and _resolve_path(old_path, self._managers)[1] is not _resolve_path(new_path, self._managers)[1]
+        ):
+            from .transfer import Transfer
+
+            return await getattr(Transfer(self, old_path, new_path), across_backends)()
+        prefix, mgr, old_mgr_path, new_mgr_path = _resolve_old_new(self, old_path, new_path)
+        return await _call_async(self, prefix, mgr, method_name, old_mgr_path, new_mgr_path, *args, **kwargs)
 
     return _wrapper2
 
@@ -0,0 +1,179 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import fnmatch
+import json
+import re
+from collections import deque
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+from tornado.iostream import StreamClosedError
+
+from .config import JupyterFs as JupyterFsConfig
+from .pathutils import _call_async, _resolve_path
+
+__all__ = ("SearchHandler", "search")
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def _join(path, name):
+    return "%s/%s" % (path.rstrip("/"), name) if path.strip("/") else name
+
+
+def _matcher(pattern):
+    """A match(relative_path, name) function for a glob (if pattern has any of `*?[`) or substring pattern.
+
+    A glob that has a `/` is matched against the path relative to the searched directory,
+    any other pattern against the name of the entry. Substrings are matched case-insensitively.
+    """
+    if not pattern:
+        raise web.HTTPError(400, "Missing search pattern")
+    if _GLOB_CHARS.search(pattern):
+        regex = re.compile(fnmatch.translate(pattern.strip("/")))
+        if "/" in pattern:
+            return lambda relative_path, name: regex.match(relative_path) is not None
+        return lambda relative_path, name: regex.match(name) is not None
+    needle = pattern.lower()
+    return lambda relative_path, name: needle in name.lower()
+
+
+async def search(cm, path, pattern, limit, timeout, concurrency):
+    """Search the directory at path, and everything below it, for the entries that match pattern.
+
+    The tree is walked breadth first with the `scan_dir` method of the drive's manager, listing up to
+    `concurrency` directories at the same time, and the matches of each directory are yielded as soon
+    as it is listed. Hidden entries are neither matched nor walked into (unless the manager allows hidden).
+
+    Args:
+        cm (MetaManagerShared): the contents manager the drive belongs to
+        path (str): the drive path of the directory to search
+        pattern (str): a glob or substring pattern (see `_matcher`)
+        limit (int): the maximum number of matches
+        timeout (float): the maximum number of seconds to search for
+        concurrency (int): the maximum number of directories listed at the same time
+    Yields:
+        list: the matches found in a directory, as dicts with their drive "path", "name", "type" and "size".
+            The last list ends with a dict that reports that the search is "done", and whether it was
+            "truncated" by the limit or "timed_out"
+    """
+    prefix, mgr, mgr_path = _resolve_path(path, cm._managers)
+    if not hasattr(mgr, "scan_dir"):
+        raise web.HTTPError(400, "Search is not supported for %r" % path)
+    match = _matcher(pattern)
+    root = mgr_path.strip("/")
+    # the searched directory must exist: errors on it are raised, those below it are skipped
+    entries = await _call_async(cm, prefix, mgr, "scan_dir", root)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    found = scanned = 0
+    dirs = deque()
+    pending = {}
+
+    async def scan(dir_path):
+        try:
+            return await _call_async(cm, prefix, mgr, "scan_dir", dir_path)
+        except web.HTTPError as e:
+            # gone since it was listed, or not readable
+            if e.status_code not in (403, 404):
+                raise
+            return []
+
+    try:
+        listed = [(root, entries)]
+        while True:
+            matches = []
+            for dir_path, entries in listed:
+                scanned += 1
+                for entry in entries:
+                    entry_path = _join(dir_path, entry["name"])
+                    if entry["type"] == "directory":
+                        dirs.append(entry_path)
+                    relative_path = entry_path[len(root) :].lstrip("/") if root else entry_path
+                    if not match(relative_path, entry["name"]):
+                        continue
+                    if found >= limit:
+                        yield [*matches, {"done": True, "truncated": True, "timed_out": False, "scanned": scanned}]
+                        return
+                    found += 1
+                    matches.append({**entry, "path": "%s:%s" % (prefix, entry_path) if prefix else entry_path})
+            if matches:
+                yield matches
+
+            while dirs and len(pending) < concurrency:
+                dir_path = dirs.popleft()
+                pending[asyncio.ensure_future(scan(dir_path))] = dir_path
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, timeout=max(deadline - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                yield [{"done": True, "truncated": False, "timed_out": True, "scanned": scanned}]
+                return
+            listed = [(pending.pop(task), task.result()) for task in done]
+
+        yield [{"done": True, "truncated": False, "timed_out": False, "scanned": scanned}]
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class SearchHandler(APIHandler):
+    """Streams the entries below a directory on a jupyter-fs drive that match a glob or substring pattern,
+    as newline delimited JSON objects (see `search`). The last one has "done" set.
+
+    e.g. GET /jupyterfs/search/<drive>:path/to/dir?pattern=*.csv&limit=100
+    """
+
+    _jupyterfsConfig = None
+
+    @property
+    def fsconfig(self):
+        # TODO: This pattern will not pick up changes to config after this!
+        if self._jupyterfsConfig is None:
+            self._jupyterfsConfig = JupyterFsConfig(config=self.config)
+
+        return self._jupyterfsConfig
+
+    def _limit_argument(self, name, maximum, convert):
+        value = self.get_argument(name, None)
+        if value is None:
+            return maximum
+        try:
+            value = convert(value)
+        except ValueError:
+            raise web.HTTPError(400, "Invalid %s: %r" % (name, value))
+        return min(max(value, 0), maximum)
+
+    @web.authenticated
+    async def get(self, path):
+        limit = self._limit_argument("limit", self.fsconfig.search_max_results, int)
+        timeout = self._limit_argument("timeout", self.fsconfig.search_timeout, float)
+        batches = search(self.contents_manager, path, self.get_argument("pattern", ""), limit, timeout, self.fsconfig.search_concurrency)
+        # errors on the searched directory itself are still reported with an http status
+        first = await batches.__anext__()
+        self.set_header("Content-Type", "application/x-ndjson")
+        self.set_header("Cache-Control", "no-cache")
+        try:
+            self.write("".join(json.dumps(match) + "\n" for match in first))
+            await self.flush()
+            async for batch in batches:
+                self.write("".join(json.dumps(match) + "\n" for match in batch))
+                await self.flush()
+        except StreamClosedError:
+            self.log.debug("Client went away while searching %s", path)
+            return
+        except Exception as e:
+            # too late for an error status: report it in the stream instead
+            self.log.exception("Failed to search %s", path)
+            message = e.log_message if isinstance(e, web.HTTPError) else str(e)
+            self.write(json.dumps({"error": message, "done": True}) + "\n")
+        finally:
+            await batches.aclose()
+        self.finish()
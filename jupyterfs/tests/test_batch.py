@@ -0,0 +1,72 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import json
+
+import pytest
+from traitlets.config import Config
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+}
+
+sync_base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.SyncMetaManager",
+    },
+}
+
+
+@pytest.fixture
+def jp_server_config(base_config):
+    return Config(base_config)
+
+
+async def _batch(jp_fetch, *operations):
+    rep = await jp_fetch("/jupyterfs/batch", method="POST", body=json.dumps({"operations": operations}))
+    return json.loads(rep.body)["results"]
+
+
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+@pytest.mark.parametrize("type, url", [("pyfs", "osfs://{}"), ("fsspec", "file://{}"), ("fsspec", "asyncwrapper::file://{}")])
+async def test_batch(tmp_path, jp_fetch, jp_server_config, type, url):
+    if url.startswith("asyncwrapper") and jp_server_config.ServerApp.contents_manager_class.endswith("SyncMetaManager"):
+        pytest.skip("the async api of fsspec is only used by the async MetaManager")
+    for i in range(20):
+        (tmp_path / f"{i}.txt").write_text(str(i))
+    (tmp_path / "dir").mkdir()
+    (tmp_path / "other").mkdir()
+    (resource, other) = await ContentsClient(jp_fetch).set_resources(
+        [{"url": url.format(tmp_path.as_posix()), "type": type}, {"url": f"osfs://{(tmp_path / 'other').as_posix()}", "type": "pyfs"}]
+    )
+    drive, other = resource["drive"], other["drive"]
+
+    results = await _batch(
+        jp_fetch,
+        *({"op": "delete", "path": f"{drive}:{i}.txt"} for i in range(10)),
+        {"op": "delete", "path": f"{drive}:missing.txt"},
+        {"op": "rename", "path": f"{drive}:10.txt", "new_path": f"{drive}:dir/10.txt"},
+        {"op": "copy", "path": f"{drive}:11.txt", "new_path": f"{drive}:dir"},
+        {"op": "rename", "path": f"{drive}:12.txt", "new_path": f"{other}:12.txt"},
+        {"op": "delete", "path": "nosuchdrive:a.txt"},
+        {"op": "chmod", "path": f"{drive}:13.txt"},
+    )
+
+    assert [r["status"] for r in results] == [204] * 10 + [404, 200, 201, 200, 404, 400]
+    assert not any((tmp_path / f"{i}.txt").exists() for i in range(10))
+    assert results[11]["model"]["name"] == "10.txt"
+    assert (tmp_path / "dir" / "10.txt").read_text() == "10"
+    assert results[12]["model"]["name"] == "11.txt"
+    assert (tmp_path / "dir" / "11.txt").read_text() == "11"
+    assert (tmp_path / "11.txt").exists()
+    assert (tmp_path / "other" / "12.txt").read_text() == "12"
+    assert not (tmp_path / "12.txt").exists()
@@ -0,0 +1,140 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from jupyterfs.manager.cache import FRESH, MISS, STALE, AggregateCache, MetadataCache, request_memo, request_scope
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = _Clock()
+    with patch("jupyterfs.manager.cache.time.monotonic", clock):
+        yield clock
+
+
+class TestMetadataCache:
+    def test_ttl(self, clock):
+        cache = MetadataCache(ttl=5, stale_ttl=10)
+        assert cache.lookup("info", "a") == (MISS, None)
+        cache.put("info", "a", 1)
+        assert cache.lookup("info", "a/") == (FRESH, 1)
+        clock.now += 6
+        assert cache.lookup("info", "a") == (STALE, 1)
+        clock.now += 10
+        assert cache.lookup("info", "a") == (MISS, None)
+        assert cache.stats() == {"hits": 1, "stale_hits": 1, "misses": 2, "evictions": 0, "entries": 0}
+
+    def test_lru(self, clock):
+        cache = MetadataCache(max_entries=2)
+        cache.put("info", "a", 1)
+        cache.put("info", "b", 2)
+        cache.lookup("info", "a")
+        cache.put("info", "c", 3)
+        assert cache.lookup("info", "b") == (MISS, None)
+        assert cache.lookup("info", "a") == (FRESH, 1)
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidate(self, clock):
+        cache = MetadataCache()
+        for kind in ("info", "ls"):
+            for path in ("/root", "/root/dir", "/root/dir/file", "/root/dirty", "/root/other"):
+                cache.put(kind, path, path)
+        cache.invalidate("/root/dir")
+        remaining = {key for key in cache._entries}
+        assert remaining == {(kind, path) for kind in ("info", "ls") for path in ("/root/dirty", "/root/other")}
+
+    def test_put_after_invalidate(self, clock):
+        cache = MetadataCache()
+        generation = cache.generation
+        cache.invalidate("/root/file")
+        cache.put("info", "/root/file", 1, generation)
+        assert cache.lookup("info", "/root/file") == (MISS, None)
+
+    def test_stale_while_revalidate(self, clock):
+        cache = MetadataCache(ttl=5, stale_ttl=10)
+        loaded = threading.Event()
+        values = iter([1, 2])
+
+        def loader():
+            try:
+                return next(values)
+            finally:
+                loaded.set()
+
+        assert cache.fetch("ls", "a", loader) == 1
+        loaded.clear()
+        clock.now += 6
+        assert cache.fetch("ls", "a", loader) == 1
+        assert loaded.wait(5)
+        cache._refresh_pool.shutdown(wait=True)
+        assert cache.fetch("ls", "a", loader) == 2
+
+    @pytest.mark.asyncio
+    async def test_async_stale_while_revalidate(self, clock):
+        cache = MetadataCache(ttl=5, stale_ttl=10)
+        values = iter([1, 2])
+
+        async def loader():
+            return next(values)
+
+        assert await cache.afetch("ls", "a", loader) == 1
+        clock.now += 6
+        assert await cache.afetch("ls", "a", loader) == 1
+        for task in list(cache._refresh_tasks):
+            await task
+        assert await cache.afetch("ls", "a", loader) == 2
+
+    def test_disabled(self):
+        cache = MetadataCache(ttl=0)
+        values = iter([1, 2])
+        assert cache.fetch("ls", "a", lambda: next(values)) == 1
+        assert cache.fetch("ls", "a", lambda: next(values)) == 2
+
+    def test_memoize(self, clock):
+        cache = MetadataCache(ttl=5, stale_ttl=10)
+        values = iter([1, 2])
+        assert cache.memoize("hidden", "a", lambda: next(values)) == 1
+        assert cache.memoize("hidden", "a", lambda: next(values)) == 1
+        clock.now += 6
+        # stale values are reloaded right away
+        assert cache.memoize("hidden", "a", lambda: next(values)) == 2
+
+
+def test_aggregate_cache_invalidates_ancestors():
+    cache = AggregateCache()
+    for path in ("/root", "/root/dir", "/root/dir/sub", "/root/dir/sub/deep", "/root/other"):
+        cache.put("usage", path, path)
+    cache.invalidate("/root/dir/sub/file.txt")
+    assert {path for _, path in cache._entries} == {"/root/dir/sub/deep", "/root/other"}
+
+
+def test_request_scope():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert request_memo("key", loader) == 1
+    assert request_memo("key", loader) == 2
+    with request_scope():
+        assert request_memo("key", loader) == 3
+        with request_scope():
+            assert request_memo("key", loader) == 3
+        assert request_memo("key", loader) == 3
+    assert request_memo("key", loader) == 4
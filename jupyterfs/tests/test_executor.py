@@ -0,0 +1,100 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import asyncio
+import threading
+
+import pytest
+import tornado.web
+
+from jupyterfs.executor import DriveExecutor
+from jupyterfs.metamanager import MetaManager
+
+
+class TestDriveExecutor:
+    @pytest.mark.asyncio
+    async def test_run(self):
+        executor = DriveExecutor("drive", max_workers=1)
+        try:
+            assert await executor.run(lambda x, y=0: x + y, 1, y=2) == 3
+            assert executor.pending == 0
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_queue_depth(self):
+        executor = DriveExecutor("drive", max_workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            running = executor.submit(release.wait)
+            queued = executor.submit(release.wait)
+            with pytest.raises(tornado.web.HTTPError) as e:
+                executor.submit(release.wait)
+            assert e.value.status_code == 503
+        finally:
+            release.set()
+        await asyncio.wrap_future(running)
+        await asyncio.wrap_future(queued)
+        assert executor.pending == 0
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_coroutine_limits(self):
+        executor = DriveExecutor("drive", max_workers=1, max_queue=1)
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            # calls nested on the drive run within the slot of the outer one
+            return await executor.run_coroutine(asyncio.sleep, 0, "nested")
+
+        running = asyncio.ensure_future(executor.run_coroutine(call))
+        queued = asyncio.ensure_future(executor.run_coroutine(call))
+        await asyncio.sleep(0)
+        assert executor.pending == 2
+        with pytest.raises(tornado.web.HTTPError) as e:
+            await executor.run_coroutine(call)
+        assert e.value.status_code == 503
+
+        release.set()
+        assert await asyncio.wait_for(asyncio.gather(running, queued), 5) == ["nested", "nested"]
+        assert executor.pending == 0
+        # no thread was started for them
+        assert executor._pool is None
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_async_drive_has_no_threads(self, tmp_path):
+        cm = MetaManager()
+        (resource,) = cm.initResource({"url": f"asyncwrapper::file://{tmp_path.as_posix()}", "type": "fsspec", "auth": "none"})
+        await cm.check_connections()
+
+        assert (await cm.get(f"{resource['drive']}:"))["type"] == "directory"
+        assert cm._drive_executor(resource["drive"])._pool is None
+
+    @pytest.mark.asyncio
+    async def test_slow_drive_does_not_block_others(self, tmp_path):
+        (tmp_path / "slow").mkdir()
+        (tmp_path / "fast").mkdir()
+        cm = MetaManager()
+        slow, fast = cm.initResource(
+            {"name": "slow", "url": f"osfs://{tmp_path.as_posix()}/slow", "type": "pyfs", "auth": "none", "maxWorkers": 1},
+            {"name": "fast", "url": f"osfs://{tmp_path.as_posix()}/fast", "type": "pyfs", "auth": "none"},
+        )
+
+        release = threading.Event()
+        slow_mgr = cm._managers[slow["drive"]]
+        slow_get = slow_mgr.get
+        slow_mgr.get = lambda *args, **kwargs: release.wait() and slow_get(*args, **kwargs)
+
+        hung = asyncio.ensure_future(cm.get(f"{slow['drive']}:"))
+        try:
+            model = await asyncio.wait_for(cm.get(f"{fast['drive']}:"), timeout=5)
+            assert model["type"] == "directory"
+            assert not hung.done()
+        finally:
+            release.set()
+        assert (await hung)["type"] == "directory"
@@ -0,0 +1,153 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import json
+
+import pytest
+import tornado.httpclient
+import tornado.web
+from traitlets.config import Config
+
+from jupyterfs.files import _parse_range
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+    "JupyterFs": {"stream_chunk_size": 1000},
+}
+
+sync_base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.SyncMetaManager",
+    },
+    "JupyterFs": {"stream_chunk_size": 1000},
+}
+
+content = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def jp_server_config(base_config):
+    return Config(base_config)
+
+
+async def _drives(tmp_path, jp_fetch, jp_server_config):
+    (tmp_path / "data.bin").write_bytes(content)
+    (tmp_path / ".secret.bin").write_bytes(content)
+    resources = [
+        {"name": "pyfs", "url": f"osfs://{tmp_path.as_posix()}", "type": "pyfs"},
+        {"name": "fsspec", "url": f"file://{tmp_path.as_posix()}", "type": "fsspec"},
+    ]
+    if jp_server_config.ServerApp.contents_manager_class.endswith(".MetaManager"):
+        resources.append({"name": "async", "url": f"asyncwrapper::file://{tmp_path.as_posix()}", "type": "fsspec"})
+    resources = await ContentsClient(jp_fetch).set_resources(resources)
+    assert all(r["init"] for r in resources)
+    return [r["drive"] for r in resources]
+
+
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+async def test_download(tmp_path, jp_fetch, jp_server_config):
+    drives = await _drives(tmp_path, jp_fetch, jp_server_config)
+    for drive in drives:
+        rep = await jp_fetch(f"/jupyterfs/files/{drive}:data.bin", params={"download": "1"})
+        assert rep.body == content
+        assert rep.headers["Content-Length"] == str(len(content))
+        assert rep.headers["Content-Type"] == "application/octet-stream"
+        assert rep.headers["Content-Disposition"] == "attachment; filename*=utf-8''data.bin"
+
+
+@pytest.mark.parametrize("base_config", [base_config])
+async def test_download_range(tmp_path, jp_fetch, jp_server_config):
+    drives = await _drives(tmp_path, jp_fetch, jp_server_config)
+    for drive in drives:
+        rep = await jp_fetch(f"/jupyterfs/files/{drive}:data.bin", headers={"Range": "bytes=100-2599"})
+        assert rep.code == 206
+        assert rep.body == content[100:2600]
+        assert rep.headers["Content-Range"] == f"bytes 100-2599/{len(content)}"
+
+        rep = await jp_fetch(f"/jupyterfs/files/{drive}:data.bin", headers={"Range": "bytes=-10"})
+        assert rep.body == content[-10:]
+
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await jp_fetch(f"/jupyterfs/files/{drive}:data.bin", headers={"Range": f"bytes={len(content)}-"})
+        assert e.value.code == 416
+
+
+@pytest.mark.parametrize("base_config", [base_config])
+async def test_download_changed(tmp_path, jp_fetch, jp_server_config):
+    """The size served is that of the file's current content, not its cached info"""
+    drives = await _drives(tmp_path, jp_fetch, jp_server_config)
+    for drive in drives:
+        (tmp_path / "data.bin").write_bytes(content)
+        await ContentsClient(jp_fetch).get(f"{drive}:data.bin")
+        (tmp_path / "data.bin").write_bytes(content * 2)
+
+        rep = await jp_fetch(f"/jupyterfs/files/{drive}:data.bin")
+        assert rep.headers["Content-Length"] == str(2 * len(content))
+        assert rep.body == content * 2
+
+        rep = await jp_fetch(f"/jupyterfs/files/{drive}:data.bin", headers={"Range": f"bytes={len(content)}-"})
+        assert rep.headers["Content-Range"] == f"bytes {len(content)}-{2 * len(content) - 1}/{2 * len(content)}"
+
+
+@pytest.mark.parametrize("base_config", [base_config])
+async def test_download_hidden(tmp_path, jp_fetch, jp_server_config):
+    drives = await _drives(tmp_path, jp_fetch, jp_server_config)
+    for drive in drives:
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await jp_fetch(f"/jupyterfs/files/{drive}:.secret.bin")
+        assert e.value.code in (400, 404)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-9", (0, 10)),
+        ("bytes=5-", (5, 100)),
+        ("bytes=-5", (95, 100)),
+        ("bytes=90-200", (90, 100)),
+        ("bytes=0-1,5-6", None),
+        ("bytes=5-2", None),
+        ("bytes=150-200", 416),
+        ("bytes=-0", 416),
+        ("lines=0-1", None),
+    ],
+)
+def test_parse_range(header, expected):
+    if expected == 416:
+        with pytest.raises(tornado.web.HTTPError) as e:
+            _parse_range(header, 100)
+        assert e.value.status_code == 416
+    else:
+        assert _parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+async def test_upload(tmp_path, jp_fetch, jp_server_config):
+    drives = await _drives(tmp_path, jp_fetch, jp_server_config)
+    for i, drive in enumerate(drives):
+        rep = await jp_fetch(f"/jupyterfs/files/{drive}:upload{i}.bin", method="PUT", body=content)
+        assert rep.code == 201
+        model = json.loads(rep.body)
+        assert (model["name"], model["size"], model["content"]) == (f"upload{i}.bin", len(content), None)
+        assert (tmp_path / f"upload{i}.bin").read_bytes() == content
+        assert (await ContentsClient(jp_fetch).get(f"{drive}:upload{i}.bin"))["size"] == len(content)
+
+
+@pytest.mark.parametrize("base_config", [base_config])
+async def test_upload_errors(tmp_path, jp_fetch, jp_server_config):
+    drives = await _drives(tmp_path, jp_fetch, jp_server_config)
+    for drive in drives:
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await jp_fetch(f"/jupyterfs/files/{drive}:.hidden.bin", method="PUT", body=content)
+        assert e.value.code == 400
+    assert not (tmp_path / ".hidden.bin").exists()
@@ -5,17 +5,24 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 
+import asyncio
 import os
 import shutil
 import socket
+from base64 import decodebytes
 from contextlib import nullcontext
 from itertools import product
 from pathlib import Path
 from shutil import which
+from unittest.mock import patch
 
 import pytest
 import tornado.web
 
+from jupyterfs.executor import DriveExecutor
+from jupyterfs.manager import AsyncFSSpecManager, FSManager, FSSpecManager
+from jupyterfs.metamanager import MetaManager
+
 from .utils import s3, samba
 from .utils.client import ContentsClient
 
@@ -115,6 +122,305 @@ class _TestBase:
                 assert c.value.code == 400
 
 
+@pytest.mark.parametrize("jp_server_config", configs[:1])
+async def test_fsspec_async(jp_fetch, jp_serverapp, jp_server_config, tmp_path):
+    cc = ContentsClient(jp_fetch)
+    resources = await cc.set_resources([{"url": f"asyncwrapper::file://{tmp_path}", "type": "fsspec"}])
+    drive = resources[0]["drive"]
+    assert resources[0]["init"]
+    assert isinstance(jp_serverapp.contents_manager._managers[drive], AsyncFSSpecManager)
+
+    await cc.mkdir(f"{drive}:root0")
+    await cc.save(f"{drive}:root0/{test_fname}", _test_file_model)
+    assert test_content == (await cc.get(f"{drive}:root0/{test_fname}"))["content"]
+    assert [m["name"] for m in (await cc.get(f"{drive}:root0"))["content"]] == [test_fname]
+
+    await cc.rename(f"{drive}:root0/{test_fname}", f"{drive}:root0/renamed.txt")
+    await cc.delete(f"{drive}:root0/renamed.txt")
+    assert (await cc.get(f"{drive}:root0"))["content"] == []
+
+
+@pytest.mark.parametrize("jp_server_config", configs[:1])
+async def test_fsspec_async_missing_root(jp_fetch, jp_serverapp, jp_server_config, tmp_path):
+    cc = ContentsClient(jp_fetch)
+    resources = await cc.set_resources([{"url": f"asyncwrapper::file://{tmp_path}/missing/root", "type": "fsspec"}])
+    assert not resources[0]["init"]
+    assert resources[0]["drive"] not in jp_serverapp.contents_manager._managers
+
+
+def test_fsspec_async_supports():
+    assert AsyncFSSpecManager.supports("asyncwrapper::file:///tmp")
+    assert not AsyncFSSpecManager.supports("file:///tmp")
+    assert not AsyncFSSpecManager.supports("osfs:///tmp")
+    assert not issubclass(FSSpecManager, AsyncFSSpecManager)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url, type", [("osfs://{}", "pyfs"), ("file://{}", "fsspec"), ("asyncwrapper::file://{}", "fsspec")])
+async def test_get_byte_range(tmp_path, url, type):
+    (tmp_path / "big.csv").write_bytes(b"0123456789" * 10)
+    (tmp_path / "nb.ipynb").write_text("{}")
+    cm = MetaManager()
+    (resource,) = cm.initResource({"url": url.format(tmp_path.as_posix()), "type": type, "auth": "none"})
+    await cm.check_connections()
+    drive = resource["drive"]
+
+    model = await cm.get(f"{drive}:big.csv", offset=15, length=10)
+    assert (model["content"], model["format"]) == ("5678901234", "text")
+    assert (model["offset"], model["length"], model["size"]) == (15, 10, 100)
+
+    model = await cm.get(f"{drive}:big.csv", offset=95, format="base64")
+    assert decodebytes(model["content"].encode("ascii")) == b"56789"
+    assert (model["offset"], model["length"]) == (95, 5)
+
+    assert (await cm.get(f"{drive}:nb.ipynb", length=1))["content"] == "{"
+    for path, kwargs in [("", {"offset": 0}), ("big.csv", {"offset": -1}), ("nb.ipynb", {"length": 1, "type": "notebook"})]:
+        with pytest.raises(tornado.web.HTTPError) as e:
+            await cm.get(f"{drive}:{path}", **kwargs)
+        assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url, type", [("osfs://{}", "pyfs"), ("file://{}", "fsspec"), ("asyncwrapper::file://{}", "fsspec")])
+async def test_get_page(tmp_path, url, type):
+    names = [f"{i:02d}.txt" for i in range(25)]
+    for name in names:
+        (tmp_path / name).write_text(name)
+    for i in range(0, 25, 3):
+        (tmp_path / f".{i:02d}.hidden").write_text("")
+    (tmp_path / "sub").mkdir()
+    cm = MetaManager()
+    (resource,) = cm.initResource({"url": url.format(tmp_path.as_posix()), "type": type, "auth": "none"})
+    await cm.check_connections()
+    drive = resource["drive"]
+
+    pages, cursor = [], None
+    while True:
+        model = await cm.get(f"{drive}:", limit=10, cursor=cursor)
+        pages.append([entry["name"] for entry in model["content"]])
+        cursor = model["cursor"]
+        if cursor is None:
+            break
+    # hidden entries are skipped without making the pages shorter
+    assert pages == [names[:10], names[10:20], names[20:] + ["sub"]]
+
+    # a page starts after the last entry of the previous one, even if entries were added or removed since
+    model = await cm.get(f"{drive}:", limit=10)
+    (tmp_path / "00.txt").unlink()
+    (tmp_path / "05b.txt").write_text("")
+    await cm.save({"type": "file", "format": "text", "content": ""}, f"{drive}:05c.txt")
+    model = await cm.get(f"{drive}:", limit=3, cursor=model["cursor"])
+    assert [entry["name"] for entry in model["content"]] == ["10.txt", "11.txt", "12.txt"]
+
+    assert "cursor" not in await cm.get(f"{drive}:")
+    for path, kwargs in [("01.txt", {"limit": 1}), ("", {"limit": 0}), ("", {"cursor": "nonsense"}), ("", {"limit": 1, "offset": 0})]:
+        with pytest.raises(tornado.web.HTTPError) as e:
+            await cm.get(f"{drive}:{path}", **kwargs)
+        assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url, type", [("osfs://{}", "pyfs"), ("file://{}", "fsspec"), ("asyncwrapper::file://{}", "fsspec")])
+async def test_copy(tmp_path, url, type):
+    (tmp_path / "dir" / "sub").mkdir(parents=True)
+    (tmp_path / "dir" / "sub" / "a.txt").write_text("a")
+    (tmp_path / "data.csv").write_text("1,2")
+    cm = MetaManager()
+    (resource,) = cm.initResource({"url": url.format(tmp_path.as_posix()), "type": type, "auth": "none"})
+    await cm.check_connections()
+    drive = resource["drive"]
+
+    # the copy is made by the backend, not by reading and saving the contents
+    with patch.object(cm._managers[drive].__class__, "save", side_effect=AssertionError("copy went through save")):
+        model = await cm.copy(f"{drive}:data.csv")
+        assert model["name"] == "data-Copy1.csv"
+        assert (await cm.copy(f"{drive}:data.csv", f"{drive}:dir"))["path"].endswith("dir/data.csv")
+        await cm.copy(f"{drive}:dir", f"{drive}:dir2")
+
+    assert (tmp_path / "data-Copy1.csv").read_text() == "1,2"
+    assert (tmp_path / "dir" / "data.csv").read_text() == "1,2"
+    assert (tmp_path / "dir2" / "sub" / "a.txt").read_text() == "a"
+
+    for to_path, status in [("data.csv", 409), ("missing/data.csv", 404)]:
+        with pytest.raises(tornado.web.HTTPError) as e:
+            await cm.copy(f"{drive}:dir/sub/a.txt", f"{drive}:{to_path}")
+        assert e.value.status_code == status
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url, type", [("osfs://{}", "pyfs"), ("file://{}", "fsspec"), ("asyncwrapper::file://{}", "fsspec")])
+async def test_usage(tmp_path, url, type):
+    (tmp_path / "dir" / "sub").mkdir(parents=True)
+    (tmp_path / "dir" / ".hidden").mkdir()
+    (tmp_path / "dir" / "a.bin").write_bytes(b"a" * 100)
+    (tmp_path / "dir" / "sub" / "b.bin").write_bytes(b"b" * 10)
+    (tmp_path / "dir" / ".hidden" / "c.bin").write_bytes(b"c" * 1000)
+    cm = MetaManager()
+    (resource,) = cm.initResource({"url": url.format(tmp_path.as_posix()), "type": type, "auth": "none"})
+    await cm.check_connections()
+    mgr = cm._managers[resource["drive"]]
+
+    async def usage(path):
+        result = mgr.usage(path)
+        return await result if isinstance(mgr, AsyncFSSpecManager) else result
+
+    assert await usage("dir") == {"size": 110, "files": 2, "directories": 1}
+    # the aggregates of the whole subtree are cached, and dropped when anything below is written to
+    misses = mgr._usage_cache.misses
+    assert await usage("dir/sub") == {"size": 10, "files": 1, "directories": 0}
+    assert await usage("dir") == {"size": 110, "files": 2, "directories": 1}
+    assert mgr._usage_cache.misses == misses
+
+    await cm.save({"type": "file", "format": "text", "content": "12345"}, f"{resource['drive']}:dir/sub/c.txt")
+    assert await usage("dir") == {"size": 115, "files": 3, "directories": 1}
+    # as are the chunks of an upload, that counts once its last chunk is saved
+    await cm.save({"type": "file", "format": "text", "content": "123", "chunk": 1}, f"{resource['drive']}:dir/sub/d.txt")
+    assert await usage("dir") == {"size": 115, "files": 3, "directories": 1}
+    await cm.save({"type": "file", "format": "text", "content": "45", "chunk": -1}, f"{resource['drive']}:dir/sub/d.txt")
+    assert await usage("dir") == {"size": 120, "files": 4, "directories": 1}
+
+    with pytest.raises(tornado.web.HTTPError) as e:
+        await usage("dir/.hidden")
+    assert e.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_usage_fan_out(tmp_path):
+    """The subdirectories are walked on the executor of the drive, even from its only worker"""
+    for i in range(4):
+        (tmp_path / f"dir{i}" / "sub").mkdir(parents=True)
+        (tmp_path / f"dir{i}" / "sub" / "a.bin").write_bytes(b"a" * 10)
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "b.bin").write_bytes(b"b" * 1000)
+    (tmp_path / "c.bin").write_bytes(b"c" * 5)
+    executor = DriveExecutor("drive", max_workers=1)
+    mgr = FSManager(f"osfs://{tmp_path.as_posix()}")
+    mgr._get_executor = lambda: executor
+    try:
+        with patch.object(executor, "submit", wraps=executor.submit) as submit:
+            usage = await asyncio.wait_for(executor.run(mgr.usage, ""), 10)
+    finally:
+        executor.shutdown()
+
+    assert usage == {"size": 45, "files": 5, "directories": 8}
+    assert submit.call_count == 5
+    assert mgr.usage("dir0") == {"size": 10, "files": 1, "directories": 1}
+
+
+def test_chunked_upload_single_stream(tmp_path):
+    manager = FSManager(f"osfs://{tmp_path.as_posix()}")
+    pyfs = manager._pyfilesystem_instance
+
+    def chunk(content, n):
+        return {"type": "file", "format": "text", "content": content, "chunk": n}
+
+    with patch.object(pyfs, "openbin", wraps=pyfs.openbin) as openbin, patch.object(pyfs, "appendbytes") as appendbytes:
+        manager.save(chunk("abc", 1), "big.txt")
+        manager.save(chunk("def", 2), "big.txt")
+        model = manager.save(chunk("ghi", -1), "big.txt")
+
+    assert openbin.call_count == 1
+    assert appendbytes.call_count == 0
+    assert (tmp_path / "big.txt").read_text() == "abcdefghi"
+    assert model["size"] == 9
+    assert len(manager._uploads) == 0
+
+    with pytest.raises(tornado.web.HTTPError) as e:
+        manager.save(chunk("def", 2), "big.txt")
+    assert e.value.status_code == 400
+
+    # an aborted upload leaves the file as it was
+    manager.save(chunk("new", 1), "big.txt")
+    manager._uploads.abort_all()
+    assert (tmp_path / "big.txt").read_text() == "abcdefghi"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["big.txt"]
+
+
+class TestFSManagerListing:
+    @pytest.fixture
+    def listing_dir(self, tmp_path):
+        for i in range(200):
+            (tmp_path / f"file{i}.txt").write_text(test_content)
+        (tmp_path / "nb.ipynb").write_text("{}")
+        (tmp_path / "subdir").mkdir()
+        (tmp_path / "locked").mkdir()
+        (tmp_path / ".hidden").write_text(test_content)
+        os.chmod(tmp_path / "file0.txt", 0o444)
+        os.chmod(tmp_path / "locked", 0o000)
+        yield tmp_path
+        os.chmod(tmp_path / "locked", 0o700)
+
+    @pytest.mark.parametrize("allow_hidden", [True, False])
+    def test_listing_matches_per_entry_models(self, listing_dir, allow_hidden):
+        manager = FSManager(f"osfs://{listing_dir}")
+        manager.allow_hidden = allow_hidden
+        entries = list(manager._pyfilesystem_instance.scandir("", namespaces=("basic", "access", "details", "stat")))
+
+        expected = [
+            manager.get(path=f"/{e.name}", content=False, info=e) for e in entries if allow_hidden or not manager._is_path_hidden(e.make_path(""), e)
+        ]
+        listed = manager.get("")["content"]
+
+        assert sorted(listed, key=lambda m: m["name"]) == sorted(expected, key=lambda m: m["name"])
+        assert {m["name"]: m["writable"] for m in listed}["file0.txt"] is (os.getuid() == 0)
+        assert ("locked" in {m["name"] for m in listed}) is (allow_hidden or os.getuid() == 0)
+
+    def test_listing_syscalls(self, listing_dir):
+        """Benchmark against the per-entry path: the number of access checks and system path lookups no longer grows with the listing"""
+        manager = FSManager(f"osfs://{listing_dir}")
+        pyfs = manager._pyfilesystem_instance
+        entries = list(pyfs.scandir("", namespaces=("basic", "access", "details", "stat")))
+
+        def count_calls(func):
+            with patch("os.access", wraps=os.access) as access, patch.object(pyfs, "getsyspath", wraps=pyfs.getsyspath) as getsyspath:
+                func()
+            return access.call_count + getsyspath.call_count
+
+        per_entry = count_calls(lambda: [manager.get(path=f"/{e.name}", content=False, info=e) for e in entries])
+        batched = count_calls(lambda: manager.get(""))
+        for i in range(100):
+            (listing_dir / f"more{i}.txt").write_text(test_content)
+        batched_more = count_calls(lambda: manager.get(""))
+
+        assert per_entry >= 2 * len(entries)
+        assert batched == batched_more < 10
+
+    def test_listing_access_without_mode_bits(self, listing_dir):
+        """With stat_access_checks off, entries are checked with os.access (which accounts for ACLs, etc.), not their mode bits"""
+        manager = FSManager(f"osfs://{listing_dir}")
+        manager.stat_access_checks = False
+
+        with patch("os.access", return_value=False) as access:
+            listed = manager.get("")["content"]
+
+        assert listed
+        assert access.call_count >= len(listed)
+        assert not any(m["writable"] for m in listed)
+
+    def test_is_hidden_ancestors(self, tmp_path):
+        """Each ancestor is checked (not the full path over and over), and only once"""
+        (tmp_path / "a" / "b" / "c").mkdir(parents=True)
+        (tmp_path / "a" / "b" / "c" / "leaf.txt").write_text(test_content)
+        manager = FSManager(f"osfs://{tmp_path}")
+
+        with patch.object(manager, "_is_path_hidden", wraps=manager._is_path_hidden) as checked:
+            assert not manager.is_hidden("a/b/c/leaf.txt")
+            assert not manager.is_hidden("/a/b/c/")
+            manager.get("a/b/c")
+
+        assert sorted(c.args[0] for c in checked.call_args_list) == ["a", "a/b", "a/b/c", "a/b/c/leaf.txt"]
+
+    def test_hidden_cache_invalidated(self, tmp_path):
+        manager = FSManager(f"osfs://{tmp_path}")
+        manager.save({"type": "directory"}, "sub")
+        assert not manager.is_hidden("sub")
+
+        manager.rename_file("sub", "renamed")
+        with patch.object(manager, "_is_path_hidden", return_value=True):
+            assert manager.is_hidden("renamed/file.txt")
+            assert manager.is_hidden("sub")
+
+
 class Test_FSManager_osfs(_TestBase):
     """No extra setup required for this test suite"""
 
@@ -0,0 +1,348 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import asyncio
+import threading
+from base64 import encodebytes
+from unittest.mock import Mock, call, patch
+from uuid import uuid4
+
+import pytest
+from tornado import web
+
+from jupyterfs.manager import AsyncFSSpecManager, FSSpecManager
+from jupyterfs.manager.fsspec import _S3MultipartUpload
+from jupyterfs.manager.index import MetadataIndex
+
+
+@pytest.fixture
+def memory_root():
+    import fsspec
+
+    fs = fsspec.filesystem("memory")
+    root = f"/jupyterfs-{uuid4().hex}"
+    fs.mkdir(root)
+    yield root
+    fs.rm(root, recursive=True)
+
+
+def _populate(manager, count):
+    for i in range(count):
+        manager._fs.pipe(f"{manager.root}/file{i}.txt", b"content")
+    manager._fs.pipe(f"{manager.root}/.hidden", b"content")
+
+
+class TestFSSpecManagerListing:
+    @pytest.mark.parametrize("count", [10, 1000])
+    def test_listing_backend_calls(self, memory_root, count):
+        """A listing costs the same number of backend calls, however many entries it has"""
+        manager = FSSpecManager(f"memory://{memory_root}")
+        _populate(manager, count)
+
+        with patch.object(manager._fs, "ls", wraps=manager._fs.ls) as ls, patch.object(manager._fs, "info", wraps=manager._fs.info) as info:
+            model = manager.get("")
+
+        assert len(model["content"]) == count
+        assert ls.call_count == 1
+        assert info.call_count <= 2
+
+    def test_listing_models(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        _populate(manager, 2)
+
+        listed = {m["name"]: m for m in manager.get("")["content"]}
+        single = manager.get("file0.txt", content=False)
+
+        assert set(listed) == {"file0.txt", "file1.txt"}
+        for key in ("name", "path", "type", "size", "mimetype", "writable", "last_modified"):
+            assert listed["file0.txt"][key] == single[key]
+
+    def test_listing_enrichment(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        manager.enrich_listing = True
+        _populate(manager, 3)
+        info = manager._fs.info
+
+        # memory listings carry no modification time, pretend the full info does
+        with patch.object(manager._fs, "info", side_effect=lambda path: {**info(path), "mtime": 86400.0}) as mocked:
+            listing = manager.get("")["content"]
+
+        enriched = [c.args[0] for c in mocked.call_args_list if c.args[0] != memory_root]
+        assert sorted(enriched) == [f"{memory_root}/file{i}.txt" for i in range(3)]
+        assert len({m["last_modified"] for m in listing}) == 1
+
+
+class TestFSSpecManagerCache:
+    def test_listing_is_cached(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        _populate(manager, 3)
+
+        with patch.object(manager._fs, "ls", wraps=manager._fs.ls) as ls:
+            manager.get("")
+            manager.get("")
+            manager.get("file0.txt", content=False)
+        assert ls.call_count == 1
+        assert manager.cache_stats()["hits"] > 0
+
+    def test_writes_invalidate(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        _populate(manager, 1)
+
+        def names():
+            return sorted(m["name"] for m in manager.get("")["content"])
+
+        assert names() == ["file0.txt"]
+        manager.save({"type": "file", "format": "text", "content": "foo"}, "new.txt")
+        assert names() == ["file0.txt", "new.txt"]
+        manager.rename_file("new.txt", "renamed.txt")
+        assert names() == ["file0.txt", "renamed.txt"]
+        manager.delete_file("renamed.txt")
+        assert names() == ["file0.txt"]
+
+    def test_hidden_ancestors_memoized(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        manager._fs.pipe(f"{memory_root}/a/b/leaf.txt", b"content")
+
+        with patch.object(manager, "_is_path_hidden", wraps=manager._is_path_hidden) as checked:
+            assert not manager.is_hidden("a/b/leaf.txt")
+            assert not manager.is_hidden("a/b")
+            assert manager.is_hidden("a/.b/leaf.txt")
+
+        checked_paths = [c.args[0] for c in checked.call_args_list]
+        assert len(checked_paths) == len(set(checked_paths))
+        assert f"{memory_root}/a" in checked_paths
+
+
+def _chunk(content, chunk):
+    return {"type": "file", "format": "base64", "content": encodebytes(content).decode("ascii"), "chunk": chunk}
+
+
+class TestFSSpecManagerChunkedUpload:
+    def test_chunked_upload(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+
+        with patch.object(manager._fs, "pipe", wraps=manager._fs.pipe) as pipe:
+            manager.save(_chunk(b"abc", 1), "big.bin")
+            manager.save(_chunk(b"def", 2), "big.bin")
+            assert len(manager._uploads) == 1
+            model = manager.save(_chunk(b"ghi", -1), "big.bin")
+
+        assert pipe.call_count == 0
+        assert len(manager._uploads) == 0
+        assert manager._fs.cat(f"{memory_root}/big.bin") == b"abcdefghi"
+        assert model["size"] == 9
+
+    def test_out_of_order_chunk(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        manager.save(_chunk(b"abc", 1), "big.bin")
+
+        with pytest.raises(web.HTTPError) as e:
+            manager.save(_chunk(b"ghi", 3), "big.bin")
+        assert e.value.status_code == 400
+        assert len(manager._uploads) == 0
+        with pytest.raises(web.HTTPError):
+            manager.save(_chunk(b"ghi", -1), "big.bin")
+
+    def test_aborted_upload_keeps_file(self, tmp_path):
+        manager = FSSpecManager(f"file://{tmp_path.as_posix()}")
+        (tmp_path / "x.bin").write_bytes(b"original")
+
+        manager.save(_chunk(b"aaa", 1), "x.bin")
+        manager.save(_chunk(b"bbb", 1), "x.bin")
+        assert (tmp_path / "x.bin").read_bytes() == b"original"
+        with pytest.raises(web.HTTPError):
+            manager.save(_chunk(b"ccc", 3), "x.bin")
+        manager.save(_chunk(b"ddd", 1), "x.bin")
+        manager._uploads.abort_all()
+
+        assert (tmp_path / "x.bin").read_bytes() == b"original"
+        assert [p.name for p in tmp_path.iterdir()] == ["x.bin"]
+
+        manager.save(_chunk(b"abc", 1), "x.bin")
+        manager.save(_chunk(b"def", -1), "x.bin")
+        assert (tmp_path / "x.bin").read_bytes() == b"abcdef"
+        assert [p.name for p in tmp_path.iterdir()] == ["x.bin"]
+
+    def test_discarded_writer_keeps_file(self, tmp_path):
+        manager = FSSpecManager(f"file://{tmp_path.as_posix()}")
+        (tmp_path / "x.bin").write_bytes(b"original")
+
+        writer = manager.open_writer("x.bin")
+        writer.write(b"partial")
+        writer.discard()
+        assert (tmp_path / "x.bin").read_bytes() == b"original"
+        assert [p.name for p in tmp_path.iterdir()] == ["x.bin"]
+
+        writer = manager.open_writer("x.bin")
+        writer.write(b"replaced")
+        writer.close()
+        assert manager.get("x.bin", content=False)["size"] == 8
+        assert [p.name for p in tmp_path.iterdir()] == ["x.bin"]
+
+    @pytest.mark.asyncio
+    async def test_async_chunked_upload(self, tmp_path):
+        manager = AsyncFSSpecManager(f"asyncwrapper::file://{tmp_path.as_posix()}")
+        await manager.check_connection()
+
+        await manager.save(_chunk(b"abc", 1), "big.bin")
+        await manager.save(_chunk(b"def", 2), "big.bin")
+        assert not (tmp_path / "big.bin").exists()
+        await manager.save(_chunk(b"ghi", -1), "big.bin")
+
+        assert (tmp_path / "big.bin").read_bytes() == b"abcdefghi"
+        assert len(manager._uploads) == 0
+
+
+class _S3Fake:
+    """Records the calls made with the multipart api of s3fs"""
+
+    def __init__(self):
+        self.calls = []
+        self.parts = {}
+        self.objects = {}
+
+    def split_path(self, path):
+        bucket, _, key = path.partition("/")
+        return bucket, key, None
+
+    async def _call_s3(self, method, **kwargs):
+        self.calls.append(method)
+        if method == "create_multipart_upload":
+            return {"UploadId": "upload"}
+        if method == "upload_part":
+            self.parts[kwargs["PartNumber"]] = kwargs["Body"]
+            return {"ETag": "etag%d" % kwargs["PartNumber"]}
+        if method == "complete_multipart_upload":
+            self.objects[kwargs["Key"]] = b"".join(self.parts[part["PartNumber"]] for part in kwargs["MultipartUpload"]["Parts"])
+
+    async def _pipe_file(self, path, data):
+        self.calls.append("pipe")
+        self.objects[self.split_path(path)[1]] = data
+
+    async def _abort_mpu(self, bucket, key, upload_id):
+        self.calls.append("abort")
+
+    def invalidate_cache(self, path):
+        pass
+
+
+class TestS3MultipartUpload:
+    @pytest.mark.asyncio
+    async def test_parts_sent_as_filled(self):
+        fs = _S3Fake()
+        with patch.object(_S3MultipartUpload, "part_size", 4):
+            upload = _S3MultipartUpload(fs, "bucket/big.bin", asyncio.get_running_loop())
+            upload.write(b"abc")
+            await upload.flush()
+            assert fs.calls == []
+            upload.write(b"def")
+            await upload.flush()
+            assert fs.calls == ["create_multipart_upload", "upload_part"]
+            assert fs.parts == {1: b"abcd"}
+            upload.write(b"gh")
+            await upload.commit()
+
+        assert fs.calls[2:] == ["upload_part", "complete_multipart_upload"]
+        assert fs.objects == {"big.bin": b"abcdefgh"}
+
+    @pytest.mark.asyncio
+    async def test_single_part(self):
+        fs = _S3Fake()
+        upload = _S3MultipartUpload(fs, "bucket/small.bin", asyncio.get_running_loop())
+        upload.write(b"abc")
+        await upload.flush()
+        await upload.commit()
+        assert fs.calls == ["pipe"]
+        assert fs.objects == {"small.bin": b"abc"}
+
+    @pytest.mark.asyncio
+    async def test_discard_aborts(self):
+        fs = _S3Fake()
+        with patch.object(_S3MultipartUpload, "part_size", 4):
+            upload = _S3MultipartUpload(fs, "bucket/big.bin", asyncio.get_running_loop())
+            upload.write(b"abcdef")
+            await upload.flush()
+            # from another thread, as when an idle upload expires
+            await asyncio.to_thread(upload.discard)
+            for _ in range(3):
+                await asyncio.sleep(0)
+            assert fs.calls == ["create_multipart_upload", "upload_part", "abort"]
+            upload.write(b"ghij")
+            with pytest.raises(web.HTTPError):
+                await upload.flush()
+        assert fs.objects == {}
+
+
+class TestFSSpecManagerDeleteMany:
+    def test_delete_many(self, memory_root):
+        manager = FSSpecManager(f"memory://{memory_root}")
+        _populate(manager, 100)
+        manager._fs.pipe(f"{memory_root}/dir/nested.txt", b"content")
+        manager.get("")
+
+        paths = [f"file{i}.txt" for i in range(100)] + ["dir", "missing.txt", ""]
+        with patch.object(manager._fs, "rm", wraps=manager._fs.rm) as rm:
+            failed = manager.delete_many(paths)
+
+        assert rm.call_count == 1
+        assert sorted(failed) == ["", "missing.txt"]
+        assert failed[""].status_code == 400
+        assert [f["name"] for f in manager.get("")["content"]] == []
+        assert manager._fs.exists(f"{memory_root}/.hidden")
+
+    def test_delete_many_checks_backend(self, memory_root):
+        """Paths are checked against the backend, not the cache, and removed from the index by their API path"""
+        manager = FSSpecManager(f"memory://{memory_root}")
+        _populate(manager, 2)
+        manager.get("")
+        manager._fs.rm(f"{memory_root}/file0.txt")
+        manager._index = Mock()
+
+        failed = manager.delete_many(["file0.txt", "/file1.txt"])
+
+        assert list(failed) == ["file0.txt"]
+        assert manager._index.remove.call_args_list == [call("file1.txt")]
+
+    @pytest.mark.asyncio
+    async def test_async_delete_many(self, tmp_path):
+        for i in range(10):
+            (tmp_path / f"{i}.txt").write_text("content")
+        manager = AsyncFSSpecManager(f"asyncwrapper::file://{tmp_path.as_posix()}")
+        await manager.check_connection()
+
+        failed = await manager.delete_many([f"{i}.txt" for i in range(10)] + ["missing.txt"])
+        assert list(failed) == ["missing.txt"]
+        assert list(tmp_path.iterdir()) == []
+
+
+class TestAsyncFSSpecManagerIndex:
+    @pytest.mark.asyncio
+    async def test_index_writes_off_event_loop(self, tmp_path):
+        """The index is written to from worker threads, not from the event loop"""
+        root = tmp_path / "drive"
+        root.mkdir()
+        manager = AsyncFSSpecManager(f"asyncwrapper::file://{root.as_posix()}")
+        await manager.check_connection()
+        manager._index = MetadataIndex(str(tmp_path / "index.sqlite"))
+        loop_thread = threading.current_thread()
+        threads = []
+
+        def record(method):
+            def call(*args):
+                threads.append(threading.current_thread())
+                return method(*args)
+
+            return call
+
+        for method in ("put_model", "mark_dirty", "remove", "rename"):
+            setattr(manager._index, method, record(getattr(manager._index, method)))
+
+        await manager.save({"type": "file", "format": "text", "content": "abc"}, "a.txt")
+        await manager.rename("a.txt", "b.txt")
+        await manager.delete("b.txt")
+
+        assert len(threads) >= 4
+        assert loop_thread not in threads
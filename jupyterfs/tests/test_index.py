@@ -0,0 +1,142 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import asyncio
+import json
+import time
+
+import pytest
+import tornado.httpclient
+from traitlets.config import Config
+
+from jupyterfs.manager.index import MetadataIndex
+
+from .utils.client import ContentsClient
+
+
+def _file(name, size=1):
+    return {"name": name, "type": "file", "size": size, "mtime": 1.0, "etag": None}
+
+
+def _dir(name):
+    return {"name": name, "type": "directory", "size": None, "mtime": 1.0, "etag": None}
+
+
+class TestMetadataIndex:
+    def test_listing(self, tmp_path):
+        index = MetadataIndex(str(tmp_path / "index" / "drive.sqlite"))
+        assert index.listing("") is None
+        assert index.dirs_to_crawl(3600, 10) == [""]
+
+        index.replace_listing("", [_file("a.txt", 3), _dir("dir")])
+        assert [e["path"] for e in index.listing("")] == ["a.txt", "dir"]
+        assert index.listing("dir") is None
+        assert index.dirs_to_crawl(3600, 10) == ["dir"]
+        assert index.freshness("")[1] is True
+        assert index.freshness("", recursive=True)[1] is False
+
+        index.replace_listing("dir", [_file("b.csv", 5), _dir("sub")])
+        index.replace_listing("dir/sub", [_file("c.csv", 7)])
+        assert index.dirs_to_crawl(3600, 10) == []
+        assert index.freshness("", recursive=True)[1] is True
+        assert index.usage("") == {"size": 15, "files": 3, "directories": 2}
+        assert [e["path"] for e in index.search("", "*.csv", 10)] == ["dir/b.csv", "dir/sub/c.csv"]
+        assert [e["path"] for e in index.search("dir", "sub/*", 10)] == ["dir/sub/c.csv"]
+        assert [e["path"] for e in index.search("", "B.C", 10)] == ["dir/b.csv"]
+
+        # entries that went away are dropped, with everything below them
+        index.replace_listing("", [_file("a.txt", 3)])
+        assert index.usage("") == {"size": 3, "files": 1, "directories": 0}
+        assert index.dirs_to_crawl(3600, 10) == []
+        index.close()
+
+    def test_writes(self, tmp_path):
+        index = MetadataIndex(str(tmp_path / "drive.sqlite"))
+        index.replace_listing("", [_dir("dir")])
+        index.replace_listing("dir", [_file("a.txt")])
+
+        index.put_model("dir/b.txt", {"type": "file", "size": 2, "last_modified": "2024-01-01T00:00:00+00:00"})
+        assert [e["name"] for e in index.listing("dir")] == ["a.txt", "b.txt"]
+
+        index.rename("dir", "moved")
+        assert [e["path"] for e in index.listing("moved")] == ["moved/a.txt", "moved/b.txt"]
+        assert index.listing("dir") is None
+        assert [e["path"] for e in index.listing("")] == ["moved"]
+
+        index.remove("moved/a.txt")
+        assert [e["name"] for e in index.listing("moved")] == ["b.txt"]
+
+        # dirty directories are listed again first, even if they were listed recently
+        index.mark_dirty("moved/b.txt")
+        assert index.dirs_to_crawl(3600, 10) == ["moved"]
+        index.close()
+
+        # the index persists
+        index = MetadataIndex(str(tmp_path / "drive.sqlite"))
+        assert [e["path"] for e in index.listing("moved")] == ["moved/b.txt"]
+        index.close()
+
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+}
+
+
+@pytest.fixture
+def jp_server_config(tmp_path):
+    return Config({**base_config, "JupyterFs": {"metadata_index": True, "index_dir": str(tmp_path / "index")}})
+
+
+async def _index(jp_fetch, path, **params):
+    rep = await jp_fetch(f"/jupyterfs/index/{path}", params=params)
+    return json.loads(rep.body)
+
+
+async def _crawled(jp_fetch, path):
+    # wait for the crawler to have indexed everything below path
+    deadline = time.monotonic() + 10
+    while not (await _index(jp_fetch, path, usage=1))["complete"]:
+        assert time.monotonic() < deadline, "the drive was not indexed in time"
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.parametrize("type, url", [("pyfs", "osfs://{}"), ("fsspec", "file://{}"), ("fsspec", "asyncwrapper::file://{}")])
+async def test_index(tmp_path, jp_fetch, type, url):
+    tmp_path = tmp_path / "drive"
+    (tmp_path / "dir" / "nested").mkdir(parents=True)
+    (tmp_path / "dir" / "nested" / "data.csv").write_text("12345")
+    (tmp_path / "dir" / "notes.txt").write_text("123")
+    (tmp_path / "top.csv").write_text("1")
+    cc = ContentsClient(jp_fetch)
+    (resource, unindexed) = await cc.set_resources(
+        [{"url": url.format(tmp_path.as_posix()), "type": type}, {"url": f"osfs://{(tmp_path / 'dir').as_posix()}", "type": "pyfs", "index": False}]
+    )
+    drive = resource["drive"]
+
+    await _crawled(jp_fetch, f"{drive}:")
+    reply = await _index(jp_fetch, f"{drive}:dir")
+    assert reply["complete"] and reply["fresh_as_of"]
+    assert [(e["path"], e["type"]) for e in reply["content"]] == [(f"{drive}:dir/nested", "directory"), (f"{drive}:dir/notes.txt", "file")]
+    reply = await _index(jp_fetch, f"{drive}:", pattern="*.csv")
+    assert [m["path"] for m in reply["matches"]] == [f"{drive}:dir/nested/data.csv", f"{drive}:top.csv"]
+    reply = await _index(jp_fetch, f"{drive}:", usage=1)
+    assert (reply["size"], reply["files"], reply["directories"]) == (9, 3, 2)
+
+    # writes through the contents api are reflected right away
+    await cc.save(f"{drive}:dir/new.txt", {"type": "file", "format": "text", "content": "new"})
+    await cc.rename(f"{drive}:dir/notes.txt", f"{drive}:dir/renamed.txt")
+    await cc.delete(f"{drive}:top.csv")
+    reply = await _index(jp_fetch, f"{drive}:dir")
+    assert [e["name"] for e in reply["content"]] == ["nested", "new.txt", "renamed.txt"]
+    reply = await _index(jp_fetch, f"{drive}:", pattern="*.csv")
+    assert [m["path"] for m in reply["matches"]] == [f"{drive}:dir/nested/data.csv"]
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await _index(jp_fetch, f"{unindexed['drive']}:")
+    assert e.value.code == 404
@@ -5,12 +5,32 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 #
-
+import subprocess
+import sys
 from unittest.mock import patch
 
+import pytest
+
 from jupyterfs import _jupyter_labextension_paths, fs
 from jupyterfs.extension import _jupyter_server_extension_points
 
+# the modules that `import jupyterfs` must leave for the first use of the names that need them
+HEAVY_MODULES = ("jupyter_server", "nbformat", "tornado", "fs", "fsspec", "jupyterfs.metamanager")
+# generous, so as not to be flaky: importing the modules above takes seconds
+IMPORT_BUDGET_US = 200_000
+
+
+def _import_times(module):
+    """Import module in a fresh interpreter, and return the cumulative import time in us of every module it imported"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
 
 class TestInit:
     # for Coverage
@@ -37,3 +57,18 @@ class TestInit:
         fs("osfs://{{foo}}/bar.txt", "pyfs")
         mock_getpass.assert_called_with("Enter value for 'foo': ")
         mock_fs_open_fs.assert_called_with("osfs://test%20return%20getpass%20%3C%3E/%7C/bar.txt")
+
+    def test_import_time(self):
+        times = _import_times("jupyterfs")
+        heavy = sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES or name in HEAVY_MODULES)
+        assert heavy == [], "import jupyterfs now imports %s" % heavy
+        assert times["jupyterfs"] < IMPORT_BUDGET_US
+
+    def test_lazy_names(self):
+        import jupyterfs
+        from jupyterfs.metamanager import MetaManager
+
+        assert jupyterfs.MetaManager is MetaManager
+        assert set(jupyterfs.__all__) <= set(dir(jupyterfs))
+        with pytest.raises(AttributeError):
+            jupyterfs.missing
@@ -0,0 +1,88 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import json
+
+import pytest
+import tornado.httpclient
+from traitlets.config import Config
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+    "JupyterFs": {"listing_max_page_size": 4, "listing_stream_batch_size": 3},
+}
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config(base_config)
+
+
+async def _listing(jp_fetch, path, **params):
+    rep = await jp_fetch(f"/jupyterfs/listing/{path}", params=params)
+    return json.loads(rep.body)
+
+
+@pytest.mark.parametrize("type, url", [("pyfs", "osfs://{}"), ("fsspec", "file://{}"), ("fsspec", "asyncwrapper::file://{}")])
+async def test_listing_pages(tmp_path, jp_fetch, type, url):
+    tmp_path = tmp_path / "drive"
+    (tmp_path / "dir").mkdir(parents=True)
+    names = [f"{i}.txt" for i in range(10)]
+    for name in names:
+        (tmp_path / "dir" / name).write_text(name)
+    (resource,) = await ContentsClient(jp_fetch).set_resources([{"url": url.format(tmp_path.as_posix()), "type": type}])
+    drive = resource["drive"]
+
+    # pages are capped at listing_max_page_size
+    model = await _listing(jp_fetch, f"{drive}:dir", limit=100)
+    assert model["type"] == "directory"
+    listed = [entry["name"] for entry in model["content"]]
+    while model["cursor"]:
+        model = await _listing(jp_fetch, f"{drive}:dir", limit=3, cursor=model["cursor"])
+        listed += [entry["name"] for entry in model["content"]]
+    assert listed == names
+
+    for path, params in [(f"{drive}:dir/0.txt", {}), (f"{drive}:dir", {"limit": "many"}), ("", {}), ("drive/dir", {"limit": 3})]:
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await _listing(jp_fetch, path, **params)
+        assert e.value.code == 400
+
+
+async def _stream(jp_fetch, path):
+    rep = await jp_fetch(f"/jupyterfs/listing/{path}", params={"stream": 1})
+    assert rep.headers["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in rep.body.decode().splitlines()]
+    assert lines[-1]["done"]
+    return lines[:-1], lines[-1]
+
+
+@pytest.mark.parametrize("type, url", [("pyfs", "osfs://{}"), ("fsspec", "file://{}"), ("fsspec", "asyncwrapper::file://{}")])
+async def test_listing_stream(tmp_path, jp_fetch, type, url):
+    tmp_path = tmp_path / "drive"
+    (tmp_path / "dir" / "sub").mkdir(parents=True)
+    (tmp_path / "dir" / ".hidden").write_text("")
+    names = [f"{i}.txt" for i in range(10)]
+    for name in names:
+        (tmp_path / "dir" / name).write_text(name)
+    (tmp_path / "empty").mkdir()
+    (resource,) = await ContentsClient(jp_fetch).set_resources([{"url": url.format(tmp_path.as_posix()), "type": type}])
+    drive = resource["drive"]
+
+    models, done = await _stream(jp_fetch, f"{drive}:dir")
+    assert sorted(model["name"] for model in models) == sorted([*names, "sub"])
+    assert done["count"] == 11
+    assert {model["type"] for model in models} == {"file", "directory"}
+
+    assert await _stream(jp_fetch, f"{drive}:empty") == ([], {"done": True, "count": 0})
+
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await _stream(jp_fetch, f"{drive}:missing")
+    assert e.value.code in (400, 404)
@@ -5,9 +5,17 @@
 # This file is part of the jupyter-fs library, distributed under the terms of
 # the Apache License 2.0.  The full license can be found in the LICENSE file.
 
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
 import pytest
+import tornado.httpclient
 from traitlets.config import Config
 
+from jupyterfs.manager import FSManager
+
 from .utils.client import ContentsClient
 
 # base config
@@ -177,9 +185,139 @@ async def test_resource_validators_no_auth(tmp_path, jp_fetch, jp_server_config,
     assert names == {"valid-1", "valid-2"}
 
 
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+@pytest.mark.parametrize("our_config", [{}])
+async def test_drive_stats(tmp_path, jp_fetch, jp_server_config):
+    cc = ContentsClient(jp_fetch)
+    resources = await cc.set_resources(
+        [
+            {"name": "fsspec", "url": f"file://{tmp_path.as_posix()}", "type": "fsspec"},
+            {"name": "pyfs", "url": f"osfs://{tmp_path.as_posix()}", "type": "pyfs"},
+        ]
+    )
+    fsspec_drive, pyfs_drive = (r["drive"] for r in resources)
+    await cc.get(f"{fsspec_drive}:")
+    await cc.get(f"{fsspec_drive}:")
+
+    stats = json.loads((await jp_fetch("/jupyterfs/stats")).body)
+    assert pyfs_drive not in stats
+    assert stats[fsspec_drive]["cache"]["hits"] > 0
+
+
 @pytest.mark.parametrize("base_config", [base_config, sync_base_config])
 @pytest.mark.parametrize("our_config", [{}])
 async def test_basic_sanity_check(tmp_path, jp_fetch, jp_server_config):
     cc = ContentsClient(jp_fetch)
     resources = await cc.get("/")
     assert resources["type"] == "directory"
+
+
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+@pytest.mark.parametrize("our_config", [{"JupyterFs": {"init_timeout": 0.1}}])
+async def test_slow_resource_pending(tmp_path, jp_fetch, jp_server_config):
+    (tmp_path / "slow").mkdir()
+    (tmp_path / "fast").mkdir()
+    unblock = threading.Event()
+    create = FSManager.create
+
+    def slow_create(url, *args, **kwargs):
+        if url.endswith("/slow"):
+            # e.g. an unreachable host
+            unblock.wait(10)
+        return create(url, *args, **kwargs)
+
+    cc = ContentsClient(jp_fetch)
+    with patch.object(FSManager, "create", staticmethod(slow_create)):
+        slow, fast = await cc.set_resources(
+            [
+                {"name": "slow", "url": f"osfs://{(tmp_path / 'slow').as_posix()}", "type": "pyfs"},
+                {"name": "fast", "url": f"osfs://{(tmp_path / 'fast').as_posix()}", "type": "pyfs", "initTimeout": 5},
+            ]
+        )
+        assert (slow["init"], fast["init"]) == ("pending", True)
+        await cc.get(f"{fast['drive']}:")
+
+        # the slow resource is completed in the background
+        unblock.set()
+        resources = await _resources_when(jp_fetch, lambda resources: resources[0]["init"] is True)
+        assert [r["init"] for r in resources] == [True, True]
+        await cc.get(f"{slow['drive']}:")
+
+
+async def _resources_when(jp_fetch, predicate):
+    for _ in range(100):
+        resources = json.loads((await jp_fetch("/jupyterfs/resources")).body)
+        if predicate(resources):
+            break
+        await asyncio.sleep(0.05)
+    return resources
+
+
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+@pytest.mark.parametrize("our_config", [{"JupyterFs": {"lazy_connect": True, "surface_init_errors": True}}])
+async def test_lazy_connect_health(tmp_path, jp_fetch, jp_server_config, jp_serverapp):
+    cc = ContentsClient(jp_fetch)
+    good, broken, broken_fsspec = await cc.set_resources(
+        [
+            {"name": "good", "url": f"osfs://{tmp_path.as_posix()}", "type": "pyfs"},
+            {"name": "broken", "url": f"osfs://{(tmp_path / 'missing').as_posix()}", "type": "pyfs"},
+            {"name": "broken-fsspec", "url": f"file://{(tmp_path / 'missing-too').as_posix()}", "type": "fsspec"},
+        ]
+    )
+    # nothing is opened until the drives are used, so a broken backend does not fail the initialization
+    assert (good["init"], broken["init"], broken_fsspec["init"]) == (True, True, True)
+
+    # the drives are connected in the background, and the broken ones are reported as degraded
+    good, broken, broken_fsspec = await _resources_when(jp_fetch, lambda resources: all("health" in r for r in resources))
+    assert (good["health"], broken["health"], broken_fsspec["health"]) == ("ok", "degraded", "degraded")
+    assert "does not exist" in broken_fsspec["healthError"]
+    assert jp_serverapp.contents_manager._managers[good["drive"]]._pyfs is not None
+
+    await cc.get(f"{good['drive']}:")
+    with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+        await cc.get(f"{broken['drive']}:")
+    assert e.value.code == 503
+
+    # a backend that comes back is reported healthy again by the next round of checks
+    (tmp_path / "missing").mkdir()
+    await jp_serverapp.contents_manager._health_checker.check_all()
+    assert json.loads((await jp_fetch("/jupyterfs/resources")).body)[1]["health"] == "ok"
+    await cc.get(f"{broken['drive']}:")
+
+
+@pytest.mark.parametrize("base_config", [base_config])
+@pytest.mark.parametrize("our_config", [{"JupyterFs": {"lazy_connect": True}}])
+async def test_health_error_hides_credentials(tmp_path, jp_fetch, jp_server_config, monkeypatch):
+    monkeypatch.setenv("JUPYTERFS_TEST_TOKEN", "secret_token_abc")
+    cc = ContentsClient(jp_fetch)
+    await cc.set_resources([{"name": "broken", "url": f"file://{tmp_path.as_posix()}/{{{{JUPYTERFS_TEST_TOKEN}}}}", "type": "fsspec", "auth": "env"}])
+
+    (broken,) = await _resources_when(jp_fetch, lambda resources: "health" in resources[0])
+    assert broken["health"] == "degraded"
+    assert "secret_token_abc" not in (await jp_fetch("/jupyterfs/resources")).body.decode()
+
+
+@pytest.mark.parametrize("base_config", [base_config, sync_base_config])
+@pytest.mark.parametrize("our_config", [{}])
+async def test_shared_filesystems(tmp_path, jp_fetch, jp_server_config, jp_serverapp):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "b" / "b.txt").write_text("b")
+    resources = [
+        {"name": "a", "url": f"osfs://{tmp_path.as_posix()}!/a", "type": "pyfs"},
+        {"name": "b", "url": f"osfs://{tmp_path.as_posix()}!/b", "type": "pyfs"},
+    ]
+    cc = ContentsClient(jp_fetch)
+    a, b = await cc.set_resources(resources)
+    pool = jp_serverapp.contents_manager._fs_pool
+
+    # drives on the same backend share its filesystem, whatever their root
+    assert pool.stats()["open"] == 1
+    assert [m["name"] for m in (await cc.get(f"{b['drive']}:"))["content"]] == ["b.txt"]
+    assert (await cc.get(f"{a['drive']}:"))["content"] == []
+
+    # and the filesystem outlives the managers that are replaced
+    await cc.set_resources([{**r, "cache": False} for r in resources])
+    assert pool.stats()["open"] == 1
+    await cc.set_resources([])
+    assert pool.stats()["idle"] == 1
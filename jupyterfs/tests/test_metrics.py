@@ -0,0 +1,74 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+from collections import defaultdict
+
+import pytest
+import tornado.httpclient
+from prometheus_client.parser import text_string_to_metric_families
+from traitlets.config import Config
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+}
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config(base_config)
+
+
+async def _metrics(jp_fetch, drive):
+    """The samples of the jupyter-fs metrics of drive, by name, keyed by their other labels"""
+    text = (await jp_fetch("metrics")).body.decode()
+    samples = defaultdict(dict)
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            labels = dict(sample.labels)
+            if sample.name.startswith("jupyterfs_") and labels.pop("drive", None) == drive:
+                samples[sample.name][tuple(sorted(labels.items()))] = sample.value
+    return text, samples
+
+
+@pytest.mark.parametrize("type, url", [("pyfs", "osfs://{}"), ("fsspec", "file://{}"), ("fsspec", "asyncwrapper::file://{}")])
+async def test_drive_metrics(tmp_path, jp_fetch, type, url):
+    tmp_path = tmp_path / "drive"
+    (tmp_path / "dir").mkdir(parents=True)
+    url = url.format(tmp_path.as_posix())
+    cc = ContentsClient(jp_fetch)
+    (resource,) = await cc.set_resources([{"url": url, "type": type}])
+    drive = resource["drive"]
+
+    await cc.save(f"{drive}:dir/a.txt", {"type": "file", "format": "text", "content": "12345"})
+    await cc.get(f"{drive}:dir/a.txt")
+    await cc.get(f"{drive}:dir")
+    await cc.rename(f"{drive}:dir/a.txt", f"{drive}:dir/b.txt")
+    with pytest.raises(tornado.httpclient.HTTPClientError):
+        await cc.get(f"{drive}:dir/missing.txt")
+    await cc.delete(f"{drive}:dir/b.txt")
+
+    text, samples = await _metrics(jp_fetch, drive)
+    # the url of a drive, which may carry credentials, is never part of its labels
+    assert tmp_path.as_posix() not in text
+
+    counts = {dict(labels)["operation"]: value for labels, value in samples["jupyterfs_operation_duration_seconds_count"].items()}
+    # (jupyter_server makes gets of its own around saves)
+    assert counts["save"] == 1 and counts["get_file"] >= 1 and counts["get_directory"] >= 1
+    assert counts["rename"] == 1 and counts["delete"] == 1
+    assert {dict(labels)["type"] for labels in samples["jupyterfs_operation_duration_seconds_count"]} == {type}
+    ((labels, errors),) = samples["jupyterfs_operation_errors_total"].items()
+    assert errors == 1 and dict(labels)["operation"] == "get" and dict(labels)["code"] in ("400", "404")
+    assert samples["jupyterfs_read_bytes_total"] == {(("type", type),): 5.0}
+    assert samples["jupyterfs_written_bytes_total"] == {(("type", type),): 5.0}
+    # backend calls are those made to the filesystem of the drive, not to its manager
+    calls = {dict(labels)["call"]: value for labels, value in samples["jupyterfs_backend_calls_total"].items()}
+    assert calls and not {"get", "save", "rename", "delete"} & set(calls)
+    assert calls.get("writebytes" if type == "pyfs" else "_pipe_file" if url.startswith("asyncwrapper") else "pipe", 0) >= 1
@@ -0,0 +1,35 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+from jupyterfs.manager.pool import FilesystemPool
+
+
+def test_pool():
+    closed = []
+    pool = FilesystemPool(idle_timeout=3600, max_idle=1)
+    a = pool.acquire("a", object, closed.append)
+    assert pool.acquire("a", object, closed.append) is a
+    assert pool.stats() == {"open": 1, "idle": 0, "hits": 1, "misses": 1}
+
+    # instances are kept open until their last user releases them, and then some
+    pool.release("a")
+    pool.release("a")
+    assert pool.stats()["idle"] == 1 and closed == []
+    assert pool.acquire("a", object, closed.append) is a
+    pool.release("a")
+
+    # the least recently released are closed beyond max_idle
+    b = pool.acquire("b", object, closed.append)
+    pool.release("b")
+    assert closed == [a]
+    assert pool.stats() == {"open": 1, "idle": 1, "hits": 2, "misses": 2}
+
+    # and those idle for longer than idle_timeout
+    pool.idle_timeout = 0
+    pool.evict()
+    assert closed == [a, b]
+    assert pool.stats()["open"] == 0
+    assert pool.acquire("b", object) is not b
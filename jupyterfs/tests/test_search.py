@@ -0,0 +1,73 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import json
+
+import pytest
+import tornado.httpclient
+from traitlets.config import Config
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+    "JupyterFs": {"search_concurrency": 2, "search_max_results": 10},
+}
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config(base_config)
+
+
+async def _search(jp_fetch, path, **params):
+    rep = await jp_fetch(f"/jupyterfs/search/{path}", params=params)
+    assert rep.headers["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in rep.body.decode().splitlines()]
+    assert lines[-1]["done"]
+    return lines[:-1], lines[-1]
+
+
+async def test_search(tmp_path, jp_fetch):
+    tmp_path = tmp_path / "drive"
+    for i in range(4):
+        (tmp_path / f"dir{i}" / "nested").mkdir(parents=True)
+        (tmp_path / f"dir{i}" / "nested" / f"Report{i}.csv").write_text("")
+        (tmp_path / f"dir{i}" / f"notes{i}.txt").write_text("")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "secret.csv").write_text("")
+    resources = await ContentsClient(jp_fetch).set_resources(
+        [
+            {"url": f"osfs://{tmp_path.as_posix()}", "type": "pyfs"},
+            {"url": f"file://{tmp_path.as_posix()}", "type": "fsspec"},
+            {"url": f"asyncwrapper::file://{tmp_path.as_posix()}", "type": "fsspec"},
+        ]
+    )
+
+    for resource in resources:
+        drive = resource["drive"]
+        matches, done = await _search(jp_fetch, f"{drive}:", pattern="*.csv")
+        assert sorted(m["path"] for m in matches) == [f"{drive}:dir{i}/nested/Report{i}.csv" for i in range(4)]
+        assert (done["truncated"], done["timed_out"]) == (False, False)
+        assert matches[0]["type"] == "file"
+
+        # substrings are matched case insensitively, globs with a / against the relative path
+        matches, _ = await _search(jp_fetch, f"{drive}:dir1", pattern="report")
+        assert [m["path"] for m in matches] == [f"{drive}:dir1/nested/Report1.csv"]
+        matches, _ = await _search(jp_fetch, f"{drive}:", pattern="dir2/*")
+        assert sorted(m["name"] for m in matches) == ["Report2.csv", "nested", "notes2.txt"]
+
+        matches, done = await _search(jp_fetch, f"{drive}:", pattern="*", limit="3")
+        assert len(matches) == 3
+        assert done["truncated"]
+
+        for path, params in [(f"{drive}:", {}), (f"{drive}:dir0/notes0.txt", {"pattern": "x"}), (f"{drive}:.hidden", {"pattern": "x"})]:
+            with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+                await jp_fetch(f"/jupyterfs/search/{path}", params=params)
+            assert e.value.code in (400, 404)
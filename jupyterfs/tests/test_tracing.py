@@ -0,0 +1,53 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import re
+
+import pytest
+from traitlets.config import Config
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+    "JupyterFs": {"trace_backend_calls": True},
+}
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config(base_config)
+
+
+def _timings(rep):
+    """The (name, duration, description) entries of the Server-Timing headers of a response"""
+    entries = []
+    for header in rep.headers.get_list("Server-Timing"):
+        entries += re.findall(r'([\w-]+);dur=([\d.]+);desc="([^"]*)"', header)
+    return entries
+
+
+@pytest.mark.parametrize("type, url", [("pyfs", "osfs://{}"), ("fsspec", "file://{}"), ("fsspec", "asyncwrapper::file://{}")])
+async def test_server_timing(tmp_path, jp_fetch, type, url):
+    tmp_path = tmp_path / "drive"
+    (tmp_path / "dir").mkdir(parents=True)
+    for i in range(3):
+        (tmp_path / "dir" / f"{i}.txt").write_text(str(i))
+    (resource,) = await ContentsClient(jp_fetch).set_resources([{"url": url.format(tmp_path.as_posix()), "type": type}])
+    drive = resource["drive"]
+
+    rep = await jp_fetch("api", "contents", f"{drive}:dir", params={"content": "1"})
+    timings = _timings(rep)
+    (get,) = [entry for entry in timings if entry[0] == "jfs-get"]
+    calls = int(re.match(r"drive (\w+), (\d+) backend calls", get[2]).group(2))
+    assert calls > 0
+    # the calls are broken down by backend method, and add up
+    breakdown = [entry for entry in timings if entry[0].startswith("jfs-get-")]
+    assert breakdown and sum(int(desc.split()[0]) for _, _, desc in breakdown) == calls
+    assert sum(float(dur) for _, dur, _ in breakdown) <= float(get[1]) + 0.1
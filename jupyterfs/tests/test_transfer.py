@@ -0,0 +1,107 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+from unittest.mock import patch
+
+import pytest
+import tornado.web
+
+from jupyterfs.metamanager import MetaManager
+from jupyterfs.transfer import Transfer
+
+content = bytes(range(256)) * 4000
+
+
+@pytest.fixture
+def src_dir(tmp_path):
+    src = tmp_path / "src"
+    (src / "dir" / "sub").mkdir(parents=True)
+    (src / "file.bin").write_bytes(content)
+    (src / "dir" / "a.txt").write_text("a")
+    (src / "dir" / "sub" / "b.txt").write_text("b")
+    (tmp_path / "dst").mkdir()
+    return src
+
+
+async def _metamanager(tmp_path, src_url, dst_url):
+    cm = MetaManager()
+    cm._jupyterfsConfig.stream_chunk_size = 10000
+    src, dst = cm.initResource(
+        {"name": "src", "url": src_url.format(tmp_path / "src"), "type": "pyfs" if src_url.startswith("osfs") else "fsspec", "auth": "none"},
+        {"name": "dst", "url": dst_url.format(tmp_path / "dst"), "type": "pyfs" if dst_url.startswith("osfs") else "fsspec", "auth": "none"},
+    )
+    await cm.check_connections()
+    return cm, src["drive"], dst["drive"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "src_url, dst_url",
+    [("osfs://{}", "file://{}"), ("file://{}", "osfs://{}"), ("asyncwrapper::file://{}", "osfs://{}"), ("osfs://{}", "asyncwrapper::file://{}")],
+)
+async def test_move_across_drives(tmp_path, src_dir, src_url, dst_url):
+    cm, src, dst = await _metamanager(tmp_path, src_url, dst_url)
+    checkpoints = cm._managers[src].checkpoints
+
+    with patch.object(checkpoints, "delete_all_checkpoints") as delete_checkpoints:
+        await cm.rename(f"{src}:file.bin", f"{dst}:moved.bin")
+        assert (tmp_path / "dst" / "moved.bin").read_bytes() == content
+        assert not (src_dir / "file.bin").exists()
+
+        await cm.rename(f"{src}:dir", f"{dst}:dir")
+        assert (tmp_path / "dst" / "dir" / "a.txt").read_text() == "a"
+        assert (tmp_path / "dst" / "dir" / "sub" / "b.txt").read_text() == "b"
+        assert not (src_dir / "dir").exists()
+
+    # the sources are deleted along with their checkpoints
+    deleted = sorted(call.args[0].strip("/") for call in delete_checkpoints.call_args_list)
+    assert deleted == ["dir", "dir/a.txt", "dir/sub", "dir/sub/b.txt", "file.bin"]
+
+
+@pytest.mark.asyncio
+async def test_copy_across_drives(tmp_path, src_dir):
+    cm, src, dst = await _metamanager(tmp_path, "osfs://{}", "file://{}")
+
+    await Transfer(cm, f"{src}:dir", f"{dst}:copy").copy()
+    assert (tmp_path / "dst" / "copy" / "sub" / "b.txt").read_text() == "b"
+    assert (src_dir / "dir" / "sub" / "b.txt").exists()
+
+    with pytest.raises(tornado.web.HTTPError) as e:
+        await Transfer(cm, f"{src}:file.bin", f"{dst}:copy").copy()
+    assert e.value.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_move_keeps_hidden_entries(tmp_path, src_dir):
+    (src_dir / "dir" / ".hidden").write_text("hidden")
+    cm, src, dst = await _metamanager(tmp_path, "file://{}", "osfs://{}")
+
+    await cm.rename(f"{src}:dir", f"{dst}:dir")
+    assert (tmp_path / "dst" / "dir" / "a.txt").exists()
+    assert (src_dir / "dir" / ".hidden").exists()
+    assert not (src_dir / "dir" / "a.txt").exists()
+
+
+@pytest.mark.asyncio
+async def test_failed_copy_keeps_source(tmp_path, src_dir):
+    cm, src, dst = await _metamanager(tmp_path, "osfs://{}", "file://{}")
+    with patch("jupyterfs.manager.fsspec._StagedWrite.write", side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            await cm.rename(f"{src}:file.bin", f"{dst}:moved.bin")
+    assert (src_dir / "file.bin").read_bytes() == content
+    assert list((tmp_path / "dst").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_copy_to_other_drive(tmp_path, src_dir):
+    cm, src, dst = await _metamanager(tmp_path, "file://{}", "osfs://{}")
+
+    assert (await cm.copy(f"{src}:file.bin", f"{dst}:"))["name"] == "file.bin"
+    assert (await cm.copy(f"{src}:file.bin", f"{dst}:"))["name"] == "file-Copy1.bin"
+    await cm.copy(f"{src}:dir", f"{dst}:dir")
+    assert (tmp_path / "dst" / "file-Copy1.bin").read_bytes() == content
+    assert (tmp_path / "dst" / "dir" / "sub" / "b.txt").read_text() == "b"
+    assert (src_dir / "file.bin").exists()
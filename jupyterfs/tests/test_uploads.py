@@ -0,0 +1,84 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import io
+from unittest.mock import MagicMock, patch
+
+import pytest
+import tornado.web
+
+from jupyterfs.manager.uploads import UploadSessions
+
+
+class TestUploadSessions:
+    def test_write(self):
+        uploads = UploadSessions()
+        handle = io.BytesIO()
+        assert uploads.write("a", 1, b"1", lambda: handle) is None
+        assert uploads.write("a", 2, b"2", lambda: pytest.fail("reopened")) is None
+        assert uploads.write("a", -1, b"3", lambda: pytest.fail("reopened")) is handle
+        assert handle.getvalue() == b"123"
+        assert "a" not in uploads
+
+    def test_restart_aborts_previous(self):
+        uploads = UploadSessions()
+        first = MagicMock()
+        uploads.write("a", 1, b"1", lambda: first)
+        uploads.write("a", 1, b"1", io.BytesIO)
+        first.discard.assert_called_once()
+
+    def test_missing_session(self):
+        uploads = UploadSessions()
+        with pytest.raises(tornado.web.HTTPError) as e:
+            uploads.write("a", 2, b"2", io.BytesIO)
+        assert e.value.status_code == 400
+
+    def test_idle_timeout(self):
+        uploads = UploadSessions(idle_timeout=10)
+        handle = MagicMock(spec=["write", "close"])
+        with patch("time.monotonic", return_value=100.0):
+            uploads.write("a", 1, b"1", lambda: handle)
+        with patch("time.monotonic", return_value=111.0):
+            uploads.expire()
+        handle.close.assert_called_once()
+        assert len(uploads) == 0
+        uploads.abort_all()
+
+    def test_chunk_after_expiry(self):
+        uploads = UploadSessions(idle_timeout=10)
+        handle = MagicMock(spec=["write", "close", "discard"])
+        with patch("time.monotonic", return_value=100.0):
+            uploads.write("a", 1, b"1", lambda: handle)
+        with patch("time.monotonic", return_value=111.0):
+            uploads.expire()
+            with pytest.raises(tornado.web.HTTPError) as e:
+                uploads.write("a", 2, b"2", io.BytesIO)
+        assert e.value.status_code == 400
+        handle.discard.assert_called_once()
+        assert handle.write.call_count == 1
+
+    def test_expiry_rechecks_under_lock(self):
+        uploads = UploadSessions(idle_timeout=10)
+        handle = MagicMock(spec=["write", "close", "discard"])
+        with patch("time.monotonic", return_value=100.0):
+            uploads.write("a", 1, b"1", lambda: handle)
+        session = uploads._sessions["a"]
+        # a chunk is written while the expiry waits for the session
+        real_lock = session.lock
+
+        class Lock:
+            def __enter__(self):
+                real_lock.acquire()
+                session.last_used = 110.0
+
+            def __exit__(self, *exc):
+                real_lock.release()
+
+        session.lock = Lock()
+        with patch("time.monotonic", return_value=111.0):
+            uploads.expire()
+        handle.discard.assert_not_called()
+        assert "a" in uploads
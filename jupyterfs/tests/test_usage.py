@@ -0,0 +1,53 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+import json
+
+import pytest
+import tornado.httpclient
+from traitlets.config import Config
+
+from .utils.client import ContentsClient
+
+base_config = {
+    "ServerApp": {
+        "jpserver_extensions": {"jupyterfs.extension": True},
+        "contents_manager_class": "jupyterfs.metamanager.MetaManager",
+    },
+    "JupyterFs": {"usage_concurrency": 2},
+}
+
+
+@pytest.fixture
+def jp_server_config():
+    return Config(base_config)
+
+
+async def test_disk_usage(tmp_path, jp_fetch):
+    tmp_path = tmp_path / "drive"
+    for i in range(5):
+        (tmp_path / f"dir{i}" / "sub").mkdir(parents=True)
+        (tmp_path / f"dir{i}" / "sub" / "data.bin").write_bytes(b"x" * (i + 1))
+    (tmp_path / "top.bin").write_bytes(b"x" * 100)
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "secret.bin").write_bytes(b"x" * 1000)
+    resources = await ContentsClient(jp_fetch).set_resources(
+        [{"url": f"osfs://{tmp_path.as_posix()}", "type": "pyfs"}, {"url": f"file://{tmp_path.as_posix()}", "type": "fsspec"}]
+    )
+
+    for resource in resources:
+        rep = await jp_fetch(f"/jupyterfs/du/{resource['drive']}:")
+        assert rep.headers["Content-Type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in rep.body.decode().splitlines()]
+        assert [line["pending"] for line in lines] == [5, 4, 3, 2, 1, 0]
+        assert lines[0]["size"] == 100
+        assert lines[-1]["done"]
+        assert (lines[-1]["size"], lines[-1]["files"], lines[-1]["directories"]) == (115, 6, 10)
+        assert lines[-1]["children"] == {"top.bin": 100, **{f"dir{i}": i + 1 for i in range(5)}}
+
+        with pytest.raises(tornado.httpclient.HTTPClientError) as e:
+            await jp_fetch(f"/jupyterfs/du/{resource['drive']}:top.bin")
+        assert e.value.code == 400
@@ -43,3 +43,14 @@ class ContentsClient:
     async def get(self, path):
         rep = await self.fetch(f"/api/contents/{path}", raise_error=True)
         return json.loads(rep.body)
+
+    async def rename(self, path, new_path):
+        rep = await self.fetch(
+            f"/api/contents/{path}",
+            method="PATCH",
+            body=json.dumps({"path": new_path}),
+        )
+        return json.loads(rep.body)
+
+    async def delete(self, path):
+        await self.fetch(f"/api/contents/{path}", method="DELETE")
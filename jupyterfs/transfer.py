@@ -0,0 +1,168 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+
+from jupyter_server.services.contents.manager import copy_pat
+from tornado.web import HTTPError
+
+from .manager.metrics import count_bytes, drive_labels
+from .pathutils import _call_async, _resolve_path, _run_async
+
+__all__ = ("Transfer",)
+
+# number of chunks read ahead of the writes of a file transfer
+_PIPELINE_DEPTH = 4
+
+
+def _join(path, name):
+    return "%s/%s" % (path.rstrip("/"), name) if path.strip("/") else name
+
+
+class Transfer:
+    """Copies (or moves) a file or directory from one drive to another, streaming the data through the server.
+
+    Files are read from the source drive with `open_binary` and written to the destination drive with
+    `open_writer`, in chunks of `stream_chunk_size` bytes. The reads of a file run ahead of its writes
+    (by up to a few chunks), so both backends are kept busy, and up to `transfer_concurrency` files are
+    transferred at the same time. Directories are copied recursively.
+
+    A move only deletes the source once every file has been copied, and the size of each copy
+    has been checked against the size of its source. The source is deleted with the `delete` of its
+    manager, so that its checkpoints are deleted along with it, and delete events are emitted. Entries that are not listed by the source
+    drive (i.e. hidden ones) are not copied, so a source directory that still holds any is left in place.
+
+    Args:
+        cm (MetaManager): the contents manager the drives belong to
+        old_path (str): the drive path to copy from
+        new_path (str): the drive path to copy to. It must not exist yet
+    """
+
+    def __init__(self, cm, old_path, new_path):
+        self.cm = cm
+        self.old_path = old_path
+        self.new_path = new_path
+        self.src_prefix, self.src, self.src_path = _resolve_path(old_path, cm._managers)
+        self.dst_prefix, self.dst, self.dst_path = _resolve_path(new_path, cm._managers)
+        for mgr, method_name, path in ((self.src, "open_binary", old_path), (self.dst, "open_writer", new_path)):
+            if not hasattr(mgr, method_name):
+                raise HTTPError(400, "Can't move files between backends: %r does not support streaming" % path)
+
+        config = cm._jupyterfsConfig
+        self.chunk_size = config.stream_chunk_size
+        self._limit = asyncio.Semaphore(config.transfer_concurrency)
+        # source paths that have been copied, in the order they can be deleted in
+        self._copied_files = []
+        self._copied_dirs = []
+
+    async def _call_src(self, method_name, *args, **kwargs):
+        return await _call_async(self.cm, self.src_prefix, self.src, method_name, *args, **kwargs)
+
+    async def _call_dst(self, method_name, *args, **kwargs):
+        return await _call_async(self.cm, self.dst_prefix, self.dst, method_name, *args, **kwargs)
+
+    async def copy(self):
+        """Copy old_path to new_path"""
+        if await self._call_dst("exists", self.dst_path):
+            raise HTTPError(409, "File already exists: %s" % self.new_path)
+        model = await self._call_src("get", self.src_path, content=False)
+        await self._copy(model, self.src_path, self.dst_path)
+
+    async def duplicate(self):
+        """Copy old_path as `ContentsManager.copy` does: into new_path if it is an existing directory
+        (as `name-Copy#.ext`), else to new_path. Returns the model of the copy (without content)
+        """
+        if await self._call_dst("dir_exists", self.dst_path):
+            name = self.src_path.strip("/").rpartition("/")[2]
+            name = await self._call_dst("increment_filename", copy_pat.sub(".", name), self.dst_path, insert="-Copy")
+            self.dst_path = _join(self.dst_path, name)
+            self.new_path = "%s:%s" % (self.dst_prefix, self.dst_path) if self.dst_prefix else self.dst_path
+        await self.copy()
+        return await self._call_dst("get", self.dst_path, content=False)
+
+    async def move(self):
+        """Copy old_path to new_path, then delete old_path"""
+        await self.copy()
+        await asyncio.gather(*(self._delete(path) for path in self._copied_files))
+        # deepest directories first, so that each of them is empty by the time it is deleted
+        for path in self._copied_dirs:
+            if await self._call_src("_is_non_empty_dir", path):
+                self.cm.log.warning("Not deleting %r after moving it: it holds entries that were not moved", path)
+                continue
+            await self._call_src("delete", path)
+
+    async def _delete(self, path):
+        async with self._limit:
+            await self._call_src("delete", path)
+
+    async def _copy(self, model, src_path, dst_path):
+        if model["type"] != "directory":
+            async with self._limit:
+                await self._copy_file(src_path, dst_path, model.get("size"))
+            self._copied_files.append(src_path)
+            return
+
+        await self._call_dst("save", {"type": "directory"}, dst_path)
+        async with self._limit:
+            listing = await self._call_src("get", src_path, content=True)
+        await asyncio.gather(*(self._copy(entry, _join(src_path, entry["name"]), _join(dst_path, entry["name"])) for entry in listing["content"]))
+        self._copied_dirs.append(src_path)
+
+    async def _copy_file(self, src_path, dst_path, size):
+        reader = await self._call_src("open_binary", src_path)
+        try:
+            writer = await self._call_dst("open_writer", dst_path)
+            try:
+                copied = await self._pipe(reader, writer)
+            except BaseException:
+                await self._abort(writer)
+                raise
+            await _run_async(self.cm, self.dst_prefix, writer.close)
+        finally:
+            await _run_async(self.cm, self.src_prefix, reader.close)
+
+        written = (await self._call_dst("get", dst_path, content=False)).get("size")
+        if (size is not None and copied != size) or (written is not None and written != copied):
+            raise HTTPError(500, "Incomplete copy of %s to %s: %s bytes read, %s written, of %s" % (src_path, dst_path, copied, written, size))
+
+    async def _pipe(self, reader, writer):
+        """Write everything read from reader to writer, reading ahead while the previous chunks are written"""
+        chunks = asyncio.Queue(maxsize=_PIPELINE_DEPTH)
+        src_labels, dst_labels = drive_labels(self.cm, self.src_prefix), drive_labels(self.cm, self.dst_prefix)
+
+        async def produce():
+            try:
+                while True:
+                    chunk = await _run_async(self.cm, self.src_prefix, reader.read, self.chunk_size)
+                    count_bytes("read", len(chunk), src_labels)
+                    await chunks.put(chunk)
+                    if not chunk:
+                        return
+            except Exception as e:
+                await chunks.put(e)
+
+        producer = asyncio.ensure_future(produce())
+        copied = 0
+        try:
+            while True:
+                chunk = await chunks.get()
+                if isinstance(chunk, Exception):
+                    raise chunk
+                if not chunk:
+                    return copied
+                await _run_async(self.cm, self.dst_prefix, writer.write, chunk)
+                count_bytes("written", len(chunk), dst_labels)
+                copied += len(chunk)
+        finally:
+            producer.cancel()
+
+    async def _abort(self, writer):
+        discard = getattr(writer, "discard", None) or writer.close
+        try:
+            await _run_async(self.cm, self.dst_prefix, discard)
+        except Exception:
+            self.cm.log.exception("Failed to abort the copy of %s to %s", self.old_path, self.new_path)
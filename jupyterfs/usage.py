@@ -0,0 +1,128 @@
+# *****************************************************************************
+#
+# Copyright (c) 2019, the jupyter-fs authors.
+#
+# This file is part of the jupyter-fs library, distributed under the terms of
+# the Apache License 2.0.  The full license can be found in the LICENSE file.
+#
+import asyncio
+import json
+
+from jupyter_server.base.handlers import APIHandler
+from tornado import web
+from tornado.iostream import StreamClosedError
+
+from .config import JupyterFs as JupyterFsConfig
+from .pathutils import _call_async, _resolve_path
+
+__all__ = ("DiskUsageHandler", "disk_usage")
+
+
+def _join(path, name):
+    return "%s/%s" % (path.rstrip("/"), name) if path.strip("/") else name
+
+
+async def disk_usage(cm, path, concurrency):
+    """Compute the disk usage of the directory at path, yielding partial totals as they come in.
+
+    The entries of the directory are listed, then each of its subdirectories is walked on its own
+    (up to `concurrency` of them at the same time), with the `usage` method of the drive's manager.
+    A partial total is yielded each time the walk of a subdirectory completes.
+
+    Args:
+        cm (MetaManagerShared): the contents manager the drive belongs to
+        path (str): the drive path of the directory
+        concurrency (int): the maximum number of subdirectories walked at the same time
+    Yields:
+        dict: the "size" in bytes, and the number of "files" and "directories" counted so far, the number of
+            subdirectories still "pending", and "done". The last one, once done, has the size of each entry
+            of the directory in "children"
+    """
+    prefix, mgr, mgr_path = _resolve_path(path, cm._managers)
+    if not hasattr(mgr, "usage"):
+        raise web.HTTPError(400, "Disk usage is not supported for %r" % path)
+    listing = await _call_async(cm, prefix, mgr, "get", mgr_path, content=True)
+    if listing["type"] != "directory":
+        raise web.HTTPError(400, "Not a directory: %s" % path)
+
+    totals = {"size": 0, "files": 0, "directories": 0}
+    children = {}
+    subdirs = []
+    for entry in listing["content"]:
+        if entry["type"] == "directory":
+            subdirs.append(entry["name"])
+            totals["directories"] += 1
+        else:
+            children[entry["name"]] = entry.get("size") or 0
+            totals["files"] += 1
+            totals["size"] += children[entry["name"]]
+
+    limit = asyncio.Semaphore(max(concurrency, 1))
+
+    async def walk(name):
+        async with limit:
+            return name, await _call_async(cm, prefix, mgr, "usage", _join(mgr_path, name))
+
+    tasks = [asyncio.ensure_future(walk(name)) for name in subdirs]
+    try:
+        yield {**totals, "pending": len(tasks), "done": False}
+        for pending, task in enumerate(asyncio.as_completed(tasks), 1):
+            try:
+                name, usage = await task
+            except web.HTTPError as e:
+                if e.status_code != 404:
+                    raise
+                # went away (or is hidden) since it was listed
+                continue
+            children[name] = usage["size"]
+            for key in totals:
+                totals[key] += usage[key]
+            if pending < len(tasks):
+                yield {**totals, "pending": len(tasks) - pending, "done": False}
+        yield {**totals, "pending": 0, "done": True, "children": children}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class DiskUsageHandler(APIHandler):
+    """Streams the disk usage of a directory on a jupyter-fs drive, as newline delimited JSON
+    objects with the totals so far (see `disk_usage`). The last one has "done" set.
+
+    e.g. GET /jupyterfs/du/<drive>:path/to/dir
+    """
+
+    _jupyterfsConfig = None
+
+    @property
+    def fsconfig(self):
+        # TODO: This pattern will not pick up changes to config after this!
+        if self._jupyterfsConfig is None:
+            self._jupyterfsConfig = JupyterFsConfig(config=self.config)
+
+        return self._jupyterfsConfig
+
+    @web.authenticated
+    async def get(self, path):
+        totals = disk_usage(self.contents_manager, path, self.fsconfig.usage_concurrency)
+        # errors in the listing of the directory itself are still reported with an http status
+        first = await totals.__anext__()
+        self.set_header("Content-Type", "application/x-ndjson")
+        self.set_header("Cache-Control", "no-cache")
+        try:
+            self.write(json.dumps(first) + "\n")
+            await self.flush()
+            async for partial in totals:
+                self.write(json.dumps(partial) + "\n")
+                await self.flush()
+        except StreamClosedError:
+            self.log.debug("Client went away while computing the disk usage of %s", path)
+            return
+        except Exception as e:
+            # too late for an error status: report it in the stream instead
+            self.log.exception("Failed to compute the disk usage of %s", path)
+            message = e.log_message if isinstance(e, web.HTTPError) else str(e)
+            self.write(json.dumps({"error": message, "done": True}) + "\n")
+        finally:
+            await totals.aclose()
+        self.finish()